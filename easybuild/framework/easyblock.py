@@ -51,7 +51,8 @@ import easybuild.tools.environment as env
 from easybuild.tools import config, filetools
 from easybuild.framework.easyconfig.easyconfig import (EasyConfig, ActiveMNS, ITERATE_OPTIONS,
     fetch_parameter_from_easyconfig_file, get_class_for, get_easyblock_class, get_module_path, resolve_template)
-from easybuild.framework.easyconfig.tools import get_paths_for
+from easybuild.framework.easyconfig.format.one import read_easyconfig_spec
+from easybuild.framework.easyconfig.tools import FINGERPRINT_FILENAME, det_fingerprint, get_paths_for
 from easybuild.framework.easyconfig.templates import TEMPLATE_NAMES_EASYBLOCK_RUN_STEP
 from easybuild.tools.build_details import get_build_stats
 from easybuild.tools.build_log import EasyBuildError, print_error, print_msg
@@ -59,16 +60,18 @@ from easybuild.tools.config import build_path, get_log_filename, get_repository,
 from easybuild.tools.config import log_path, read_only_installdir, source_paths, build_option
 from easybuild.tools.environment import modify_env
 from easybuild.tools.filetools import DEFAULT_CHECKSUM
-from easybuild.tools.filetools import adjust_permissions, apply_patch, convert_name, download_file, encode_class_name
-from easybuild.tools.filetools import extract_file, mkdir, read_file, rmtree2
+from easybuild.tools.filetools import DirScan, adjust_permissions, apply_patch, apply_permission_rules, convert_name
+from easybuild.tools.filetools import download_file, encode_class_name
+from easybuild.tools.filetools import extract_file, mkdir, read_file, remove_dir_async, rmtree2
 from easybuild.tools.filetools import write_file, compute_checksum, verify_checksum
-from easybuild.tools.run import run_cmd
+from easybuild.tools.run import run_cmd, run_cmds
 from easybuild.tools.jenkins import write_to_xml
-from easybuild.tools.module_generator import ModuleGenerator
+from easybuild.tools.module_generator import module_generator
 from easybuild.tools.module_naming_scheme.utilities import det_full_ec_version
 from easybuild.tools.modules import ROOT_ENV_VAR_NAME_PREFIX, VERSION_ENV_VAR_NAME_PREFIX, DEVEL_ENV_VAR_NAME_PREFIX
 from easybuild.tools.modules import get_software_root, modules_tool
 from easybuild.tools.repository.repository import init_repository
+from easybuild.tools.resource_monitor import RESOURCE_USAGE_FILENAME, ResourceMonitor, det_mem_per_job
 from easybuild.tools.toolchain import DUMMY_TOOLCHAIN_NAME
 from easybuild.tools.systemtools import det_parallelism, use_group
 from easybuild.tools.utilities import remove_unwanted_chars
@@ -76,6 +79,9 @@ from easybuild.tools.version import this_is_easybuild, VERBOSE_VERSION, VERSION
 
 _log = fancylogger.getLogger('easyblock')
 
+# name of subdirectory of build path in which build directories are moved before removing them in the background
+TRASH_DIR_NAME = '.eb-trash'
+
 
 class EasyBlock(object):
     """Generic support for building and installing software, base class for actual easyblocks."""
@@ -121,6 +127,12 @@ class EasyBlock(object):
         self.builddir = None
         self.installdir = None
 
+        # results of scanning installation directory (cfr. scan_installdir)
+        self.installdir_scan = None
+
+        # monitor for resources consumed during build (cfr. run_all_steps)
+        self.resource_monitor = None
+
         # extensions
         self.exts = None
         self.exts_all = None
@@ -131,7 +143,7 @@ class EasyBlock(object):
         # modules interface with default MODULEPATH
         self.modules_tool = modules_tool()
         # module generator
-        self.moduleGenerator = ModuleGenerator(self, fake=True)
+        self.moduleGenerator = module_generator(self, fake=True)
 
         # modules footer
         self.modules_footer = None
@@ -664,6 +676,19 @@ class EasyBlock(object):
         dontcreate = (dontcreate is None and self.cfg['dontcreateinstalldir']) or dontcreate
         self.make_dir(self.installdir, self.cfg['cleanupoldinstall'], dontcreateinstalldir=dontcreate)
 
+    def scan_installdir(self, rescan=False):
+        """
+        Scan installation directory (once), and return results (size, file counts, existing paths, ...).
+        The installation directory is normally scanned while adjusting permissions (cfr. post_install_step).
+        @param rescan: force scanning the installation directory again, rather than using cached results
+        """
+        if self.installdir_scan is None or rescan:
+            self.installdir_scan = DirScan(self.installdir)
+            self.installdir_scan.walk()
+        else:
+            self.log.debug("Using cached results of scanning installation directory %s" % self.installdir)
+        return self.installdir_scan.result()
+
     def make_dir(self, dir_name, clean, dontcreateinstalldir=False):
         """
         Create the directory.
@@ -716,8 +741,8 @@ class EasyBlock(object):
         # load fake module
         fake_mod_data = self.load_fake_module(purge=True)
 
-        mod_gen = ModuleGenerator(self)
-        header = "#%Module\n"
+        mod_gen = module_generator(self)
+        header = "%s\n" % mod_gen.MODULE_HEADER
 
         env_txt = ""
         for (key, val) in env.get_changes().items():
@@ -746,11 +771,20 @@ class EasyBlock(object):
             output_dir = os.path.join(self.installdir, log_path())
             mkdir(output_dir, parents=True)
 
-        filename = os.path.join(output_dir, ActiveMNS().det_devel_module_filename(self.cfg))
+        devel_mod_fn = ActiveMNS().det_devel_module_filename(self.cfg) + mod_gen.MODULE_FILE_EXTENSION
+        filename = os.path.join(output_dir, devel_mod_fn)
         self.log.debug("Writing devel module to %s" % filename)
 
         write_file(filename, header + load_txt + env_txt)
 
+        if not create_in_builddir and self.installdir_scan is not None:
+            # keep results of scanning installation directory up to date, without scanning it again
+            path = self.installdir
+            for subdir in log_path().split(os.path.sep):
+                path = os.path.join(path, subdir)
+                self.installdir_scan.add(path)
+            self.installdir_scan.add(filename)
+
         # cleanup: unload fake module, remove fake module dir
         self.clean_up_fake_module(fake_mod_data)
 
@@ -806,7 +840,8 @@ class EasyBlock(object):
         environment_name = convert_name(self.name, upper=True)
         txt += self.moduleGenerator.set_environment(ROOT_ENV_VAR_NAME_PREFIX + environment_name, "$root")
         txt += self.moduleGenerator.set_environment(VERSION_ENV_VAR_NAME_PREFIX + environment_name, self.version)
-        devel_path = os.path.join("$root", log_path(), ActiveMNS().det_devel_module_filename(self.cfg))
+        devel_mod_fn = ActiveMNS().det_devel_module_filename(self.cfg) + self.moduleGenerator.MODULE_FILE_EXTENSION
+        devel_path = os.path.join("$root", log_path(), devel_mod_fn)
         txt += self.moduleGenerator.set_environment(DEVEL_ENV_VAR_NAME_PREFIX + environment_name, devel_path)
 
         txt += "\n"
@@ -822,6 +857,8 @@ class EasyBlock(object):
             txt += self.moduleGenerator.msg_on_load(self.cfg['modloadmsg'])
         if self.cfg['modtclfooter']:
             txt += self.moduleGenerator.add_tcl_footer(self.cfg['modtclfooter'])
+        if self.cfg['modluafooter']:
+            txt += self.moduleGenerator.add_lua_footer(self.cfg['modluafooter'])
         for (key, value) in self.cfg['modaliases'].items():
             txt += self.moduleGenerator.set_alias(key, value)
 
@@ -847,16 +884,16 @@ class EasyBlock(object):
         """
         Insert a footer section in the modulefile, primarily meant for contextual information
         """
-        txt = '\n# Built with EasyBuild version %s\n' % VERBOSE_VERSION
+        txt = '\n' + self.moduleGenerator.comment("Built with EasyBuild version %s" % VERBOSE_VERSION)
 
         # add extra stuff for extensions (if any)
         if self.cfg['exts_list']:
             txt += self.make_module_extra_extensions()
 
-        # include modules footer if one is specified
+        # include modules footer if one is specified (Tcl syntax, so not included in module files in Lua syntax)
         if self.modules_footer is not None:
             self.log.debug("Including specified footer into module: '%s'" % self.modules_footer)
-            txt += self.modules_footer
+            txt += self.moduleGenerator.add_tcl_footer(self.modules_footer)
 
         return txt
 
@@ -1176,8 +1213,14 @@ class EasyBlock(object):
                 fil[DEFAULT_CHECKSUM] = check_sum
                 self.log.info("%s checksum for %s: %s" % (DEFAULT_CHECKSUM, fil['path'], fil[DEFAULT_CHECKSUM]))
 
-        # set level of parallelism for build
-        self.cfg['parallel'] = det_parallelism(self.cfg['parallel'], self.cfg['maxparallel'])
+        # set level of parallelism for build,
+        # taking into account memory required per job based on resources consumed by previous builds (if known)
+        mem_per_job = None
+        if self.cfg['parallel'] is None and self.installdir is not None:
+            resource_usage_paths = os.path.join(os.path.dirname(self.installdir), '*', log_path(),
+                                                RESOURCE_USAGE_FILENAME)
+            mem_per_job = det_mem_per_job(glob.glob(resource_usage_paths))
+        self.cfg['parallel'] = det_parallelism(self.cfg['parallel'], self.cfg['maxparallel'], mem_per_job=mem_per_job)
         self.log.info("Setting parallelism: %s" % self.cfg['parallel'])
 
         # create parent dirs in install and modules path already
@@ -1439,27 +1482,43 @@ class EasyBlock(object):
                     self.log.error("Invalid element in 'postinstallcmds', not a string: %s" % cmd)
                 run_cmd(cmd, simple=True, log_ok=False, log_all=False)
 
+        # collect all permission changes, so they can be applied in a single pass over the installation directory
+        perm_rules = []
+        group_id = None
         if self.group is not None:
             # remove permissions for others, and set group ID
-            try:
-                perms = stat.S_IROTH | stat.S_IWOTH | stat.S_IXOTH
-                adjust_permissions(self.installdir, perms, add=False, recursive=True, group_id=self.group[1],
-                                   relative=True, ignore_errors=True)
-            except EasyBuildError, err:
-                self.log.error("Unable to change group permissions of file(s): %s" % err)
-            self.log.info("Successfully made software only available for group %s (gid %s)" % self.group)
+            perm_rules.append((stat.S_IROTH | stat.S_IWOTH | stat.S_IXOTH, False))
+            group_id = self.group[1]
 
         if read_only_installdir():
             # remove write permissions for everyone
-            perms = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
-            adjust_permissions(self.installdir, perms, add=False, recursive=True, relative=True, ignore_errors=True)
-            self.log.info("Successfully removed write permissions recursively for *EVERYONE* on install dir.")
+            perm_rules.append((stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH, False))
         else:
             # remove write permissions for group and other to protect installation
-            perms = stat.S_IWGRP | stat.S_IWOTH
-            adjust_permissions(self.installdir, perms, add=False, recursive=True, relative=True, ignore_errors=True)
+            perm_rules.append((stat.S_IWGRP | stat.S_IWOTH, False))
+
+        # use multiple threads to hide the latency of metadata operations (e.g. on parallel filesystems);
+        # installation directory is complete now, so scan it in the same pass (results are used for sanity check
+        # and build stats, cfr. scan_installdir)
+        self.installdir_scan = DirScan(self.installdir)
+        try:
+            apply_permission_rules(self.installdir, perm_rules, recursive=True, group_id=group_id,
+                                   ignore_errors=True, threads=self.cfg['parallel'] or 1, scan=self.installdir_scan)
+        except EasyBuildError, err:
+            self.log.error("Unable to adjust permissions of file(s) in %s: %s" % (self.installdir, err))
+
+        if self.group is not None:
+            self.log.info("Successfully made software only available for group %s (gid %s)" % self.group)
+
+        if read_only_installdir():
+            self.log.info("Successfully removed write permissions recursively for *EVERYONE* on install dir.")
+        else:
             self.log.info("Successfully removed write permissions recursively for group/other on install dir.")
 
+        install_tree = self.scan_installdir()
+        if install_tree['broken_symlinks']:
+            self.log.warning("Found broken symlinks in %s: %s" % (self.installdir, install_tree['broken_symlinks']))
+
     def sanity_check_step(self, custom_paths=None, custom_commands=None, extension=False):
         """
         Do a sanity check on the installation
@@ -1495,6 +1554,12 @@ class EasyBlock(object):
             self.log.error("Incorrect format for sanity_check_paths (should have %s keys, "
                            "values should be lists (at least one non-empty))." % '/'.join(req_keys))
 
+        # use (cached) scan of installation directory to check for paths, rather than checking each path separately;
+        # not for extensions, since those are checked while the sanity check for the parent is being performed
+        installdir_paths = {}
+        if not extension:
+            installdir_paths = self.scan_installdir()['paths']
+
         for key, check_fn in path_keys_and_check.items():
             for xs in paths[key]:
                 if isinstance(xs, basestring):
@@ -1504,7 +1569,7 @@ class EasyBlock(object):
                 found = False
                 for name in xs:
                     path = os.path.join(self.installdir, name)
-                    if os.path.exists(path):
+                    if os.path.normpath(name) in installdir_paths or os.path.exists(path):
                         self.log.debug("Sanity check: found %s %s in %s" % (key[:-1], name, self.installdir))
                         found = True
                         break
@@ -1537,6 +1602,7 @@ class EasyBlock(object):
                 commands = []
                 self.log.info("Using specified sanity check commands: %s" % commands)
 
+        cmds = []
         for command in commands:
             # set command to default. This allows for config files with
             # non-tuple commands
@@ -1553,9 +1619,10 @@ class EasyBlock(object):
             if command[1] is not None:
                 check_cmd['options'] = command[1]
 
-            cmd = "%(name)s %(options)s" % check_cmd
+            cmds.append("%(name)s %(options)s" % check_cmd)
 
-            out, ec = run_cmd(cmd, simple=False, log_ok=False, log_all=False)
+        # sanity check commands are independent, so run them concurrently (output is checked like for run_cmd)
+        for cmd, (out, ec) in zip(cmds, run_cmds(cmds, max_procs=self.cfg['parallel'] or 1)):
             if ec != 0:
                 self.sanity_check_fail_msgs.append("sanity check command %s exited with code %s (output: %s)" % (cmd, ec, out))
                 self.log.warning("Sanity check: %s" % self.sanity_check_fail_msgs[-1])
@@ -1592,7 +1659,12 @@ class EasyBlock(object):
 
                 self.log.info("Cleaning up builddir %s (in %s)" % (self.builddir, os.getcwd()))
 
-                rmtree2(self.builddir)
+                if build_option('cleanup_builddir_async'):
+                    # move build dir out of the way, and remove it in the background
+                    trash_dir = os.path.join(build_path(), TRASH_DIR_NAME)
+                    remove_dir_async(self.builddir, trash_dir, max_rate=build_option('cleanup_builddir_max_rate'))
+                else:
+                    rmtree2(self.builddir)
                 base = os.path.dirname(self.builddir)
 
                 # keep removing empty directories until we either find a non-empty one
@@ -1628,14 +1700,34 @@ class EasyBlock(object):
 
         self.log.info("Added modulefile: %s" % (self.moduleGenerator.filename))
 
-        self.modules_tool.update()
         self.moduleGenerator.create_symlinks()
+        mod_files = [self.moduleGenerator.filename] + self.moduleGenerator.class_mod_files
+        self.modules_tool.update(mod_files=mod_files)
 
         if not fake:
             self.make_devel_module()
 
         return modpath
 
+    def regenerate_module(self, installdir):
+        """
+        Regenerate module file for an existing installation in the specified directory, without (re)building it.
+        Returns list of (re)generated module files (incl. symlinks in module class directories).
+        """
+        self.installdir = installdir
+
+        # dependencies are not loaded, so no need to check whether the modules for them are available
+        self.toolchain.dependencies = self.cfg.dependencies()
+        if self.toolchain.name != DUMMY_TOOLCHAIN_NAME and ActiveMNS().expand_toolchain_load():
+            tc_mod_name = self.toolchain.det_short_module_name()
+            self.toolchain.toolchain_dependencies = self.modules_tool.dependencies_for(tc_mod_name, depth=0)
+
+        # devel module should only include environment changes made by loading the (fake) module
+        env.reset_changes()
+        self.make_module_step()
+
+        return [self.moduleGenerator.filename] + self.moduleGenerator.class_mod_files
+
     def test_cases_step(self):
         """
         Run provided test cases.
@@ -1791,14 +1883,29 @@ class EasyBlock(object):
 
         steps = self.get_steps(run_test_cases=run_test_cases, iteration_count=self.det_iter_cnt())
 
+        sample_interval = build_option('resource_sample_interval')
+        if sample_interval:
+            self.resource_monitor = ResourceMonitor(interval=sample_interval)
+
         print_msg("building and installing %s..." % self.full_mod_name, self.log, silent=self.silent)
         try:
-            for (stop_name, descr, step_methods, skippable) in steps:
-                print_msg("%s..." % descr, self.log, silent=self.silent)
-                self.run_step(stop_name, step_methods, skippable=skippable)
-
-        except StopException:
-            pass
+            try:
+                for (stop_name, descr, step_methods, skippable) in steps:
+                    print_msg("%s..." % descr, self.log, silent=self.silent)
+                    if self.resource_monitor is None:
+                        self.run_step(stop_name, step_methods, skippable=skippable)
+                    else:
+                        self.resource_monitor.start_step(stop_name, parallel=self.cfg['parallel'])
+                        try:
+                            self.run_step(stop_name, step_methods, skippable=skippable)
+                        finally:
+                            self.resource_monitor.stop_step(parallel=self.cfg['parallel'])
+
+            except StopException:
+                pass
+        finally:
+            if self.resource_monitor is not None:
+                self.resource_monitor.stop()
 
         # return True for successfull build (or stopped build)
         return True
@@ -1914,11 +2021,21 @@ def build_and_install_one(module, orig_environ):
 
         try:
             newspec = os.path.join(new_log_dir, "%s-%s.eb" % (app.name, det_full_ec_version(app.cfg)))
-            shutil.copy(spec, newspec)
+            write_file(newspec, read_easyconfig_spec(spec))
             _log.debug("Copied easyconfig file %s to %s" % (spec, newspec))
-        except (IOError, OSError), err:
+        except (IOError, OSError, EasyBuildError), err:
             print_error("Failed to move easyconfig %s to log dir %s: %s" % (spec, new_log_dir, err))
 
+        # write time series of resources consumed during build
+        if app.resource_monitor is not None:
+            app.resource_monitor.write_time_series(os.path.join(new_log_dir, RESOURCE_USAGE_FILENAME))
+
+        # record fingerprint for installation, used to determine whether it has become stale (cfr. --rebuild-stale)
+        if not app.cfg['stop']:
+            fingerprint = det_fingerprint(app.cfg, spec)
+            write_file(os.path.join(new_log_dir, FINGERPRINT_FILENAME), fingerprint)
+            _log.debug("Recorded fingerprint %s for installation in %s" % (fingerprint, app.installdir))
+
     # build failed
     else:
         success = False
@@ -1950,6 +2067,35 @@ def build_and_install_one(module, orig_environ):
 
     return (success, application_log, errormsg)
 
+def regenerate_module_one(module, installdir, orig_environ):
+    """
+    Regenerate module file for an existing installation, without rebuilding it
+    @param module: dictionary contaning parsed (archived) easyconfig + metadata
+    @param installdir: existing installation directory
+    @param orig_environ: original environment (used to reset environment)
+    """
+    _log.info("Regenerating module file for %s (installation directory: %s)" % (module['spec'], installdir))
+    modify_env(os.environ, orig_environ)
+
+    app = get_easyblock_instance(module)
+    try:
+        mod_files = app.regenerate_module(installdir)
+        success = True
+        errormsg = '(no error)'
+    except EasyBuildError, err:
+        mod_files = []
+        success = False
+        errormsg = "regenerating module file failed: %s" % err.msg
+        _log.warning(errormsg)
+
+    # log file for regenerating module file is only retained if something went wrong
+    app.close_log()
+    if success:
+        os.remove(app.logfile)
+
+    return (success, mod_files, errormsg)
+
+
 def get_easyblock_instance(easyconfig):
     """
     Get an instance for this easyconfig
@@ -0,0 +1,191 @@
+#
+# Copyright 2014 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Easyconfig module that provides a compact, immutable representation of parsed dependencies.
+
+Dependency instances can be used as dict keys and in sets, and provide a read-only dict-like interface,
+such that code that expects parsed dependencies to be dicts (e.g., easyblocks) keeps working.
+"""
+import copy
+
+from easybuild.tools.module_naming_scheme.utilities import det_full_ec_version
+from easybuild.tools.toolchain import DUMMY_TOOLCHAIN_NAME, DUMMY_TOOLCHAIN_VERSION
+
+
+class Dependency(object):
+    """Immutable, hashable representation of a parsed dependency."""
+
+    # keys available via dict-like interface (in this order), next to any additional keys
+    KEYS = ['name', 'version', 'versionsuffix', 'toolchain', 'dummy', 'short_mod_name', 'full_mod_name']
+
+    __slots__ = ['_name', '_version', '_versionsuffix', '_toolchain', '_dummy', '_short_mod_name', '_full_mod_name',
+                 '_extra', '_key', '_hash', '_full_version']
+
+    def __init__(self, name, version, versionsuffix='', toolchain=None, dummy=None, short_mod_name=None,
+                 full_mod_name=None, **extra):
+        """
+        Constructor
+        @param toolchain: dict with 'name' and 'version' keys (None implies dummy toolchain)
+        @param dummy: whether or not dependency uses dummy toolchain (None implies derived from toolchain)
+        @param extra: additional (non-standard) keys, which are not taken into account for equality/hashing
+        """
+        if toolchain is None:
+            toolchain = {'name': DUMMY_TOOLCHAIN_NAME, 'version': DUMMY_TOOLCHAIN_VERSION}
+        tc = (toolchain['name'], toolchain['version'])
+        if dummy is None:
+            dummy = tc[0] == DUMMY_TOOLCHAIN_NAME
+
+        key = (name, version, versionsuffix or '', tc)
+        for (attr, val) in [('name', name), ('version', version), ('versionsuffix', versionsuffix),
+                            ('toolchain', tc), ('dummy', dummy), ('short_mod_name', short_mod_name),
+                            ('full_mod_name', full_mod_name), ('extra', copy.deepcopy(extra)), ('key', key),
+                            ('hash', hash(key)), ('full_version', None)]:
+            object.__setattr__(self, '_%s' % attr, val)
+
+    @classmethod
+    def from_dict(cls, dep):
+        """Create Dependency instance from specified dict (or Dependency instance)."""
+        if isinstance(dep, Dependency):
+            return dep
+        else:
+            # keyword arguments must be non-unicode strings in Python 2
+            return cls(**dict([(str(key), val) for (key, val) in dep.items()]))
+
+    def __setattr__(self, attr, value):
+        """Dependency instances are immutable."""
+        raise AttributeError("Dependency instances are immutable, can't set attribute %s" % attr)
+
+    def __delattr__(self, attr):
+        """Dependency instances are immutable."""
+        raise AttributeError("Dependency instances are immutable, can't delete attribute %s" % attr)
+
+    @property
+    def full_version(self):
+        """Full version string, i.e. including toolchain and version suffix (e.g. 1.2.3-goalf-1.1.0-no-OFED)."""
+        if self._full_version is None:
+            object.__setattr__(self, '_full_version', det_full_ec_version(self))
+        return self._full_version
+
+    # dict-like (read-only) interface
+    def __getitem__(self, key):
+        """Get value for specified key."""
+        if key == 'toolchain':
+            return {'name': self._toolchain[0], 'version': self._toolchain[1]}
+        elif key in self.KEYS:
+            return getattr(self, '_%s' % key)
+        elif key in self._extra:
+            return copy.deepcopy(self._extra[key])
+        else:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        """Dependency instances are immutable."""
+        raise TypeError("Dependency instances are immutable, can't set %s (hint: use copy() to obtain a dict)" % key)
+
+    def get(self, key, default=None):
+        """Get value for specified key, with 'default' as fallback."""
+        if key in self:
+            return self[key]
+        else:
+            return default
+
+    def keys(self):
+        """Return list of available keys."""
+        return self.KEYS + sorted(self._extra.keys())
+
+    def values(self):
+        """Return list of values."""
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        """Return list of (key, value) tuples."""
+        return [(key, self[key]) for key in self.keys()]
+
+    def has_key(self, key):
+        """Check whether specified key is available."""
+        return key in self
+
+    def __contains__(self, key):
+        """Check whether specified key is available."""
+        return key in self.KEYS or key in self._extra
+
+    def __iter__(self):
+        """Iterate over available keys."""
+        return iter(self.keys())
+
+    def __len__(self):
+        """Number of available keys."""
+        return len(self.KEYS) + len(self._extra)
+
+    def copy(self):
+        """Return (mutable) dict representation of this dependency."""
+        return dict(self.items())
+
+    asdict = copy
+
+    # immutable, so (deep) copies can be the same instance
+    def __copy__(self):
+        """Return copy, which is this instance itself."""
+        return self
+
+    def __deepcopy__(self, memo):
+        """Return deep copy, which is this instance itself."""
+        return self
+
+    def __reduce__(self):
+        """Support for pickling."""
+        return (_from_items, (self.items(),))
+
+    def __eq__(self, other):
+        """
+        Compare with other Dependency instance (only name, version, version suffix and toolchain are relevant),
+        or with a dict (all keys are relevant).
+        """
+        if isinstance(other, Dependency):
+            return self._hash == other._hash and self._key == other._key
+        elif isinstance(other, dict):
+            return self.copy() == other
+        else:
+            return False
+
+    def __ne__(self, other):
+        """Check whether this dependency is different from the other one."""
+        return not self == other
+
+    def __hash__(self):
+        """Return (precomputed) hash."""
+        return self._hash
+
+    def __repr__(self):
+        """Dict-like string representation."""
+        return repr(self.copy())
+
+    __str__ = __repr__
+
+
+def _from_items(items):
+    """Create Dependency instance from list of (key, value) tuples (cfr. Dependency.__reduce__)."""
+    return Dependency.from_dict(dict(items))
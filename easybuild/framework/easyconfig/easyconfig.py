@@ -46,7 +46,7 @@ from vsc.utils.patterns import Singleton
 import easybuild.tools.environment as env
 from easybuild.tools.build_log import EasyBuildError
 from easybuild.tools.config import build_option, get_module_naming_scheme
-from easybuild.tools.filetools import decode_class_name, encode_class_name, read_file
+from easybuild.tools.filetools import decode_class_name, encode_class_name
 from easybuild.tools.module_naming_scheme import DEVEL_MODULE_SUFFIX
 from easybuild.tools.module_naming_scheme.utilities import avail_module_naming_schemes, det_full_ec_version
 from easybuild.tools.module_naming_scheme.utilities import is_valid_module_name
@@ -55,11 +55,12 @@ from easybuild.tools.systemtools import check_os_dependency
 from easybuild.tools.toolchain import DUMMY_TOOLCHAIN_NAME, DUMMY_TOOLCHAIN_VERSION
 from easybuild.tools.toolchain.utilities import get_toolchain
 from easybuild.tools.utilities import remove_unwanted_chars
-from easybuild.framework.easyconfig import MANDATORY
-from easybuild.framework.easyconfig.default import DEFAULT_CONFIG, ALL_CATEGORIES, get_easyconfig_parameter_default
-from easybuild.framework.easyconfig.format.convert import Dependency
-from easybuild.framework.easyconfig.format.one import retrieve_blocks_in_spec
+from easybuild.framework.easyconfig.default import DEFAULT_CONFIG, get_easyconfig_parameter_default
+from easybuild.framework.easyconfig.dependency import Dependency
+from easybuild.framework.easyconfig.format.convert import Dependency as DependencySpec
+from easybuild.framework.easyconfig.format.one import is_block_spec, read_easyconfig_spec, retrieve_blocks_in_spec
 from easybuild.framework.easyconfig.licenses import EASYCONFIG_LICENSES_DICT, License
+from easybuild.framework.easyconfig.parameters import MANDATORY_PARAMS, EasyConfigParameters, get_easyconfig_schema
 from easybuild.framework.easyconfig.parser import EasyConfigParser
 from easybuild.framework.easyconfig.templates import template_constant_dict
 
@@ -69,7 +70,6 @@ _log = fancylogger.getLogger('easyconfig.easyconfig', fname=False)
 
 # add license here to make it really MANDATORY (remove comment in default)
 _log.deprecated('Mandatory license not enforced', '2.0')
-MANDATORY_PARAMS = ['name', 'version', 'homepage', 'description', 'toolchain']
 
 # set of configure/build/install options that can be provided as lists for an iterated build
 ITERATE_OPTIONS = ['preconfigopts', 'configopts', 'prebuildopts', 'buildopts', 'preinstallopts', 'installopts']
@@ -101,6 +101,8 @@ def handle_deprecated_easyconfig_parameter(ec_method):
             lic = self._config['software_license']
             if not isinstance(lic, License):
                 self.log.deprecated('Type for software_license must to be instance of License (sub)class', '2.0')
+                # view on easyconfig parameter (cfr. EasyConfigParameters) to [value, description, category] list
+                lic = list(lic)
                 lic_type = type(lic)
 
                 class LicenseLegacy(License, lic_type):
@@ -140,7 +142,7 @@ class EasyConfig(object):
 
         self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
 
-        if not os.path.isfile(path):
+        if not (os.path.isfile(path) or is_block_spec(path)):
             self.log.error("EasyConfig __init__ expected a valid path")
 
         # use legacy module classes as default
@@ -148,11 +150,6 @@ class EasyConfig(object):
         if self.valid_module_classes is not None:
             self.log.info("Obtained list of valid module classes: %s" % self.valid_module_classes)
 
-        # replace the category name with the category
-        self._config = {}
-        for k, [def_val, descr, cat] in copy.deepcopy(DEFAULT_CONFIG).items():
-            self._config[k] = [def_val, descr, ALL_CATEGORIES[cat]]
-
         if extra_options is None:
             name = fetch_parameter_from_easyconfig_file(path, 'name')
             easyblock = fetch_parameter_from_easyconfig_file(path, 'easyblock')
@@ -180,15 +177,14 @@ class EasyConfig(object):
                 self.extra_options[new_key] = self.extra_options[key]
                 self.log.debug("Set '%s' with value of deprecated '%s': %s" % (new_key, key, self.extra_options[key]))
                 del self.extra_options[key]
-        self._config.update(self.extra_options)
 
-        self.path = path
-        self.mandatory = MANDATORY_PARAMS[:]
+        # default values, descriptions and categories of easyconfig parameters are shared via a schema,
+        # only the actual values are stored per instance
+        schema = get_easyconfig_schema(self.extra_options)
+        self._config = EasyConfigParameters(schema)
 
-        # extend mandatory keys
-        for key, value in self.extra_options.items():
-            if value[2] == MANDATORY:
-                self.mandatory.append(key)
+        self.path = path
+        self.mandatory = list(schema.mandatory)
 
         # set valid stops
         self.valid_stops = build_option('valid_stops')
@@ -517,13 +513,13 @@ class EasyConfig(object):
     # private method
     def _parse_dependency(self, dep):
         """
-        parses the dependency into a usable dict with a common format
+        parses the dependency into a (read-only) Dependency instance with a common format
         dep can be a dict, a tuple or a list.
         if it is a tuple or a list the attributes are expected to be in the following order:
         ('name', 'version', 'versionsuffix', 'toolchain')
         of these attributes, 'name' and 'version' are mandatory
 
-        output dict contains these attributes:
+        output Dependency instance provides these attributes (via a dict-like interface):
         ['name', 'version', 'versionsuffix', 'dummy', 'toolchain', 'short_mod_name', 'full_mod_name']
         """
         # convert tuple to string otherwise python might complain about the formatting
@@ -539,12 +535,12 @@ class EasyConfig(object):
             'version': '',
             'versionsuffix': '',
         }
-        if isinstance(dep, dict):
+        if isinstance(dep, (dict, Dependency)):
             dependency.update(dep)
             # make sure 'dummy' key is handled appropriately
             if 'dummy' in dep and not 'toolchain' in dep:
                 dependency['toolchain'] = dep['dummy']
-        elif isinstance(dep, Dependency):
+        elif isinstance(dep, DependencySpec):
             dependency['name'] = dep.name()
             dependency['version'] = dep.version()
             versionsuffix = dep.versionsuffix()
@@ -596,7 +592,7 @@ class EasyConfig(object):
         dependency['short_mod_name'] = ActiveMNS().det_short_module_name(dependency)
         dependency['full_mod_name'] = ActiveMNS().det_full_module_name(dependency)
 
-        return dependency
+        return Dependency.from_dict(dependency)
 
     def generate_template_values(self):
         """Try to generate all template values."""
@@ -688,7 +684,7 @@ def fetch_parameter_from_easyconfig_file(path, param):
     # check whether easyblock is specified in easyconfig file
     # note: we can't rely on value for 'easyblock' in parsed easyconfig, it may be the default value
     reg = re.compile(r"^\s*%s\s*=\s*(?P<param>\S.*)\s*$" % param, re.M)
-    txt = read_file(path)
+    txt = read_easyconfig_spec(path)
     res = reg.search(txt)
     if res:
         return res.group('param').strip("'\"")
@@ -855,6 +851,12 @@ def resolve_template(value, tmpl_dict):
             value = tuple(resolve_template(list(value), tmpl_dict))
         elif isinstance(value, dict):
             value = dict([(key, resolve_template(val, tmpl_dict)) for key, val in value.items()])
+        elif isinstance(value, Dependency):
+            # Dependency instances are immutable, so only create a new one if templating changed anything
+            items = value.items()
+            resolved = [(key, resolve_template(val, tmpl_dict)) for (key, val) in items]
+            if resolved != items:
+                value = Dependency.from_dict(dict(resolved))
 
     return value
 
@@ -866,15 +868,17 @@ def process_easyconfig(path, build_specs=None, validate=True, parse_only=False):
     @param build_specs: dictionary specifying build specifications (e.g. version, toolchain, ...)
     @param validate: whether or not to perform validation
     """
-    blocks = retrieve_blocks_in_spec(path, build_option('only_blocks'))
+    only_blocks = build_option('only_blocks')
 
     # only cache when no build specifications are involved (since those can't be part of a dict key)
     cache_key = None
     if build_specs is None:
-        cache_key = (path, validate, parse_only)
+        cache_key = (path, validate, parse_only, tuple(only_blocks or []))
         if cache_key in _easyconfigs_cache:
             return copy.deepcopy(_easyconfigs_cache[cache_key])
 
+    blocks = retrieve_blocks_in_spec(path, only_blocks)
+
     easyconfigs = []
     for spec in blocks:
         # process for dependencies and real installversionname
@@ -978,6 +982,14 @@ class ActiveMNS(object):
 
     __metaclass__ = Singleton
 
+    # marker for absent easyconfig parameters in module name cache keys,
+    # to distinguish them from None values (absent parameters may imply parsing the easyconfig file)
+    UNDEFINED = object()
+
+    # easyconfig parameters that affect the module name next to those required by the module naming scheme,
+    # since they determine the full version (cfr. det_full_ec_version)
+    CACHE_KEY_PARAMS = ['versionprefix', 'versionsuffix']
+
     def __init__(self, *args, **kwargs):
         """Initialize logger."""
         self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
@@ -991,6 +1003,64 @@ class ActiveMNS(object):
         else:
             self.log.error("Selected module naming scheme %s could not be found in %s" % (sel_mns, avail_mnss.keys()))
 
+        # cache for module names determined by module naming scheme (cfr. _det_module_name)
+        self.cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _cache_key(self, ec):
+        """
+        Determine key for module name cache, i.e. an immutable canonical form of the values for the easyconfig
+        parameters that are relevant to the active module naming scheme (cfr. REQUIRED_KEYS, CACHE_KEY_PARAMS).
+        Returns None if no such key can be determined.
+        """
+        def freeze(value):
+            """Return immutable (hashable) equivalent of specified value."""
+            if isinstance(value, dict):
+                return tuple(sorted([(key, freeze(val)) for (key, val) in value.items()]))
+            elif isinstance(value, (list, tuple)):
+                return tuple([freeze(val) for val in value])
+            else:
+                hash(value)
+                return value
+
+        key = None
+        if self.mns.REQUIRED_KEYS is not None:
+            try:
+                params = self.mns.REQUIRED_KEYS + [p for p in self.CACHE_KEY_PARAMS if p not in self.mns.REQUIRED_KEYS]
+                key = tuple([freeze(ec.get(param, self.UNDEFINED)) for param in params])
+            except TypeError, err:
+                self.log.debug("Failed to determine module name cache key for %s: %s" % (ec, err))
+        return key
+
+    def _det_module_name(self, method, ec):
+        """
+        Determine module name using specified method of module naming scheme, for the supplied easyconfig;
+        results are cached based on the easyconfig parameters that are relevant to the module naming scheme.
+        """
+        key = self._cache_key(ec)
+        if key is not None:
+            key = (method, key)
+            if key in self.cache:
+                self.cache_hits += 1
+                mod_name = self.cache[key]
+                self.log.debug("Obtained module name %s from cache for %s (cache hits/misses: %d/%d)" %
+                               (mod_name, ec, self.cache_hits, self.cache_misses))
+                return mod_name
+
+        self.cache_misses += 1
+        mod_name = getattr(self.mns, method)(self.check_ec_type(ec))
+        if key is not None:
+            self.cache[key] = mod_name
+
+        return mod_name
+
+    def clear_cache(self):
+        """Clear cache of module names, e.g. when (contents of) easyconfig files may have changed."""
+        self.log.debug("Clearing module name cache (%d entries, hits/misses: %d/%d)" %
+                       (len(self.cache), self.cache_hits, self.cache_misses))
+        self.cache.clear()
+
     def requires_full_easyconfig(self, keys):
         """Check whether specified list of easyconfig parameters is sufficient for active module naming scheme."""
         return self.mns.requires_toolchain_details() or not self.mns.is_sufficient(keys)
@@ -1025,7 +1095,7 @@ class ActiveMNS(object):
             - module name only contains printable characters (string.printable, except carriage-control chars)
         """
         self.log.debug("Determining full module name for %s" % ec)
-        mod_name = self.mns.det_full_module_name(self.check_ec_type(ec))
+        mod_name = self._det_module_name('det_full_module_name', ec)
 
         if not is_valid_module_name(mod_name):
             self.log.error("%s is not a valid full module name" % str(mod_name))
@@ -1041,7 +1111,7 @@ class ActiveMNS(object):
     def det_short_module_name(self, ec):
         """Determine module name according to module naming scheme."""
         self.log.debug("Determining module name for %s" % ec)
-        mod_name = self.mns.det_short_module_name(self.check_ec_type(ec))
+        mod_name = self._det_module_name('det_short_module_name', ec)
         if not is_valid_module_name(mod_name):
             self.log.error("%s is not a valid module name" % str(mod_name))
         else:
@@ -197,6 +197,13 @@ class EBConfigObj(object):
         self.sections = None  # all other sections
         self.unfiltered_sections = {}  # unfiltered other sections
 
+        # cache for squashed results, indexed by (version, tcname, tcversion)
+        self.squash_cache = {}
+        # all version/toolchain markers in the parsed sections, and squashed results indexed by which of them match
+        # (cfr. squash_signature); distinct versions/toolchains in the same ranges share the same squashed result
+        self.section_markers = []
+        self.squash_index = {}
+
         if configobj is not None:
             self.parse(configobj)
 
@@ -317,6 +324,8 @@ class EBConfigObj(object):
         self.configobj = configobj
 
         # process the configobj instance
+        self.squash_cache = {}
+        self.squash_index = {}
         self._init_sections()
         self.sections = self.parse_sections(self.configobj, self.sections)
 
@@ -351,10 +360,42 @@ class EBConfigObj(object):
 
         # TODO is it verified somewhere that the defaults are supported?
 
+        self.section_markers = self._collect_section_markers(self.sections)
+
         self.log.debug("(parse) supported: %s" % self.supported)
         self.log.debug("(parse) default: %s" % self.default)
         self.log.debug("(parse) sections: %s" % self.sections)
 
+    def _collect_section_markers(self, processed):
+        """
+        Return list of all version/toolchain version operators in (nested) sections, i.e. the section markers
+        and the entries of the 'versions'/'toolchains' lists
+        @param processed: easyconfig (Top)NestedDict
+        """
+        markers = []
+        for key, value in processed.items():
+            if isinstance(value, NestedDict):
+                markers.append(key)
+                markers.extend(self._collect_section_markers(value))
+            elif key in self.VERSION_OPERATOR_VALUE_TYPES:
+                markers.extend(value)
+        return markers
+
+    def squash_signature(self, vt_tuple):
+        """
+        Determine which of the version/toolchain markers in the parsed sections match the specified version/toolchain.
+        The result of squashing only depends on this, so it can be used to index squashed results.
+        @param vt_tuple: tuple with version, tcname (toolchain name) and tcversion (toolchain version)
+        """
+        version, tcname, tcversion = vt_tuple
+        signature = []
+        for marker in self.section_markers:
+            if isinstance(marker, ToolchainVersionOperator):
+                signature.append(marker.test(tcname, tcversion))
+            else:
+                signature.append(marker.test(version))
+        return tuple(signature)
+
     def squash(self, version, tcname, tcversion):
         """
         Project the multidimensional easyconfig to single easyconfig
@@ -364,6 +405,18 @@ class EBConfigObj(object):
         @param tcname: toolchain name to keep
         @param tcversion: toolchain version to keep
         """
+        vt_tuple = (version, tcname, tcversion)
+        if vt_tuple in self.squash_cache:
+            self.log.debug("Using cached squash result for %s" % str(vt_tuple))
+            # return a copy, since the result may be modified by the caller
+            return copy.deepcopy(self.squash_cache[vt_tuple])
+
+        signature = self.squash_signature(vt_tuple)
+        if signature in self.squash_index:
+            self.log.debug("Using squash result for %s, same section markers match as before" % str(vt_tuple))
+            self.squash_cache[vt_tuple] = self.squash_index[signature]
+            return copy.deepcopy(self.squash_index[signature])
+
         self.log.debug('Start squash with sections %s' % self.sections)
 
         # dictionary to keep track of all sections, to detect conflicts in the easyconfig
@@ -372,9 +425,10 @@ class EBConfigObj(object):
             'toolchains': {},
         }
 
-        vt_tuple = (version, tcname, tcversion)
         squashed = self._squash(vt_tuple, self.sections, sanity)
         result = squashed.final()
+        self.squash_cache[vt_tuple] = copy.deepcopy(result)
+        self.squash_index[signature] = self.squash_cache[vt_tuple]
 
         self.log.debug('End squash with result %s' % result)
         return result
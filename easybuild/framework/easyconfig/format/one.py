@@ -33,18 +33,24 @@ This is the original pure python code, to be exec'ed rather then parsed
 
 import os
 import re
-import tempfile
 from vsc.utils import fancylogger
 
 from easybuild.framework.easyconfig.format.format import FORMAT_DEFAULT_VERSION, get_format_version
 from easybuild.framework.easyconfig.format.pyheaderconfigobj import EasyConfigFormatConfigObj
 from easybuild.framework.easyconfig.format.version import EasyVersion
 from easybuild.tools.build_log import print_msg
-from easybuild.tools.filetools import write_file
+from easybuild.tools.filetools import read_file
 
 
 _log = fancylogger.getLogger('easyconfig.format.one', fname=False)
 
+# template for (stable) identifiers of blocks in easyconfig files, which are used instead of a path
+BLOCK_SPEC_TEMPLATE = '%(spec)s[%(block)s]'
+
+# (path to easyconfig file, block name, in-memory contents) of easyconfig blocks, indexed by block identifier
+# (cfr. retrieve_blocks_in_spec); only retained for the current session (cfr. clear_block_specs)
+_block_specs = {}
+
 
 class FormatOneZero(EasyConfigFormatConfigObj):
     """Support for easyconfig format 1.x"""
@@ -89,11 +95,43 @@ class FormatOneZero(EasyConfigFormatConfigObj):
         super(FormatOneZero, self).parse(txt, strict_section_markers=True)
 
 
+def clear_block_specs():
+    """Forget about blocks in easyconfig files that were retrieved before (e.g. at the start of a session)."""
+    _block_specs.clear()
+
+
+def is_block_spec(spec):
+    """Check whether specified easyconfig spec is a block in an easyconfig file (cfr. retrieve_blocks_in_spec)."""
+    return spec in _block_specs
+
+
+def read_easyconfig_spec(spec):
+    """Read contents of specified easyconfig file, or of the specified block in an easyconfig file."""
+    if spec in _block_specs:
+        return _block_specs[spec][2]
+    else:
+        return read_file(spec)
+
+
+def split_block_spec(spec):
+    """
+    Split specified block identifier into path to easyconfig file and block name.
+    Returns (spec, None) for specs that are not a block in an easyconfig file.
+    """
+    if spec in _block_specs:
+        return _block_specs[spec][:2]
+    else:
+        return (spec, None)
+
+
 def retrieve_blocks_in_spec(spec, only_blocks, silent=False):
     """
     Easyconfigs can contain blocks (headed by a [Title]-line)
     which contain commands specific to that block. Commands in the beginning of the file
     above any block headers are common and shared between each block.
+
+    Blocks are expanded in memory; they are identified by the path of the easyconfig file and the block name
+    (cfr. BLOCK_SPEC_TEMPLATE), and their contents can be obtained using read_easyconfig_spec.
     """
     reg_block = re.compile(r"^\s*\[([\w.-]+)\]\s*$", re.M)
     reg_dep_block = re.compile(r"^\s*block\s*=(\s*.*?)\s*$", re.M)
@@ -149,8 +187,7 @@ def retrieve_blocks_in_spec(spec, only_blocks, silent=False):
                 print_msg("Skipping block %s-%s" % (spec_fn, name), silent=silent)
                 continue
 
-            (fd, block_path) = tempfile.mkstemp(prefix='easybuild-', suffix='%s-%s' % (spec_fn, name))
-            os.close(fd)
+            block_spec = BLOCK_SPEC_TEMPLATE % {'spec': spec, 'block': name}
 
             txt = common
 
@@ -166,9 +203,9 @@ def retrieve_blocks_in_spec(spec, only_blocks, silent=False):
             txt += "\n# Main block %s" % name
             txt += block['contents']
 
-            write_file(block_path, txt)
+            _block_specs[block_spec] = (spec, name, txt)
 
-            specs.append(block_path)
+            specs.append(block_spec)
 
         _log.debug("Found %s block(s) in %s" % (len(specs), spec))
         return specs
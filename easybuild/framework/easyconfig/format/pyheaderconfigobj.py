@@ -105,6 +105,7 @@ class EasyConfigFormatConfigObj(EasyConfigFormat):
         super(EasyConfigFormatConfigObj, self).__init__(*args, **kwargs)
         self.pyheader_localvars = None
         self.configobj = None
+        self.section_block = None
 
     def parse(self, txt, strict_section_markers=False):
         """
@@ -245,6 +246,7 @@ class EasyConfigFormatConfigObj(EasyConfigFormat):
 
     def parse_section_block(self, section):
         """Parse the section block by trying to convert it into a ConfigObj instance"""
+        self.section_block = section
         try:
             self.configobj = ConfigObj(section.split('\n'))
         except SyntaxError, err:
@@ -39,6 +39,12 @@ from easybuild.framework.easyconfig.format.format import EBConfigObj
 from easybuild.framework.easyconfig.format.version import EasyVersion, ToolchainVersionOperator, VersionOperator
 
 
+# cache for EBConfigObj instances, indexed by section block text (cfr. FormatTwoZero.get_config_dict);
+# cache is emptied when it reaches the maximum size, to bound memory usage for long sessions
+_ebconfigobj_cache = {}
+EBCONFIGOBJ_CACHE_MAX_SIZE = 100
+
+
 class FormatTwoZero(EasyConfigFormatConfigObj):
     """
     Support for easyconfig format 2.0
@@ -104,7 +110,15 @@ class FormatTwoZero(EasyConfigFormatConfigObj):
         cfg = copy.deepcopy(self.pyheader_localvars)
         self.log.debug("Config dict based on Python header: %s" % cfg)
 
-        co = EBConfigObj(self.configobj)
+        # reuse EBConfigObj instance (incl. its cache of squashed results) for identical section blocks
+        if self.section_block in _ebconfigobj_cache:
+            co = _ebconfigobj_cache[self.section_block]
+        else:
+            co = EBConfigObj(self.configobj)
+            if self.section_block is not None:
+                if len(_ebconfigobj_cache) >= EBCONFIGOBJ_CACHE_MAX_SIZE:
+                    _ebconfigobj_cache.clear()
+                _ebconfigobj_cache[self.section_block] = co
 
         version = self.specs.get('version', None)
         tc_spec = self.specs.get('toolchain', {})
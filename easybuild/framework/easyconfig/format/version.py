@@ -29,6 +29,7 @@ This describes the easyconfig version class. To be used in EasyBuild for anythin
 @author: Stijn De Weirdt (Ghent University)
 @author: Kenneth Hoste (Ghent University)
 """
+import copy
 import operator as op
 import re
 from distutils.version import LooseVersion
@@ -40,6 +41,12 @@ from easybuild.tools.toolchain.utilities import search_toolchain
 # a cache for toolchain names lookups (defined at runtime).
 TOOLCHAIN_NAMES = {}
 
+# a cache for EasyVersion instances, indexed by version string (EasyVersion instances are not modified after creation)
+EASY_VERSIONS = {}
+
+# a cache for compiled version operator regular expressions
+VERSOP_REGEXES = {}
+
 
 class EasyVersion(LooseVersion):
     """Exact LooseVersion. No modifications needed (yet)"""
@@ -96,6 +103,16 @@ class VersionOperator(object):
         if not versop_str is None:
             self.set(versop_str)
 
+    def __deepcopy__(self, memo):
+        """Return a deep copy, which shares the (immutable) compiled regex and the logger."""
+        res = self.__class__.__new__(self.__class__)
+        memo[id(self)] = res
+        for (key, val) in self.__dict__.items():
+            if key not in ['log', 'regex']:
+                val = copy.deepcopy(val, memo)
+            res.__dict__[key] = val
+        return res
+
     def parse_error(self, msg):
         """Special function to deal with parse errors"""
         # TODO major issue what to do in case of misparse. error or not?
@@ -192,6 +209,10 @@ class VersionOperator(object):
         or '<= 1.2' (anything smaller than or equal to 1.2)
         @param begin_end: boolean, create a regex with begin/end match
         """
+        key = (VersionOperator, self.SEPARATOR, self.DICT_SEPARATOR, tuple(sorted(self.OPERATOR_MAP)), begin_end)
+        if key in VERSOP_REGEXES:
+            return VERSOP_REGEXES[key]
+
         # construct escaped operator symbols, e.g. '\<\='
         operators = []
         for operator in self.OPERATOR_MAP.keys():
@@ -217,6 +238,7 @@ class VersionOperator(object):
         if begin_end:
             reg_text = r"^%s$" % reg_text
         reg = re.compile(reg_text)
+        VERSOP_REGEXES[key] = reg
 
         self.log.debug("versop regex pattern '%s' (begin_end: %s)" % (reg.pattern, begin_end))
         return reg
@@ -227,9 +249,12 @@ class VersionOperator(object):
         if version_str is None:
             version = self.DEFAULT_UNDEFINED_VERSION
             self.log.warning('_convert: version_str None, set it to DEFAULT_UNDEFINED_VERSION %s' % version)
+        elif version_str in EASY_VERSIONS:
+            version = EASY_VERSIONS[version_str]
         else:
             try:
                 version = EasyVersion(version_str)
+                EASY_VERSIONS[version_str] = version
             except (AttributeError, ValueError), err:
                 self.parse_error('Failed to convert %s to an EasyVersion instance: %s' % (version_str, err))
 
@@ -506,10 +531,15 @@ class ToolchainVersionOperator(VersionOperator):
         tc_names = self._get_all_toolchain_names()
         self.log.debug("found toolchain names %s" % tc_names)
 
+        key = (ToolchainVersionOperator, self.SEPARATOR, tuple(tc_names))
+        if key in VERSOP_REGEXES:
+            return VERSOP_REGEXES[key]
+
         versop_regex = super(ToolchainVersionOperator, self).versop_regex(begin_end=False)
         versop_pattern = r'(?P<versop_str>%s)' % versop_regex.pattern
         tc_names_regex = r'(?P<tc_name>(?:%s))' % '|'.join(tc_names)
         tc_regex = re.compile(r'^%s(?:%s%s)?$' % (tc_names_regex, self.SEPARATOR, versop_pattern))
+        VERSOP_REGEXES[key] = tc_regex
 
         self.log.debug("toolchain versop regex pattern %s " % tc_regex.pattern)
         return tc_regex
@@ -0,0 +1,230 @@
+#
+# Copyright 2014 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Easyconfig module that provides the representation of easyconfig parameters:
+a schema (default values, descriptions, categories) that is shared between EasyConfig instances that use
+the same set of extra options, and a per-instance store for the actual values.
+"""
+import copy
+
+from vsc.utils import fancylogger
+
+from easybuild.framework.easyconfig import MANDATORY
+from easybuild.framework.easyconfig.default import ALL_CATEGORIES, DEFAULT_CONFIG
+
+_log = fancylogger.getLogger('easyconfig.parameters', fname=False)
+
+# list of mandatory easyconfig parameters (extended with mandatory extra options, cfr. EasyConfigSchema)
+MANDATORY_PARAMS = ['name', 'version', 'homepage', 'description', 'toolchain']
+
+# cache of schemas, indexed by (canonical representation of) extra options
+_schemas = {}
+
+
+class EasyConfigSchema(object):
+    """
+    Read-only specification of easyconfig parameters: default value, description and category for each parameter,
+    and the list of mandatory parameters.
+    """
+    __slots__ = ['params', 'mandatory']
+
+    def __init__(self, extra_options):
+        """
+        Constructor
+        @param extra_options: dict with extra options, i.e. [default, description, category] list per parameter
+        """
+        params = {}
+        for (key, (def_val, descr, cat)) in DEFAULT_CONFIG.items():
+            params[key] = (copy.deepcopy(def_val), descr, ALL_CATEGORIES[cat])
+        for (key, (def_val, descr, cat)) in extra_options.items():
+            params[key] = (copy.deepcopy(def_val), descr, cat)
+        self.params = params
+
+        mandatory = MANDATORY_PARAMS[:]
+        mandatory.extend([key for (key, val) in extra_options.items() if val[2] == MANDATORY])
+        self.mandatory = tuple(mandatory)
+
+
+def get_easyconfig_schema(extra_options):
+    """Return (shared) schema for easyconfig parameters, for the specified extra options."""
+    key = tuple(sorted([(key, repr(val)) for (key, val) in extra_options.items()]))
+    if key not in _schemas:
+        _log.debug("Creating new schema for easyconfig parameters with extra options %s" % extra_options.keys())
+        _schemas[key] = EasyConfigSchema(extra_options)
+    return _schemas[key]
+
+
+class EasyConfigParameter(object):
+    """
+    View on a single easyconfig parameter, that behaves like a [value, description, category] list.
+    Only the value can be changed.
+    """
+    __slots__ = ['store', 'key']
+
+    def __init__(self, store, key):
+        """Constructor: specify parameter store (EasyConfigParameters instance) and parameter name."""
+        self.store = store
+        self.key = key
+
+    def __getitem__(self, index):
+        """Get value (index 0), description (index 1) or category (index 2), or a slice thereof."""
+        return self.aslist()[index]
+
+    def __setitem__(self, index, value):
+        """Set value of parameter (index 0)."""
+        if index == 0:
+            self.store.set_value(self.key, value)
+        else:
+            raise TypeError("Only the value of easyconfig parameter %s can be changed" % self.key)
+
+    def aslist(self):
+        """Return [value, description, category] list for this parameter."""
+        (_, descr, cat) = self.store.schema.params[self.key]
+        return [self.store.get_value(self.key), descr, cat]
+
+    def __iter__(self):
+        """Iterate over value, description and category."""
+        return iter(self.aslist())
+
+    def __len__(self):
+        """Value, description and category."""
+        return 3
+
+    def __eq__(self, other):
+        """Compare with [value, description, category] list (or another view)."""
+        if isinstance(other, EasyConfigParameter):
+            other = other.aslist()
+        return isinstance(other, (list, tuple)) and self.aslist() == list(other)
+
+    def __ne__(self, other):
+        """Check whether this parameter is different from the other one."""
+        return not self == other
+
+    def __repr__(self):
+        """List-like string representation."""
+        return repr(self.aslist())
+
+
+class EasyConfigParameters(object):
+    """
+    Dict-like store for easyconfig parameters, mapping parameter names to [value, description, category] lists.
+
+    Descriptions, categories and default values are obtained from the (shared) schema; only the values of parameters
+    that were set or accessed are stored per instance (default values are copied on first access, since they may be
+    modified in place). Parameters that are not part of the schema can be added as well.
+    """
+
+    def __init__(self, schema):
+        """Constructor: specify schema for easyconfig parameters (EasyConfigSchema instance)."""
+        self.schema = schema
+        self._values = {}
+        # parameters that are not part of the schema, as [value, description, category] lists
+        self._extra = {}
+
+    def get_value(self, key):
+        """Get value of specified parameter."""
+        if key in self._extra:
+            return self._extra[key][0]
+        elif key not in self._values:
+            # raises KeyError for unknown parameters
+            self._values[key] = copy.deepcopy(self.schema.params[key][0])
+        return self._values[key]
+
+    def set_value(self, key, value):
+        """Set value of specified parameter."""
+        if key in self._extra:
+            self._extra[key][0] = value
+        elif key in self.schema.params:
+            self._values[key] = value
+        else:
+            raise KeyError(key)
+
+    def __getitem__(self, key):
+        """Return [value, description, category] list (view) for specified parameter."""
+        if key in self._extra:
+            return self._extra[key]
+        elif key in self.schema.params:
+            return EasyConfigParameter(self, key)
+        else:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        """Define parameter with specified [value, description, category] list."""
+        known = key in self.schema.params and not key in self._extra
+        if known and type(value) in (list, tuple) and list(value[1:]) == list(self.schema.params[key][1:]):
+            self._values[key] = value[0]
+        else:
+            self._values.pop(key, None)
+            self._extra[key] = value
+
+    def __contains__(self, key):
+        """Check whether specified parameter is known."""
+        return key in self._extra or key in self.schema.params
+
+    has_key = __contains__
+
+    def get(self, key, default=None):
+        """Get [value, description, category] list for specified parameter, with 'default' as fallback."""
+        if key in self:
+            return self[key]
+        else:
+            return default
+
+    def keys(self):
+        """Return list of known parameters."""
+        return self.schema.params.keys() + [key for key in self._extra if key not in self.schema.params]
+
+    def __iter__(self):
+        """Iterate over known parameters."""
+        return iter(self.keys())
+
+    def __len__(self):
+        """Number of known parameters."""
+        return len(self.keys())
+
+    def items(self):
+        """Return list of (parameter name, [value, description, category]) tuples."""
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        """Return list of [value, description, category] lists."""
+        return [self[key] for key in self.keys()]
+
+    def update(self, params):
+        """Update with specified dict of [value, description, category] lists."""
+        for (key, value) in params.items():
+            self[key] = value
+
+    def __deepcopy__(self, memo):
+        """Return a deep copy, which shares the schema."""
+        res = EasyConfigParameters(self.schema)
+        res._values = copy.deepcopy(self._values, memo)
+        res._extra = copy.deepcopy(self._extra, memo)
+        return res
+
+    def __repr__(self):
+        """Dict-like string representation."""
+        return repr(dict([(key, self[key]) for key in self.keys()]))
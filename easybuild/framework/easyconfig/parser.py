@@ -34,12 +34,19 @@ from vsc.utils import fancylogger
 
 from easybuild.framework.easyconfig.format.format import FORMAT_DEFAULT_VERSION
 from easybuild.framework.easyconfig.format.format import get_format_version, get_format_version_classes
+from easybuild.framework.easyconfig.format.one import is_block_spec, read_easyconfig_spec
+from easybuild.tools.build_log import EasyBuildError
 from easybuild.tools.filetools import read_file, write_file
 
 
 _log = fancylogger.getLogger('easyconfig.parser', fname=False)
 
 
+def write_block_spec(spec, txt):
+    """Blocks in an easyconfig file only exist in memory, so they can not be written back."""
+    raise EasyBuildError("Can't write %s, blocks in an easyconfig file only exist in memory" % spec)
+
+
 class EasyConfigParser(object):
     """Read the easyconfig file, return a parsed config object
         Can contain references to multiple version and toolchain/toolchain versions
@@ -71,6 +78,10 @@ class EasyConfigParser(object):
         if os.path.isfile(fn):
             self.get_fn = (read_file, (fn,))
             self.set_fn = (write_file, (fn, self.rawcontent))
+        elif is_block_spec(fn):
+            # block in an easyconfig file, only available in memory
+            self.get_fn = (read_easyconfig_spec, (fn,))
+            self.set_fn = (write_block_spec, (fn, self.rawcontent))
 
         self.log.debug("Process filename %s with get function %s, set function %s" % (fn, self.get_fn, self.set_fn))
 
@@ -36,9 +36,11 @@ alongside the EasyConfig class to represent parsed easyconfig files.
 @author: Fotis Georgatos (University of Luxembourg)
 """
 
+import inspect
 import os
 import sys
 from vsc.utils import fancylogger
+from vsc.utils.missing import all
 
 # optional Python packages, these might be missing
 # failing imports are just ignored
@@ -65,18 +67,25 @@ try:
 except ImportError, err:
     graph_errors.append("Failed to import graphviz: try yum install graphviz-python, or apt-get install python-pygraphviz")
 
+from easybuild.framework.easyconfig.dependency import Dependency
 from easybuild.framework.easyconfig.easyconfig import ActiveMNS
+from easybuild.framework.easyconfig.easyconfig import fetch_parameter_from_easyconfig_file, get_easyblock_class
 from easybuild.framework.easyconfig.easyconfig import process_easyconfig, robot_find_easyconfig
+from easybuild.framework.easyconfig.format.one import read_easyconfig_spec
 from easybuild.tools.build_log import EasyBuildError, print_msg
-from easybuild.tools.config import build_option
-from easybuild.tools.filetools import det_common_path_prefix, run_cmd, write_file
+from easybuild.tools.config import build_option, install_path, log_path
+from easybuild.tools.filetools import det_common_path_prefix, read_file, run_cmd, sha1_class, write_file
 from easybuild.tools.module_naming_scheme.easybuild_mns import EasyBuildMNS
 from easybuild.tools.module_naming_scheme.utilities import det_full_ec_version
 from easybuild.tools.modules import modules_tool
 from easybuild.tools.ordereddict import OrderedDict
+from easybuild.tools.toolchain import DUMMY_TOOLCHAIN_NAME
 
 _log = fancylogger.getLogger('easyconfig.tools', fname=False)
 
+# name of file in easybuild subdirectory of installation directory in which fingerprint is recorded
+FINGERPRINT_FILENAME = 'easybuild-fingerprint.txt'
+
 
 def skip_available(easyconfigs, testing=False):
     """Skip building easyconfigs for which a module is already available."""
@@ -94,19 +103,165 @@ def skip_available(easyconfigs, testing=False):
     return easyconfigs
 
 
+def det_installdir(ec):
+    """Determine installation directory for specified easyconfig/dependency, cfr. EasyBlock.gen_installdir."""
+    return os.path.abspath(os.path.join(install_path(), ActiveMNS().det_full_module_name(ec)))
+
+
+def read_fingerprint(installdir):
+    """Return fingerprint recorded for installation in specified directory (or None if none was recorded)."""
+    fingerprint = None
+    fp_path = os.path.join(installdir, log_path(), FINGERPRINT_FILENAME)
+    if os.path.isfile(fp_path):
+        fingerprint = read_file(fp_path).strip()
+    return fingerprint
+
+
+def det_easyblock_fingerprint(ec, spec):
+    """Determine fingerprint for (the source code of) the easyblock that will be used to install the easyconfig."""
+    easyblock = build_option('easyblock')
+    if not easyblock:
+        easyblock = fetch_parameter_from_easyconfig_file(spec, 'easyblock')
+    app_class = get_easyblock_class(easyblock, name=ec['name'])
+
+    # only take into account actual easyblocks (incl. generic ones) the used easyblock derives from,
+    # a change in the framework itself should not invalidate every installation
+    checksum = sha1_class()
+    for cls in inspect.getmro(app_class):
+        if cls.__module__.startswith('easybuild.easyblocks'):
+            src_path = inspect.getsourcefile(cls)
+            checksum.update(cls.__module__)
+            if src_path is not None:
+                checksum.update(read_file(src_path))
+    return checksum.hexdigest()
+
+
+def det_fingerprint(ec, spec, dep_fingerprints=None):
+    """
+    Determine fingerprint for installation of specified easyconfig: a hash of the easyconfig file contents,
+    the easyblock source code, the toolchain and the fingerprints of all dependencies.
+    @param ec: EasyConfig instance
+    @param spec: path to easyconfig file
+    @param dep_fingerprints: dictionary with (expected) fingerprints for dependencies, by full module name;
+                             if a dependency is not listed, the fingerprint recorded for its installation is used
+    """
+    if dep_fingerprints is None:
+        dep_fingerprints = {}
+
+    deps = ec.dependencies()
+    if ec.toolchain.name != DUMMY_TOOLCHAIN_NAME:
+        deps.append(ec.toolchain.as_dict())
+
+    dep_fps = []
+    for dep in deps:
+        dep_mod_name = ActiveMNS().det_full_module_name(dep)
+        dep_fp = dep_fingerprints.get(dep_mod_name, None)
+        if dep_fp is None:
+            dep_fp = read_fingerprint(det_installdir(dep))
+        dep_fps.append("%s:%s" % (dep_mod_name, dep_fp))
+
+    checksum = sha1_class()
+    checksum.update(read_easyconfig_spec(spec))
+    checksum.update(det_easyblock_fingerprint(ec, spec))
+    checksum.update("%s/%s" % (ec['toolchain']['name'], ec['toolchain']['version']))
+    checksum.update(','.join(sorted(dep_fps)))
+    fingerprint = checksum.hexdigest()
+
+    _log.debug("Fingerprint for %s: %s (dependencies: %s)" % (spec, fingerprint, dep_fps))
+    return fingerprint
+
+
+def skip_up_to_date(easyconfigs, testing=False):
+    """
+    Skip building easyconfigs for which an up-to-date installation is available, i.e. for which the recorded
+    fingerprint matches the fingerprint for the current easyconfig, easyblock, toolchain and dependencies.
+    Easyconfigs must be ordered such that dependencies are listed first (cfr. resolve_dependencies),
+    so that any installation that is rebuilt also invalidates the installations that depend on it.
+    """
+    fingerprints = {}
+    easyconfigs, check_easyconfigs = [], easyconfigs
+    for ec in check_easyconfigs:
+        module = ec['full_mod_name']
+        fingerprint = det_fingerprint(ec['ec'], ec['spec'], dep_fingerprints=fingerprints)
+        fingerprints[module] = fingerprint
+
+        recorded_fingerprint = read_fingerprint(det_installdir(ec['ec']))
+        if fingerprint == recorded_fingerprint:
+            msg = "%s is already installed and up-to-date (fingerprint %s), skipping" % (module, fingerprint)
+            print_msg(msg, log=_log, silent=testing)
+        else:
+            tup = (module, recorded_fingerprint, fingerprint)
+            _log.info("Installation for %s is stale (fingerprint %s, expected %s), so retaining it" % tup)
+            easyconfigs.append(ec)
+    return easyconfigs
+
+
+def find_archived_easyconfigs():
+    """
+    Find existing installations in the software installation path, along with the easyconfig file that was archived
+    in the easybuild subdirectory of each of them (cfr. build_and_install_one).
+    Returns a list of (path to archived easyconfig file, installation directory) tuples.
+    """
+    res = []
+    for (dirpath, dirnames, _) in os.walk(install_path()):
+        if log_path() in dirnames:
+            ec_dir = os.path.join(dirpath, log_path())
+            ec_files = [os.path.join(ec_dir, fn) for fn in os.listdir(ec_dir) if fn.endswith('.eb')]
+            if ec_files:
+                # most recently archived easyconfig file wins, in case a previous installation was kept
+                ec_files.sort(key=lambda path: os.stat(path).st_mtime)
+                res.append((ec_files[-1], os.path.abspath(dirpath)))
+                # no need to descend into installation directories
+                dirnames[:] = []
+
+    _log.debug("Found %d installations with an archived easyconfig file in %s" % (len(res), install_path()))
+    return sorted(res)
+
+
+def group_by_dependency_level(easyconfigs):
+    """
+    Group easyconfigs in successive levels, such that (only) dependencies that are part of an earlier level are
+    included for each easyconfig. Easyconfigs in the same level are independent of each other.
+    """
+    mod_names = set([ec['full_mod_name'] for ec in easyconfigs])
+    done = set()
+
+    levels = []
+    unprocessed = easyconfigs
+    while unprocessed:
+        level, new_unprocessed = [], []
+        for ec in unprocessed:
+            deps = [ActiveMNS().det_full_module_name(dep) for dep in ec['dependencies']]
+            if all([dep in done or not dep in mod_names for dep in deps]):
+                level.append(ec)
+            else:
+                new_unprocessed.append(ec)
+
+        if not level:
+            _log.error("Circular dependencies found for %s" % [ec['full_mod_name'] for ec in new_unprocessed])
+
+        levels.append(level)
+        done.update([ec['full_mod_name'] for ec in level])
+        unprocessed = new_unprocessed
+
+    return levels
+
+
 def find_resolved_modules(unprocessed, avail_modules):
     """
     Find easyconfigs in 1st argument which can be fully resolved using modules specified in 2nd argument
     """
     ordered_ecs = []
     new_avail_modules = avail_modules[:]
+    # set of available modules, for fast membership checks
+    avail_modules_set = set(new_avail_modules)
     new_unprocessed = []
 
     for ec in unprocessed:
         new_ec = ec.copy()
         deps = []
         for dep in new_ec['dependencies']:
-            if not ActiveMNS().det_full_module_name(dep) in new_avail_modules:
+            if not ActiveMNS().det_full_module_name(dep) in avail_modules_set:
                 deps.append(dep)
         new_ec['dependencies'] = deps
 
@@ -114,6 +269,7 @@ def find_resolved_modules(unprocessed, avail_modules):
             _log.debug("Adding easyconfig %s to final list" % new_ec['spec'])
             ordered_ecs.append(new_ec)
             new_avail_modules.append(ec['full_mod_name'])
+            avail_modules_set.add(ec['full_mod_name'])
 
         else:
             new_unprocessed.append(new_ec)
@@ -144,13 +300,18 @@ def resolve_dependencies(unprocessed, build_specs=None, retain_all_deps=False):
 
     ordered_ecs = []
     # all available modules can be used for resolving dependencies except those that will be installed
-    being_installed = [p['full_mod_name'] for p in unprocessed]
+    being_installed = set([p['full_mod_name'] for p in unprocessed])
     avail_modules = [m for m in avail_modules if not m in being_installed]
 
     _log.debug('unprocessed before resolving deps: %s' % unprocessed)
 
+    # module names of easyconfigs in final list, for fast membership checks
+    ordered_mod_names = set()
+
     # resolve all dependencies, put a safeguard in place to avoid an infinite loop (shouldn't occur though)
     irresolvable = []
+    # set of irresolvable dependencies (as Dependency instances, which are hashable), for fast membership checks
+    irresolvable_set = set()
     loopcnt = 0
     maxloopcnt = 10000
     while unprocessed:
@@ -167,8 +328,9 @@ def resolve_dependencies(unprocessed, build_specs=None, retain_all_deps=False):
             last_processed_count = len(avail_modules)
             more_ecs, unprocessed, avail_modules = find_resolved_modules(unprocessed, avail_modules)
             for ec in more_ecs:
-                if not ec['full_mod_name'] in [x['full_mod_name'] for x in ordered_ecs]:
+                if not ec['full_mod_name'] in ordered_mod_names:
                     ordered_ecs.append(ec)
+                    ordered_mod_names.add(ec['full_mod_name'])
 
         # robot: look for existing dependencies, add them
         if robot and unprocessed:
@@ -176,9 +338,11 @@ def resolve_dependencies(unprocessed, build_specs=None, retain_all_deps=False):
             # rely on EasyBuild module naming scheme when resolving dependencies, since we know that will
             # generate sensible module names that include the necessary information for the resolution to work
             # (name, version, toolchain, versionsuffix)
-            being_installed = [EasyBuildMNS().det_full_module_name(p['ec']) for p in unprocessed]
+            being_installed = set([EasyBuildMNS().det_full_module_name(p['ec']) for p in unprocessed])
 
             additional = []
+            # module names of easyconfigs that are already queued for processing
+            queued_mod_names = set([p['full_mod_name'] for p in unprocessed])
             for i, entry in enumerate(unprocessed):
                 # do not choose an entry that is being installed in the current run
                 # if they depend, you probably want to rebuild them using the new dependency
@@ -193,9 +357,10 @@ def resolve_dependencies(unprocessed, build_specs=None, retain_all_deps=False):
 
                     if path is None:
                         # no easyconfig found for dependency, add to list of irresolvable dependencies
-                        if cand_dep not in irresolvable:
+                        if Dependency.from_dict(cand_dep) not in irresolvable_set:
                             _log.debug("Irresolvable dependency found: %s" % cand_dep)
                             irresolvable.append(cand_dep)
+                            irresolvable_set.add(Dependency.from_dict(cand_dep))
                         # remove irresolvable dependency from list of dependencies so we can continue
                         entry['dependencies'].remove(cand_dep)
                     else:
@@ -212,8 +377,9 @@ def resolve_dependencies(unprocessed, build_specs=None, retain_all_deps=False):
                             _log.error("easyconfig file %s does not contain module %s (mods: %s)" % tup)
 
                         for ec in processed_ecs:
-                            if not ec in unprocessed + additional:
+                            if not ec['full_mod_name'] in queued_mod_names:
                                 additional.append(ec)
+                                queued_mod_names.add(ec['full_mod_name'])
                                 _log.debug("Added %s as dependency of %s" % (ec, entry))
                 else:
                     mod_name = EasyBuildMNS().det_full_module_name(entry['ec'])
@@ -44,8 +44,9 @@ from vsc.utils.missing import nub
 
 from easybuild.tools.build_log import print_error, print_msg, print_warning
 from easybuild.framework.easyconfig.easyconfig import EasyConfig, create_paths, process_easyconfig
+from easybuild.framework.easyconfig.format.one import read_easyconfig_spec
 from easybuild.framework.easyconfig.tools import resolve_dependencies
-from easybuild.tools.filetools import read_file, write_file
+from easybuild.tools.filetools import write_file
 from easybuild.tools.module_naming_scheme.utilities import det_full_ec_version
 from easybuild.tools.toolchain import DUMMY_TOOLCHAIN_NAME
 from easybuild.tools.utilities import quote_str
@@ -116,8 +117,8 @@ def tweak_one(src_fn, target_fn, tweaks):
     the tweaked easyconfig file.
     """
 
-    # read easyconfig file
-    ectxt = read_file(src_fn)
+    # read easyconfig file (or block in easyconfig file)
+    ectxt = read_easyconfig_spec(src_fn)
 
     _log.debug("Contents of original easyconfig file, prior to tweaking:\n%s" % ectxt)
     # determine new toolchain if it's being changed
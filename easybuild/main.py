@@ -50,17 +50,22 @@ from easybuild.tools.build_log import EasyBuildError, print_msg, print_error
 
 import easybuild.tools.config as config
 import easybuild.tools.options as eboptions
-from easybuild.framework.easyblock import EasyBlock, build_and_install_one
+from easybuild.framework.easyblock import EasyBlock, build_and_install_one, regenerate_module_one
 from easybuild.framework.easyconfig.easyconfig import process_easyconfig
-from easybuild.framework.easyconfig.tools import dep_graph, get_paths_for, print_dry_run
-from easybuild.framework.easyconfig.tools import resolve_dependencies, skip_available
+from easybuild.framework.easyconfig.format.one import clear_block_specs
+from easybuild.framework.easyconfig.tools import dep_graph, find_archived_easyconfigs, get_paths_for
+from easybuild.framework.easyconfig.tools import group_by_dependency_level, print_dry_run
+from easybuild.framework.easyconfig.tools import resolve_dependencies, skip_available, skip_up_to_date
 from easybuild.framework.easyconfig.tweak import obtain_path, tweak
 from easybuild.tools.config import get_repository, module_classes, get_repositorypath, set_tmpdir
-from easybuild.tools.filetools import cleanup, find_easyconfigs, search_file, write_file
+from easybuild.tools.filetools import cleanup, find_easyconfigs, search_file, wait_for_async_removals, write_file
 from easybuild.tools.github import fetch_easyconfigs_from_pr
+from easybuild.tools.modules import modules_tool
 from easybuild.tools.options import process_software_build_specs
-from easybuild.tools.parallelbuild import build_easyconfigs_in_parallel
+from easybuild.tools.parallelbuild import JOB_SUCCESS, build_easyconfigs_in_parallel
+from easybuild.tools.process import map_in_processes
 from easybuild.tools.repository.repository import init_repository
+from easybuild.tools.systemtools import get_avail_core_count
 from easybuild.tools.testing import create_test_report, post_easyconfigs_pr_test_report, upload_test_report_as_gist
 from easybuild.tools.testing import regtest, session_module_list, session_state
 from easybuild.tools.toolchain import DUMMY_TOOLCHAIN_NAME
@@ -69,6 +74,10 @@ from easybuild.tools.version import this_is_easybuild  # from a single location
 
 _log = None
 
+# maximum time (in seconds) to wait for build directories being removed in the background at the end of the session,
+# removals that are still pending after that are handed off to a detached process
+ASYNC_REMOVALS_TIMEOUT = 60
+
 
 def build_and_install_software(ecs, init_session_state, exit_on_failure=True):
     """Build and install software for all provided parsed easyconfig files."""
@@ -116,6 +125,53 @@ def build_and_install_software(ecs, init_session_state, exit_on_failure=True):
     return res
 
 
+def regenerate_modules(testing=False):
+    """
+    Regenerate module files for all existing installations, using the easyconfig files archived in the installation
+    directories, without rebuilding anything. Installations are processed in parallel (one per available core),
+    level by level such that the module files for dependencies are regenerated first.
+    """
+    # environment is copied, since it is modified when regenerating module files in this process
+    orig_environ = copy.deepcopy(os.environ)
+
+    installdirs = {}
+    ecs, failed = [], []
+    for (spec, installdir) in find_archived_easyconfigs():
+        try:
+            ecs.extend(process_easyconfig(spec, validate=False))
+            installdirs[spec] = installdir
+        except EasyBuildError, err:
+            failed.append((spec, err.msg))
+
+    max_procs = get_avail_core_count()
+    _log.info("Regenerating module files for %d installations, using up to %d processes" % (len(ecs), max_procs))
+
+    mod_files, regenerated = [], []
+    for level in group_by_dependency_level(ecs):
+        regen = lambda ec: regenerate_module_one(ec, installdirs[ec['spec']], orig_environ)
+        for (ec, (ok, res)) in zip(level, map_in_processes(regen, level, max_procs)):
+            if ok:
+                (success, ec_mod_files, err) = res
+            else:
+                (success, err) = (False, res)
+
+            if success:
+                print_msg("Regenerated module file for %s" % ec['full_mod_name'], log=_log, silent=testing)
+                mod_files.extend(ec_mod_files)
+                regenerated.append(ec['spec'])
+            else:
+                failed.append((ec['spec'], err))
+
+    # module files were added in separate processes, so make sure modules tool is up-to-date in this one
+    modules_tool().update(mod_files=mod_files)
+
+    for (spec, err) in failed:
+        print_msg("Failed to regenerate module file using %s: %s" % (spec, err), log=_log, silent=testing)
+
+    tup = (len(regenerated), len(regenerated) + len(failed))
+    print_msg("Regenerated module files for %d out of %d installations" % tup, log=_log, silent=testing)
+
+
 def main(testing_data=(None, None, None)):
     """
     Main function:
@@ -139,6 +195,9 @@ def main(testing_data=(None, None, None)):
     testing = testing_data[0] is not None
     args, logfile, do_build = testing_data
 
+    # blocks in easyconfig files are only retained in memory for the current session
+    clear_block_specs()
+
     # initialise options
     eb_go = eboptions.parse_options(args=args)
     options = eb_go.options
@@ -232,7 +291,12 @@ def main(testing_data=(None, None, None)):
         'check_osdeps': not options.ignore_osdeps,
         'filter_deps': options.filter_deps,
         'cleanup_builddir': options.cleanup_builddir,
+        'cleanup_builddir_async': options.cleanup_builddir_async,
+        'cleanup_builddir_max_rate': options.cleanup_builddir_max_rate,
         'command_line': eb_command_line,
+        'compiler_cache': options.compiler_cache,
+        'compiler_cache_dir': options.compiler_cache_dir,
+        'compiler_cache_max_size': options.compiler_cache_max_size,
         'debug': options.debug,
         'dry_run': options.dry_run or options.dry_run_short,
         'easyblock': options.easyblock,
@@ -241,12 +305,26 @@ def main(testing_data=(None, None, None)):
         'github_user': options.github_user,
         'group': options.group,
         'ignore_dirs': options.ignore_dirs,
+        'job_backend': options.job_backend,
+        'job_default_mem': options.job_default_mem,
+        'job_default_walltime': options.job_default_walltime,
+        'job_max_jobs': options.job_max_jobs,
+        'job_mem_factor': options.job_mem_factor,
+        'job_merge_chains': options.job_merge_chains,
+        'job_merge_max_time': options.job_merge_max_time,
+        'job_merge_siblings': options.job_merge_siblings,
+        'job_poll_interval': options.job_poll_interval,
+        'job_retries': options.job_retries,
+        'job_retry_policy': options.job_retry_policy,
+        'job_walltime_factor': options.job_walltime_factor,
         'modules_footer': options.modules_footer,
+        'module_syntax': options.module_syntax,
         'only_blocks': options.only_blocks,
         'optarch': options.optarch,
         'recursive_mod_unload': options.recursive_module_unload,
         'regtest_output_dir': options.regtest_output_dir,
         'retain_all_deps': retain_all_deps,
+        'resource_sample_interval': options.resource_sample_interval,
         'robot_path': robot_path,
         'sequential': options.sequential,
         'silent': testing,
@@ -261,6 +339,7 @@ def main(testing_data=(None, None, None)):
         'valid_module_classes': module_classes(),
         'valid_stops': [x[0] for x in EasyBlock.get_steps()],
         'validate': not options.force,
+        'wait': options.wait,
     })
 
     # obtain list of loaded modules, build options must be initialized first
@@ -278,6 +357,12 @@ def main(testing_data=(None, None, None)):
         silent = config.build_option('silent')
         search_file(search_path, query, short=not options.search, ignore_dirs=ignore_dirs, silent=silent)
 
+    # regenerate module files for existing installations and exit
+    if options.regenerate_modules:
+        regenerate_modules(testing=testing)
+        cleanup(logfile, eb_tmpdir, testing)
+        sys.exit(0)
+
     paths = []
     if len(orig_paths) == 0:
         if options.from_pr:
@@ -382,14 +467,21 @@ def main(testing_data=(None, None, None)):
         cleanup(logfile, eb_tmpdir, testing)
         sys.exit(0)
 
+    # only rebuild stale installations if requested (and not forced to rebuild everything)
+    rebuild_stale = options.rebuild_stale and not options.force
+
     # skip modules that are already installed unless forced
-    if not options.force:
+    if not (options.force or rebuild_stale):
         easyconfigs = skip_available(easyconfigs, testing=testing)
 
     # determine an order that will allow all specs in the set to build
     if len(easyconfigs) > 0:
         print_msg("resolving dependencies ...", log=_log, silent=testing)
-        ordered_ecs = resolve_dependencies(easyconfigs, build_specs=build_specs)
+        # retain all dependencies that can be resolved via the robot, to determine which part of the graph is stale
+        retain_deps = bool(rebuild_stale and robot_path)
+        ordered_ecs = resolve_dependencies(easyconfigs, build_specs=build_specs, retain_all_deps=retain_deps)
+        if rebuild_stale:
+            ordered_ecs = skip_up_to_date(ordered_ecs, testing=testing)
     else:
         print_msg("No easyconfigs left to be built.", log=_log, silent=testing)
         ordered_ecs = []
@@ -405,7 +497,7 @@ def main(testing_data=(None, None, None)):
         curdir = os.getcwd()
 
         # the options to ignore (help options can't reach here)
-        ignore_opts = ['robot', 'job']
+        ignore_opts = ['robot', 'job', 'wait']
 
         # generate_cmd_line returns the options in form --longopt=value
         opts = [x for x in eb_go.generate_cmd_line() if not x.split('=')[0] in ['--%s' % y for y in ignore_opts]]
@@ -416,6 +508,12 @@ def main(testing_data=(None, None, None)):
         _log.info("Command template for jobs: %s" % command)
         if not testing:
             jobs = build_easyconfigs_in_parallel(command, ordered_ecs)
+            if options.wait:
+                # summary of jobs was already printed after waiting for them to complete
+                failed = [job for job in jobs if job.status != JOB_SUCCESS]
+                cleanup(logfile, eb_tmpdir, testing)
+                sys.exit(int(bool(failed)))
+
             txt = ["List of submitted jobs:"]
             txt.extend(["%s (%s): %s" % (job.name, job.module, job.jobid) for job in jobs])
             txt.append("(%d jobs submitted)" % len(jobs))
@@ -431,6 +529,9 @@ def main(testing_data=(None, None, None)):
     else:
         ecs_with_res = [(ec, {}) for ec in ordered_ecs]
 
+    # wait for build directories that are being removed in the background (for a limited amount of time)
+    wait_for_async_removals(timeout=ASYNC_REMOVALS_TIMEOUT)
+
     correct_builds_cnt = len([ec_res for (_, ec_res) in ecs_with_res if ec_res.get('success', False)])
     overall_success = correct_builds_cnt == len(ordered_ecs)
     success_msg = "Build succeeded for %s out of %s" % (correct_builds_cnt, len(ordered_ecs))
@@ -459,11 +560,6 @@ def main(testing_data=(None, None, None)):
 
     print_msg(success_msg, log=_log, silent=testing)
 
-    # cleanup and spec files
-    for ec in easyconfigs:
-        if 'original_spec' in ec and os.path.isfile(ec['spec']):
-            os.remove(ec['spec'])
-
     # cleanup tmp log file, unless one build failed (individual logs are located in eb_tmpdir path)
     if options.logtostdout:
         fancylogger.logToScreen(enable=False, stdout=True)
@@ -29,7 +29,6 @@ and allow for reproducable builds
 @author: Stijn De Weirdt (Ghent University)
 """
 import time
-from easybuild.tools.filetools import det_size
 from easybuild.tools.ordereddict import OrderedDict
 from easybuild.tools.systemtools import get_system_info
 from easybuild.tools.version import EASYBLOCKS_VERSION, FRAMEWORK_VERSION
@@ -43,15 +42,39 @@ def get_build_stats(app, start_time, command_line):
     time_now = time.time()
     build_time = round(time_now - start_time, 2)
 
+    # results of scanning the installation directory while adjusting permissions are reused,
+    # the devel module file written in the installation directory by make_module_step is already included
+    install_tree = app.scan_installdir()
+
     buildstats = OrderedDict([
         ('easybuild-framework_version', str(FRAMEWORK_VERSION)),
         ('easybuild-easyblocks_version', str(EASYBLOCKS_VERSION)),
         ('timestamp', int(time_now)),
         ('build_time', build_time),
-        ('install_size', det_size(app.installdir)),
+        ('install_size', install_tree['size']),
+        ('install_file_count', install_tree['file_count']),
+        ('install_inode_count', install_tree['inode_count']),
+        ('install_largest_files', install_tree['largest_files'][:5]),
+        ('install_broken_symlinks', install_tree['broken_symlinks']),
         ('command_line', command_line),
         ('modules_tool', app.modules_tool.buildstats()),
     ])
+    # resources consumed during build (if they were monitored)
+    if app.resource_monitor is not None:
+        resource_usage = app.resource_monitor.summary()
+        buildstats.update([
+            ('peak_rss', resource_usage['peak_rss']),
+            ('cpu_time', resource_usage['cpu_time']),
+            ('read_bytes', resource_usage['read_bytes']),
+            ('write_bytes', resource_usage['write_bytes']),
+            ('resource_usage_per_step', resource_usage['steps']),
+        ])
+
+    # compiler cache statistics (if a compiler cache was used)
+    compiler_cache_stats = app.toolchain.compiler_cache_stats()
+    if compiler_cache_stats is not None:
+        buildstats.update([('compiler_cache', compiler_cache_stats)])
+
     for key, val in sorted(get_system_info().items()):
         buildstats.update({key: val})
 
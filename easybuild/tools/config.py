@@ -74,7 +74,12 @@ DEFAULT_BUILD_OPTIONS = {
     'check_osdeps': True,
     'filter_deps': None,
     'cleanup_builddir': True,
+    'cleanup_builddir_async': False,
+    'cleanup_builddir_max_rate': None,
     'command_line': None,
+    'compiler_cache': None,
+    'compiler_cache_dir': None,
+    'compiler_cache_max_size': None,
     'debug': False,
     'dry_run': False,
     'easyblock': None,
@@ -83,12 +88,26 @@ DEFAULT_BUILD_OPTIONS = {
     'github_user': None,
     'group': None,
     'ignore_dirs': None,
+    'job_backend': 'PbsPython',
+    'job_default_mem': None,
+    'job_default_walltime': None,
+    'job_max_jobs': 0,
+    'job_mem_factor': None,
+    'job_merge_chains': True,
+    'job_merge_max_time': None,
+    'job_merge_siblings': False,
+    'job_poll_interval': None,
+    'job_retries': None,
+    'job_retry_policy': None,
+    'job_walltime_factor': None,
     'modules_footer': None,
+    'module_syntax': 'Tcl',
     'only_blocks': None,
     'optarch': None,
     'recursive_mod_unload': False,
     'regtest_output_dir': None,
     'retain_all_deps': False,
+    'resource_sample_interval': None,
     'robot_path': None,
     'sequential': False,
     'set_gid_bit': False,
@@ -103,6 +122,7 @@ DEFAULT_BUILD_OPTIONS = {
     'valid_module_classes': None,
     'valid_stops': None,
     'validate': True,
+    'wait': False,
 }
 
 
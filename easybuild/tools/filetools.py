@@ -33,11 +33,17 @@ Set of file tools.
 @author: Toon Willems (Ghent University)
 @author: Ward Poelmans (Ghent University)
 """
+import Queue
+import atexit
 import errno
+import heapq
 import os
 import re
 import shutil
 import stat
+import subprocess
+import tempfile
+import threading
 import time
 import urllib
 import zlib
@@ -114,6 +120,11 @@ CHECKSUM_FUNCTIONS = {
     'size': lambda p: os.path.getsize(p),
 }
 
+# pending asynchronous removals (cfr. remove_dir_async), as (path, thread) tuples
+_async_removals = []
+# event used to interrupt pending asynchronous removals
+_async_removals_stop = threading.Event()
+
 
 class ZlibChecksum(object):
     """
@@ -669,18 +680,11 @@ def convert_name(name, upper=False):
         return name
 
 
-def adjust_permissions(name, permissionBits, add=True, onlyfiles=False, onlydirs=False, recursive=True,
-                       group_id=None, relative=True, ignore_errors=False):
-    """
-    Add or remove (if add is False) permissionBits from all files (if onlydirs is False)
-    and directories (if onlyfiles is False) in path
-    """
-
-    name = os.path.abspath(name)
+def _paths_to_adjust(name, onlyfiles=False, onlydirs=False, recursive=True):
+    """Generator for paths of which the permissions should be adjusted (cfr. adjust_permissions)."""
+    yield name
 
     if recursive:
-        _log.info("Adjusting permissions recursively for %s" % name)
-        allpaths = [name]
         for root, dirs, files in os.walk(name):
             paths = []
             if not onlydirs:
@@ -689,61 +693,153 @@ def adjust_permissions(name, permissionBits, add=True, onlyfiles=False, onlydirs
                 paths += dirs
 
             for path in paths:
-                allpaths.append(os.path.join(root, path))
+                yield os.path.join(root, path)
+
 
+def _adjust_path_permissions(path, rules, group_id=None, path_lstat=None):
+    """
+    Adjust permissions of a single path according to the specified rules, using a single stat call;
+    chmod/chown are only done when the permissions/group ID are not correct yet.
+    @param path_lstat: result of lstat for path (if available), reused unless path is a symbolic link
+    @return: tuple with booleans indicating whether permissions and/or group ID were changed
+    """
+    if path_lstat is None or stat.S_ISLNK(path_lstat.st_mode):
+        path_stat = os.stat(path)
     else:
-        _log.info("Adjusting permissions for %s" % name)
-        allpaths = [name]
+        path_stat = path_lstat
+    perms = stat.S_IMODE(path_stat.st_mode)
+
+    new_perms = perms
+    for (bits, add) in rules:
+        if add is None:
+            new_perms = bits
+        elif add:
+            new_perms |= bits
+        else:
+            new_perms &= ~bits
 
-    failed_paths = []
-    fail_cnt = 0
-    for path in allpaths:
+    chmod_done, chown_done = False, False
+    if new_perms != perms:
+        os.chmod(path, new_perms)
+        chmod_done = True
 
-        try:
-            if relative:
+    # only change the group id if it the current gid is different from what we want
+    if group_id and not path_stat.st_gid == group_id:
+        os.chown(path, -1, group_id)
+        chown_done = True
 
-                # relative permissions (add or remove)
-                perms = os.stat(path)[stat.ST_MODE]
+    return (chmod_done, chown_done)
 
-                if add:
-                    os.chmod(path, perms | permissionBits)
-                else:
-                    os.chmod(path, perms & ~permissionBits)
 
-            else:
-                # hard permissions bits (not relative)
-                os.chmod(path, permissionBits)
-
-            if group_id:
-                # only change the group id if it the current gid is different from what we want
-                cur_gid = os.stat(path).st_gid
-                if not cur_gid == group_id:
-                    _log.debug("Changing group id of %s to %s" % (path, group_id))
-                    os.chown(path, -1, group_id)
-                else:
-                    _log.debug("Group id of %s is already OK (%s)" % (path, group_id))
+def apply_permission_rules(name, rules, onlyfiles=False, onlydirs=False, recursive=True, group_id=None,
+                           ignore_errors=False, threads=1, scan=None):
+    """
+    Apply list of permission rules to all files (if onlydirs is False) and directories (if onlyfiles is False) in path,
+    in a single pass over the directory tree.
+    @param rules: list of (permission bits, add) tuples, which are applied in order;
+                  add should be True (add bits), False (remove bits) or None (set permissions to specified bits)
+    @param group_id: group ID to change ownership to (if any)
+    @param ignore_errors: ignore errors for individual paths, unless (way) too many occur
+    @param threads: number of threads to use, to hide latency of metadata operations (e.g. on network filesystems)
+    @param scan: DirScan instance for name, to scan the directory tree in the same pass (cfr. scan_dir)
+    """
+    name = os.path.abspath(name)
+    if scan is not None and (onlyfiles or onlydirs or not recursive or scan.path != name):
+        _log.error("Scanning %s while adjusting permissions requires walking over all of %s" % (scan.path, name))
+    _log.info("Adjusting permissions for %s (recursive: %s, rules: %s, group ID: %s, threads: %s)" %
+              (name, recursive, rules, group_id, threads))
+
+    counts = {
+        'chmod': 0,
+        'chown': 0,
+        'paths': 0,
+    }
+    errors = []
 
+    lock = threading.Lock()
+
+    def adjust_path(path):
+        """Adjust permissions for a single path, and keep track of what was done."""
+        chmod_done, chown_done, error = False, False, None
+        path_lstat = None
+        if scan is not None and path != name:
+            path_lstat = scan.add(path)
+        try:
+            chmod_done, chown_done = _adjust_path_permissions(path, rules, group_id=group_id, path_lstat=path_lstat)
         except OSError, err:
-            if ignore_errors:
-                # ignore errors while adjusting permissions (for example caused by bad links)
-                _log.info("Failed to chmod/chown %s (but ignoring it): %s" % (path, err))
-                fail_cnt += 1
-            else:
-                failed_paths.append(path)
+            error = err
+
+        lock.acquire()
+        try:
+            counts['chmod'] += int(chmod_done)
+            counts['chown'] += int(chown_done)
+            counts['paths'] += 1
+            if error is not None:
+                errors.append((path, error))
+        finally:
+            lock.release()
+
+    paths = _paths_to_adjust(name, onlyfiles=onlyfiles, onlydirs=onlydirs, recursive=recursive)
+    if threads > 1:
+        # use bounded queue, so walking the directory tree doesn't run too far ahead of the workers
+        path_queue = Queue.Queue(maxsize=1000 * threads)
+
+        def worker():
+            """Adjust permissions for paths obtained from queue, until None is encountered."""
+            path = path_queue.get()
+            while path is not None:
+                adjust_path(path)
+                path = path_queue.get()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.setDaemon(True)
+            thread.start()
+        for path in paths:
+            path_queue.put(path)
+        for _ in workers:
+            path_queue.put(None)
+        for thread in workers:
+            thread.join()
+    else:
+        for path in paths:
+            adjust_path(path)
+
+    tup = (counts['chmod'], counts['chown'], counts['paths'], name)
+    _log.info("Changed permissions for %d and group ID for %d out of %d paths in %s" % tup)
 
-    if failed_paths:
-        _log.error("Failed to chmod/chown several paths: %s (last error: %s)" % (failed_paths, err))
+    if errors:
+        if ignore_errors:
+            # ignore errors while adjusting permissions (for example caused by bad links)
+            for (path, err) in errors:
+                _log.info("Failed to chmod/chown %s (but ignoring it): %s" % (path, err))
+        else:
+            _log.error("Failed to chmod/chown several paths: %s (last error: %s)" % ([p for (p, _) in errors],
+                                                                                      errors[-1][1]))
 
     # we ignore some errors, but if there are to many, something is definitely wrong
-    fail_ratio = fail_cnt / float(len(allpaths))
+    fail_ratio = len(errors) / float(counts['paths'])
     max_fail_ratio = 0.5
     if fail_ratio > max_fail_ratio:
         _log.error("%.2f%% of permissions/owner operations failed (more than %.2f%%), something must be wrong..." %
                   (100 * fail_ratio, 100 * max_fail_ratio))
-    elif fail_cnt > 0:
+    elif errors:
         _log.debug("%.2f%% of permissions/owner operations failed, ignoring that..." % (100 * fail_ratio))
 
 
+def adjust_permissions(name, permissionBits, add=True, onlyfiles=False, onlydirs=False, recursive=True,
+                       group_id=None, relative=True, ignore_errors=False, threads=1):
+    """
+    Add or remove (if add is False) permissionBits from all files (if onlydirs is False)
+    and directories (if onlyfiles is False) in path
+    """
+    if not relative:
+        # hard permissions bits (not relative)
+        add = None
+    apply_permission_rules(name, [(permissionBits, add)], onlyfiles=onlyfiles, onlydirs=onlydirs,
+                           recursive=recursive, group_id=group_id, ignore_errors=ignore_errors, threads=threads)
+
+
 def patch_perl_script_autoflush(path):
     # patch Perl script to enable autoflush,
     # so that e.g. run_cmd_qa receives all output to answer questions
@@ -834,6 +930,108 @@ def rmtree2(path, n=3):
         _log.info("Path %s successfully removed." % path)
 
 
+def _remove_dir_throttled(path, max_rate=None, stop=None):
+    """
+    Remove directory at specified path (bottom-up), removing at most max_rate files/directories per second.
+    Removal is interrupted if the stop event (if any) is set.
+    @return: True if removal was completed, False otherwise
+    """
+    start_time = time.time()
+    cnt = 0
+    for (dirpath, dirnames, filenames) in os.walk(path, topdown=False):
+        entries = [(os.path.join(dirpath, f), os.unlink) for f in filenames]
+        # symlinks to directories are listed in dirnames, but should be unlinked rather than rmdir'ed
+        for dirname in dirnames:
+            fullpath = os.path.join(dirpath, dirname)
+            if os.path.islink(fullpath):
+                entries.append((fullpath, os.unlink))
+            else:
+                entries.append((fullpath, os.rmdir))
+
+        for (entry, remove) in entries:
+            if stop is not None and stop.isSet():
+                _log.debug("Removal of %s interrupted after removing %d entries" % (path, cnt))
+                return False
+            try:
+                remove(entry)
+            except OSError, err:
+                _log.debug("Failed to remove %s: %s" % (entry, err))
+            cnt += 1
+
+            # throttle removal rate if requested, to limit the load on the (parallel) filesystem
+            if max_rate:
+                ahead = cnt / float(max_rate) - (time.time() - start_time)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+    # remove top-level directory and whatever could not be removed one by one
+    shutil.rmtree(path, ignore_errors=True)
+    _log.info("Path %s successfully removed in background (%d entries)" % (path, cnt))
+    return not os.path.exists(path)
+
+
+def remove_dir_async(path, trash_dir, max_rate=None):
+    """
+    Remove directory asynchronously: it is moved (atomically) to the specified trash directory first,
+    which should be located on the same filesystem, and then removed in a background thread.
+    @param path: directory to remove
+    @param trash_dir: directory to move path to before removing it
+    @param max_rate: maximum number of files/directories to remove per second (None or 0 implies no limit)
+    """
+    mkdir(trash_dir, parents=True)
+    trash_path = tempfile.mkdtemp(prefix='%s.' % os.path.basename(path), dir=trash_dir)
+    try:
+        os.rename(path, os.path.join(trash_path, os.path.basename(path)))
+    except OSError, err:
+        _log.warning("Failed to move %s to %s, removing it synchronously: %s" % (path, trash_path, err))
+        os.rmdir(trash_path)
+        rmtree2(path)
+        return
+
+    _log.info("Moved %s to %s, removing it in the background" % (path, trash_path))
+
+    thread = threading.Thread(target=_remove_dir_throttled, args=(trash_path,),
+                              kwargs={'max_rate': max_rate, 'stop': _async_removals_stop})
+    thread.setDaemon(True)
+    thread.start()
+    _async_removals.append((trash_path, thread))
+
+
+def wait_for_async_removals(timeout=None):
+    """
+    Wait for pending asynchronous removals (cfr. remove_dir_async), for at most timeout seconds (None implies no limit);
+    removals that are still pending after that are handed off to a detached process.
+    """
+    if _async_removals:
+        _log.info("Waiting for %d pending removals (timeout: %s)" % (len(_async_removals), timeout))
+
+    start_time = time.time()
+    for (_, thread) in _async_removals:
+        if timeout is None:
+            thread.join()
+        else:
+            thread.join(max(0, timeout - (time.time() - start_time)))
+
+    # interrupt removals that are still ongoing, and hand them off to a detached process
+    _async_removals_stop.set()
+    for (trash_path, thread) in _async_removals:
+        thread.join()
+        if os.path.exists(trash_path):
+            _log.info("Handing off removal of %s to detached process" % trash_path)
+            try:
+                subprocess.Popen(['rm', '-rf', trash_path], close_fds=True, preexec_fn=os.setsid,
+                                 stdin=open(os.devnull), stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+            except OSError, err:
+                _log.warning("Failed to hand off removal of %s: %s" % (trash_path, err))
+
+    del _async_removals[:]
+    _async_removals_stop.clear()
+
+
+# make sure pending removals are handed off when EasyBuild exits
+atexit.register(wait_for_async_removals, timeout=0)
+
+
 def cleanup(logfile, tempdir, testing):
     """Cleanup the specified log file and the tmp directory"""
     if not testing and logfile is not None:
@@ -1002,3 +1200,144 @@ def det_size(path):
         _log.warn("Could not determine install size: %s" % err)
 
     return installsize
+
+
+class DirScan(object):
+    """
+    Results of scanning a directory tree (cfr. scan_dir), collected one entry at a time;
+    entries can be added from several threads at once (e.g., while adjusting permissions, cfr. apply_permission_rules).
+    """
+
+    def __init__(self, path, max_largest_files=10):
+        """
+        Constructor
+        @param path: path to top-level directory being scanned
+        @param max_largest_files: number of largest files to keep track of
+        """
+        self.path = os.path.abspath(path)
+        self.max_largest_files = max_largest_files
+
+        self.counts = {
+            'size': 0,
+            'file_count': 0,
+            'dir_count': 0,
+            'symlink_count': 0,
+        }
+        self.broken_symlinks = []
+        self.paths = {}
+        self.inodes = set()
+        self.largest_files = []
+
+        self.lock = threading.Lock()
+
+    def add(self, path):
+        """
+        Add entry at specified path (which should be located in the directory tree being scanned), using a single lstat.
+        Returns result of lstat for path (None if it failed), so it can be reused.
+        """
+        path = os.path.abspath(path)
+        # relative path (without using os.path.relpath, only available in Python 2.6 and more recent)
+        rel_path = path[len(self.path) + 1:]
+        try:
+            path_stat = os.lstat(path)
+        except OSError, err:
+            _log.warning("Failed to stat %s: %s" % (path, err))
+            return None
+
+        mode = path_stat.st_mode
+        broken_symlink = False
+        if stat.S_ISLNK(mode):
+            # determine whether symlink is broken, and what it points to
+            try:
+                mode = os.stat(path).st_mode
+            except OSError:
+                broken_symlink = True
+
+        self.lock.acquire()
+        try:
+            if rel_path in self.paths or rel_path in self.broken_symlinks:
+                # already scanned
+                return path_stat
+
+            if stat.S_ISLNK(path_stat.st_mode):
+                self.counts['symlink_count'] += 1
+                if broken_symlink:
+                    self.broken_symlinks.append(rel_path)
+                else:
+                    self.paths[rel_path] = stat.S_ISDIR(mode)
+                return path_stat
+
+            self.paths[rel_path] = stat.S_ISDIR(mode)
+
+            inode = (path_stat.st_dev, path_stat.st_ino)
+            if inode in self.inodes:
+                return path_stat
+            self.inodes.add(inode)
+
+            if stat.S_ISDIR(mode):
+                self.counts['dir_count'] += 1
+            elif stat.S_ISREG(mode):
+                self.counts['file_count'] += 1
+                self.counts['size'] += path_stat.st_size
+                # keep track of largest files, using a heap of limited size
+                entry = (path_stat.st_size, rel_path)
+                if len(self.largest_files) < self.max_largest_files:
+                    heapq.heappush(self.largest_files, entry)
+                elif self.max_largest_files > 0 and entry > self.largest_files[0]:
+                    # replace smallest of largest files (heapq.heappushpop requires Python 2.6)
+                    heapq.heapreplace(self.largest_files, entry)
+        finally:
+            self.lock.release()
+
+        return path_stat
+
+    def walk(self):
+        """Add all entries in the directory tree being scanned."""
+        if not os.path.isdir(self.path):
+            _log.warning("Can't scan %s, not an existing directory" % self.path)
+            return
+
+        def walk_error(err):
+            """Log error that occurs while walking the directory tree."""
+            _log.warning("Error while scanning %s: %s" % (self.path, err))
+
+        for (dirpath, dirnames, filenames) in os.walk(self.path, onerror=walk_error):
+            for name in dirnames + filenames:
+                self.add(os.path.join(dirpath, name))
+
+    def result(self):
+        """Return results of scanning directory tree (cfr. scan_dir)."""
+        self.lock.acquire()
+        try:
+            res = dict(self.counts)
+            res.update({
+                'inode_count': len(self.inodes),
+                'largest_files': [(rel_path, size) for (size, rel_path) in sorted(self.largest_files, reverse=True)],
+                'broken_symlinks': self.broken_symlinks[:],
+                'paths': self.paths.copy(),
+            })
+        finally:
+            self.lock.release()
+        return res
+
+
+def scan_dir(path, max_largest_files=10):
+    """
+    Scan directory tree at given path in a single pass, using a single lstat per entry.
+    Returns a dictionary with:
+    - size: total size of all regular files (in bytes), hard links are only counted once
+    - file_count, dir_count, symlink_count: number of (regular) files, directories and symbolic links
+    - inode_count: number of unique inodes
+    - largest_files: list of (relative path, size) tuples for largest files (largest first)
+    - broken_symlinks: list of relative paths for broken symbolic links
+    - paths: dictionary with relative path as key for all existing entries, value indicates whether it's a directory
+    """
+    scan = DirScan(path, max_largest_files=max_largest_files)
+    scan.walk()
+
+    res = scan.result()
+    tup = (scan.path, res['size'], res['file_count'], res['dir_count'], res['symlink_count'],
+           len(res['broken_symlinks']))
+    _log.info("Scanned %s: %d bytes in %d files, %d directories, %d symlinks (%d broken)" % tup)
+
+    return res
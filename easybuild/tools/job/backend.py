@@ -0,0 +1,103 @@
+# #
+# Copyright 2014 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Generic support for job backends, which are used to submit jobs (cfr. --job).
+
+A job backend creates job objects via make_job, which provide the following interface (cfr. PbsJob):
+  - 'name', 'jobid' (None until the job is submitted) and 'deps' (list of job ids) attributes
+  - add_dependencies(job_ids): make the job depend on the specified (submitted) jobs; a job only starts when all
+                               of its dependencies have finished (regardless of whether they were successful)
+  - submit(with_hold=False): submit the job, optionally with a (user) hold placed on it
+  - has_holds() and release_hold(): check for/release (user) hold placed on the job
+  - state(): return state of the job, i.e. one of 'not submitted', 'queued', 'running' or 'finished'
+             (use the job_states method of the job backend to determine the state of multiple jobs at once)
+  - remove(): remove the job (which stops it if it is running)
+  - cleanup(): clean up after submitting the job
+"""
+from vsc.utils import fancylogger
+from vsc.utils.missing import get_subclasses
+
+from easybuild.tools.config import build_option
+from easybuild.tools.utilities import import_available_modules
+
+
+_log = fancylogger.getLogger('job.backend', fname=False)
+
+
+class JobBackend(object):
+    """
+    Interface for job backends
+    """
+
+    USABLE = True  # can the job backend be used?
+
+    def __init__(self):
+        """Constructor."""
+        self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
+
+    def init(self):
+        """Initialise job backend, before any jobs are created (e.g., connect to server)."""
+        pass
+
+    def make_job(self, script, name, env_vars=None, resources=None):
+        """
+        Create a job (which is not submitted yet)
+        @param script: job script (shell command) to run
+        @param name: name for the job
+        @param env_vars: dictionary with environment variables to pass on to the job
+        @param resources: dictionary with requested resources (optional keys: 'hours', 'cores')
+        """
+        raise NotImplementedError
+
+    def job_states(self, jobs):
+        """
+        Determine state of specified jobs (cfr. state method of jobs), as a dict indexed by job id;
+        job backends should override this to determine the state of all jobs at once (e.g., using a single query).
+        """
+        return dict([(job.jobid, job.state()) for job in jobs])
+
+    def complete(self):
+        """Complete using job backend, after all jobs were submitted and holds were released (e.g., disconnect)."""
+        pass
+
+
+def avail_job_backends(check_usable=True):
+    """
+    Return all known job backends.
+    @param check_usable: boolean, if True, only return usable job backends
+    """
+    import_available_modules('easybuild.tools.job')
+    class_dict = dict([(x.__name__, x) for x in get_subclasses(JobBackend) if x.USABLE or not check_usable])
+    return class_dict
+
+
+def job_backend():
+    """Return instance of the job backend specified via the 'job_backend' build option."""
+    name = build_option('job_backend')
+    job_backend_class = avail_job_backends().get(name)
+    if job_backend_class is None:
+        known = sorted(avail_job_backends(check_usable=False).keys())
+        _log.error("Unknown or unusable job backend specified: %s (known job backends: %s)" % (name, known))
+    return job_backend_class()
@@ -0,0 +1,273 @@
+# #
+# Copyright 2014 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Job backend that runs jobs as processes on the current host, without requiring a batch system.
+
+Jobs are started in the order in which they were submitted, as soon as all of their dependencies have finished and
+no holds are placed on them, while respecting a limit on the number of jobs that run simultaneously
+(cfr. --job-max-jobs).
+Output of each job is written to <job name>.o<job id> in the directory from which it was submitted.
+"""
+import os
+import signal
+import socket
+import subprocess
+import time
+from vsc.utils.missing import all
+
+from easybuild.tools.config import build_option
+from easybuild.tools.job.backend import JobBackend
+from easybuild.tools.systemtools import get_avail_core_count
+
+
+# interval (in seconds) between checks for finished jobs while waiting for jobs to complete
+POLL_INTERVAL = 0.1
+
+# (only) type of hold that can be placed on local jobs
+USER_HOLD = 'u'
+
+
+class LocalJob(object):
+    """Job that runs as a process on the current host (cfr. PbsJob)."""
+
+    def __init__(self, backend, script, name, env_vars=None, resources=None):
+        """
+        Create a new job, to be run as a process by the specified (Local) job backend
+        @param backend: Local job backend instance that manages this job
+        @param script: job script (shell command) to run
+        @param name: name for the job
+        @param env_vars: dictionary with environment variables to pass on to the job
+        @param resources: dictionary with requested resources (ignored, only the number of jobs is limited)
+        """
+        self.backend = backend
+        self.log = backend.log
+        self.script = script
+        self.name = name
+        if env_vars:
+            self.env_vars = env_vars.copy()
+        else:
+            self.env_vars = {}
+        if resources:
+            self.resources = resources.copy()
+        else:
+            self.resources = {}
+
+        # job id of this job
+        self.jobid = None
+        # list of dependencies for this job
+        self.deps = []
+        # list of holds that are placed on this job
+        self.holds = []
+
+        self.workdir = None
+        self.output_file = None
+        self.proc = None
+        self.exit_code = None
+        self.removed = False
+
+    def add_dependencies(self, job_ids):
+        """
+        Add dependencies to this job.
+        @param job_ids: list of ids of (submitted) jobs (or a single job id)
+        """
+        if isinstance(job_ids, basestring):
+            job_ids = [job_ids]
+        for job_id in job_ids:
+            if not job_id in self.backend.jobs:
+                self.log.error("Can't add dependency on unknown job %s to job %s" % (job_id, self.name))
+        self.deps.extend(job_ids)
+
+    def submit(self, with_hold=False):
+        """Submit the job, i.e. queue it to be run by the job backend; sets self.jobid."""
+        if self.jobid is not None:
+            self.log.error("Job %s was already submitted (job id: %s)" % (self.name, self.jobid))
+
+        self.workdir = os.getcwd()
+        if with_hold:
+            self.holds.append(USER_HOLD)
+        self.jobid = self.backend.queue(self)
+        self.log.debug("Submitted job %s (job id: %s, holds: %s, deps: %s)" % (self.name, self.jobid, self.holds,
+                                                                                 self.deps))
+        self.backend.schedule()
+
+    def release_hold(self, hold_type=None):
+        """Release hold on job of specified type."""
+        if hold_type is None:
+            hold_type = USER_HOLD
+        if hold_type in self.holds:
+            self.holds.remove(hold_type)
+            self.log.debug("Released hold of type %s for job %s" % (hold_type, self.jobid))
+            self.backend.schedule()
+        else:
+            self.log.warning("No hold type %s was set for %s, so skipping hold release" % (hold_type, self.jobid))
+
+    def has_holds(self):
+        """Return whether this job has holds or not."""
+        return bool(self.holds)
+
+    def is_finished(self):
+        """Return whether this job has finished (incl. being removed)."""
+        return self.removed or self.exit_code is not None
+
+    def is_ready(self):
+        """Return whether this job is ready to be started (submitted, no holds and all dependencies finished)."""
+        if self.jobid is None or self.proc is not None or self.removed or self.holds:
+            return False
+        return all([self.backend.jobs[dep].is_finished() for dep in self.deps])
+
+    def start(self):
+        """Start the job as a process (in a separate process group), with output redirected to file."""
+        self.output_file = os.path.join(self.workdir, '%s.o%s' % (self.name, self.jobid))
+        env = os.environ.copy()
+        env.update(self.env_vars)
+        try:
+            out = open(self.output_file, 'w')
+            self.proc = subprocess.Popen(self.script, shell=True, cwd=self.workdir, env=env, stdout=out,
+                                         stderr=subprocess.STDOUT, close_fds=True, preexec_fn=os.setsid)
+            out.close()
+        except (IOError, OSError), err:
+            self.log.error("Failed to start job %s (job id: %s): %s" % (self.name, self.jobid, err))
+        self.log.debug("Started job %s (job id: %s, pid: %s)" % (self.name, self.jobid, self.proc.pid))
+
+    def poll(self):
+        """Check whether the job process has finished (if it was started)."""
+        if self.proc is not None and not self.is_finished():
+            self.exit_code = self.proc.poll()
+            if self.exit_code is not None:
+                tup = (self.name, self.jobid, self.exit_code, self.output_file)
+                self.log.debug("Job %s (job id: %s) finished with exit code %s, output in %s" % tup)
+
+    def state(self):
+        """
+        Return the state of the job
+        State can be 'not submitted', 'running', 'queued' or 'finished',
+        """
+        self.backend.schedule()
+        return self.current_state()
+
+    def current_state(self):
+        """Return the current state of the job, without checking for finished jobs or starting jobs (cfr. state)."""
+        if self.jobid is None:
+            return 'not submitted'
+        elif self.is_finished():
+            return 'finished'
+        elif self.proc is None:
+            return 'queued'
+        else:
+            return 'running'
+
+    def remove(self):
+        """Remove the job, i.e. kill the job process (if it is running), and make sure it is never started."""
+        if self.is_finished():
+            self.log.debug("Job %s (job id: %s) already finished, no need to remove it" % (self.name, self.jobid))
+            return
+
+        if self.proc is not None:
+            try:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            except OSError, err:
+                self.log.error("Failed to remove job %s (job id: %s): %s" % (self.name, self.jobid, err))
+            self.exit_code = self.proc.wait()
+        self.removed = True
+        self.log.debug("Succesfully removed job %s (job id: %s)" % (self.name, self.jobid))
+
+    def cleanup(self):
+        """Cleanup: nothing to clean up for local jobs."""
+        pass
+
+
+class Local(JobBackend):
+    """
+    Job backend that runs jobs as processes on the current host, with dependency ordering and a limit on
+    the number of jobs that run simultaneously
+    """
+
+    def __init__(self):
+        """Constructor."""
+        super(Local, self).__init__()
+        # submitted jobs, indexed by job id; order of submission is tracked separately
+        self.jobs = {}
+        self.job_ids = []
+        self.host = socket.gethostname()
+
+        self.max_jobs = build_option('job_max_jobs')
+        if not self.max_jobs:
+            self.max_jobs = get_avail_core_count()
+        self.log.debug("Running (at most) %s jobs simultaneously" % self.max_jobs)
+
+    def make_job(self, script, name, env_vars=None, resources=None):
+        """Create LocalJob instance, managed by this job backend."""
+        return LocalJob(self, script, name, env_vars=env_vars, resources=resources)
+
+    def queue(self, job):
+        """Queue the specified job, and return job id for it."""
+        job_id = '%d.%s' % (len(self.job_ids) + 1, self.host)
+        self.jobs[job_id] = job
+        self.job_ids.append(job_id)
+        return job_id
+
+    def schedule(self):
+        """Check for jobs that finished, and start jobs that are ready to run (as long as slots are available)."""
+        queued = [self.jobs[job_id] for job_id in self.job_ids]
+        for job in queued:
+            job.poll()
+
+        running = len([job for job in queued if job.proc is not None and not job.is_finished()])
+        for job in queued:
+            if running >= self.max_jobs:
+                break
+            if job.is_ready():
+                job.start()
+                running += 1
+
+        return running
+
+    def job_states(self, jobs):
+        """Determine state of specified jobs, after checking for finished jobs and starting jobs (only once)."""
+        self.schedule()
+        return dict([(job.jobid, job.current_state()) for job in jobs])
+
+    def complete(self):
+        """Wait until all submitted jobs have finished (jobs are removed when waiting is interrupted)."""
+        try:
+            while True:
+                running = self.schedule()
+                pending = [job for job in self.jobs.values() if not job.is_finished()]
+                if not pending:
+                    break
+                elif not running:
+                    names = sorted([job.name for job in pending])
+                    self.log.error("Jobs can't be started because of holds or circular dependencies: %s" % names)
+                time.sleep(POLL_INTERVAL)
+        except KeyboardInterrupt:
+            self.log.warning("Interrupted while waiting for jobs to complete, removing all remaining jobs")
+            for job_id in self.job_ids:
+                self.jobs[job_id].remove()
+            raise
+
+        failed = [job.name for job in self.jobs.values() if job.exit_code]
+        if failed:
+            self.log.warning("Jobs finished with non-zero exit code: %s" % sorted(failed))
+        self.log.info("All %d jobs completed" % len(self.jobs))
@@ -0,0 +1,85 @@
+# #
+# Copyright 2014 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Job backend for TORQUE (PBS), using pbs_python (cfr. PbsJob).
+"""
+from easybuild.tools.job.backend import JobBackend
+from easybuild.tools.pbs_job import PbsJob, connect_to_server, disconnect_from_server, get_job_states, get_ppn
+from easybuild.tools.pbs_job import pbs_import_failed
+
+
+class PbsPython(JobBackend):
+    """
+    Job backend that submits jobs to a TORQUE (PBS) server, via pbs_python
+    """
+
+    USABLE = not pbs_import_failed
+
+    def __init__(self):
+        """Constructor."""
+        super(PbsPython, self).__init__()
+        self.conn = None
+        self.ppn = None
+
+    def init(self):
+        """Create a single connection to the PBS server (which is reused for all jobs), and determine ppn."""
+        self.conn = connect_to_server()
+        if self.conn is None:
+            self.log.error("connect_to_server returned %s, can't submit jobs." % self.conn)
+
+        # determine ppn once, and pass is to each job being created
+        # this avoids having to figure out ppn over and over again, every time creating a temp connection to the server
+        self.ppn = get_ppn()
+
+    def make_job(self, script, name, env_vars=None, resources=None):
+        """Create PbsJob instance, which uses the shared connection to the PBS server."""
+        if resources is None:
+            resources = {}
+        return PbsJob(script, name, env_vars, resources=resources, conn=self.conn, ppn=self.ppn)
+
+    def job_states(self, jobs):
+        """
+        Determine state of specified jobs, using a single query to the PBS server.
+        The exit code of finished jobs is stored in the exit_code attribute of the jobs (if it is known).
+        """
+        pbs_job_states = get_job_states(self.conn)
+        states = {}
+        for job in jobs:
+            (pbs_job_state, exit_status) = pbs_job_states.get(job.jobid, (None, None))
+            job.exit_code = exit_status
+            if job.jobid is None:
+                states[job.jobid] = 'not submitted'
+            elif pbs_job_state is None or pbs_job_state in ['C', 'E']:
+                # jobs that are no longer known to PBS server have finished (or were removed)
+                states[job.jobid] = 'finished'
+            elif pbs_job_state in ['H', 'Q', 'T', 'W']:
+                states[job.jobid] = 'queued'
+            else:
+                states[job.jobid] = 'running'
+        return states
+
+    def complete(self):
+        """Disconnect from PBS server."""
+        disconnect_from_server(self.conn)
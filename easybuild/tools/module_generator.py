@@ -23,7 +23,7 @@
 # along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
 # #
 """
-Generating module files.
+Generating module files, either in Tcl syntax (default) or in Lua syntax (only supported by Lmod).
 
 @author: Stijn De Weirdt (Ghent University)
 @author: Dries Verdegem (Ghent University)
@@ -35,6 +35,7 @@ Generating module files.
 import os
 import tempfile
 from vsc.utils import fancylogger
+from vsc.utils.missing import get_subclasses
 
 from easybuild.framework.easyconfig.easyconfig import ActiveMNS
 from easybuild.tools import config
@@ -48,8 +49,15 @@ _log = fancylogger.getLogger('module_generator', fname=False)
 
 class ModuleGenerator(object):
     """
-    Class for generating module files.
+    Class for generating module files (in Tcl syntax).
     """
+    # syntax of generated module files (cfr. --module-syntax)
+    SYNTAX = 'Tcl'
+    # extension for module files
+    MODULE_FILE_EXTENSION = ''
+    # header of module files
+    MODULE_HEADER = '#%Module'
+
     def __init__(self, application, fake=False):
         self.app = application
         self.fake = fake
@@ -64,10 +72,11 @@ class ModuleGenerator(object):
         """
         mod_path_suffix = build_option('suffix_modules_path')
         # module file goes in general moduleclass category
-        self.filename = os.path.join(self.module_path, mod_path_suffix, self.app.full_mod_name)
+        mod_file_name = self.app.full_mod_name + self.MODULE_FILE_EXTENSION
+        self.filename = os.path.join(self.module_path, mod_path_suffix, mod_file_name)
         # make symlink in moduleclass category
         mod_symlink_paths = ActiveMNS().det_module_symlink_paths(self.app.cfg)
-        self.class_mod_files = [os.path.join(self.module_path, p, self.app.full_mod_name) for p in mod_symlink_paths]
+        self.class_mod_files = [os.path.join(self.module_path, p, mod_file_name) for p in mod_symlink_paths]
 
         # create directories and links
         for path in [os.path.dirname(x) for x in [self.filename] + self.class_mod_files]:
@@ -97,7 +106,7 @@ class ModuleGenerator(object):
         description = "%s - Homepage: %s" % (self.app.cfg['description'], self.app.cfg['homepage'])
 
         lines = [
-            "#%%Module",  # double % to escape string formatting!
+            self.MODULE_HEADER.replace('%', '%%'),  # double % to escape string formatting!
             "",
             "proc ModulesHelp { } {",
             "    puts stderr {   %(description)s",
@@ -197,7 +206,7 @@ class ModuleGenerator(object):
         """
         # quotes are needed, to ensure smooth working of EBDEVEL* modulefiles
         return 'setenv\t%s\t\t%s\n' % (key, quote_str(value))
-    
+
     def msg_on_load(self, msg):
         """
         Add a message that should be printed when loading the module.
@@ -209,14 +218,26 @@ class ModuleGenerator(object):
             "}",
             "",
         ])
-    
+
     def add_tcl_footer(self, tcltxt):
         """
         Append whatever Tcl code you want to your modulefile
         """
-        # nothing to do here, but this should fail in the context of generating Lua modules
         return tcltxt
 
+    def add_lua_footer(self, luatxt):
+        """
+        Append Lua code to your modulefile (ignored, since Lua code can not be included in Tcl module files).
+        """
+        _log.warning("Not including Lua footer in module file in %s syntax: %s" % (self.SYNTAX, luatxt))
+        return ''
+
+    def comment(self, msg):
+        """
+        Generate a comment line for the module file.
+        """
+        return "# %s\n" % msg
+
     def set_alias(self, key, value):
         """
         Generate set-alias statement in modulefile for the given key/value pair.
@@ -239,3 +260,206 @@ class ModuleGenerator(object):
     def is_fake(self):
         """Return whether this ModuleGenerator instance generates fake modules or not."""
         return self.fake
+
+
+def quote_lua_str(x):
+    """
+    Obtain a Lua string literal for the specified value (cfr. quote_str); non-string values are returned as is.
+    Long brackets are used for strings that include both single and double quotes, newlines or backslashes,
+    since backslashes are interpreted as escape sequences in short strings, which can not span multiple lines.
+    """
+    if isinstance(x, basestring) and (("'" in x and '"' in x) or '\n' in x or '\\' in x):
+        # make sure closing long bracket does not occur in string (incl. at the end of it)
+        level = '='
+        while ']%s]' % level in x + ']':
+            level += '='
+        # a newline that immediately follows the opening long bracket is skipped in Lua
+        if x.startswith('\n'):
+            x = '\n' + x
+        return '[%s[%s]%s]' % (level, x, level)
+    else:
+        return quote_str(x)
+
+
+class ModuleGeneratorLua(ModuleGenerator):
+    """
+    Class for generating module files in Lua syntax, which can be evaluated natively by Lmod.
+    """
+    SYNTAX = 'Lua'
+    MODULE_FILE_EXTENSION = '.lua'
+    MODULE_HEADER = ''
+
+    def _path_value(self, path):
+        """
+        Return Lua expression for specified path, in which $root is replaced by the 'root' local variable.
+        Non-string values (e.g. integer values for environment variables) are returned as is.
+        """
+        if not isinstance(path, basestring):
+            return path
+        elif path == '$root':
+            return 'root'
+        elif path.startswith('$root/'):
+            return 'pathJoin(root, %s)' % quote_lua_str(path[len('$root/'):])
+        else:
+            return quote_lua_str(path)
+
+    def get_description(self, conflict=True):
+        """
+        Generate a description.
+        """
+        description = "%s - Homepage: %s" % (self.app.cfg['description'], self.app.cfg['homepage'])
+
+        lines = [
+            "help(%(description)s)",
+            "",
+            "whatis(%(whatis)s)",
+            "",
+            "local root = %(installdir)s",
+            "",
+        ]
+
+        if self.app.cfg['moduleloadnoconflict']:
+            lines.extend([
+                'if not isloaded("%(name)s/%(version)s") then',
+                '    if isloaded("%(name)s") then',
+                '        unload("%(name)s")',
+                '    end',
+                'end',
+                "",
+            ])
+
+        elif conflict:
+            lines.append('conflict("%(name)s")\n')
+
+        txt = '\n'.join(lines) % {
+            'name': self.app.name,
+            'version': self.app.version,
+            'description': quote_lua_str(description),
+            'whatis': quote_lua_str("Description: %s" % description),
+            'installdir': quote_lua_str(self.app.installdir),
+        }
+
+        return txt
+
+    def load_module(self, mod_name, recursive_unload=False):
+        """
+        Generate load statements for module.
+        """
+        if recursive_unload:
+            # not wrapping the load statement with an isloaded guard ensures recursive unloading,
+            # since Lmod reverses load statements when the module is unloaded
+            load_statement = ['load("%(mod_name)s")']
+        else:
+            load_statement = [
+                'if not isloaded("%(mod_name)s") then',
+                '    load("%(mod_name)s")',
+                'end',
+            ]
+        return '\n'.join([""] + load_statement + [""]) % {'mod_name': mod_name}
+
+    def unload_module(self, mod_name):
+        """
+        Generate unload statements for module.
+        """
+        return '\n'.join([
+            "",
+            'if isloaded("%(mod_name)s") then',
+            '    unload("%(mod_name)s")',
+            'end',
+            "",
+        ]) % {'mod_name': mod_name}
+
+    def prepend_paths(self, key, paths, allow_abs=False):
+        """
+        Generate prepend_path statements for the given list of paths.
+        """
+        if isinstance(paths, basestring):
+            _log.info("Wrapping %s into a list before using it to prepend path %s" % (paths, key))
+            paths = [paths]
+
+        statements = []
+        for path in paths:
+            # make sure only relative paths are passed
+            if os.path.isabs(path) and not allow_abs:
+                _log.error("Absolute path %s passed to prepend_paths which only expects relative paths." % path)
+            elif os.path.isabs(path):
+                value = quote_lua_str(path)
+            else:
+                # relative paths are relative to root (= installdir)
+                value = 'pathJoin(root, %s)' % quote_lua_str(path)
+            statements.append('prepend_path("%s", %s)\n' % (key, value))
+
+        return ''.join(statements)
+
+    def use(self, paths):
+        """
+        Generate statements for extending $MODULEPATH with given list of module paths.
+        """
+        use_statements = []
+        for path in paths:
+            use_statements.append('prepend_path("MODULEPATH", %s)' % quote_lua_str(path))
+        return '\n'.join(use_statements)
+
+    def set_environment(self, key, value):
+        """
+        Generate setenv statement for the given key/value pair.
+        """
+        return 'setenv("%s", %s)\n' % (key, self._path_value(value))
+
+    def msg_on_load(self, msg):
+        """
+        Add a message that should be printed when loading the module.
+        """
+        return '\n'.join([
+            "",
+            'if mode() == "load" then',
+            '    io.stderr:write(%s .. "\\n")' % quote_lua_str(msg),
+            'end',
+            "",
+        ])
+
+    def add_tcl_footer(self, tcltxt):
+        """
+        Append Tcl code to your modulefile (ignored, since Tcl code can not be included in Lua module files).
+        """
+        _log.warning("Not including Tcl footer in module file in %s syntax: %s" % (self.SYNTAX, tcltxt))
+        return ''
+
+    def add_lua_footer(self, luatxt):
+        """
+        Append whatever Lua code you want to your modulefile
+        """
+        return luatxt
+
+    def set_alias(self, key, value):
+        """
+        Generate set_alias statement in modulefile for the given key/value pair.
+        """
+        return 'set_alias("%s", %s)\n' % (key, self._path_value(value))
+
+    def comment(self, msg):
+        """
+        Generate a comment line for the module file.
+        """
+        return "-- %s\n" % msg
+
+
+def avail_module_generators():
+    """
+    Return all known module generators, indexed by syntax of generated module files.
+    """
+    class_dict = dict([(x.SYNTAX, x) for x in get_subclasses(ModuleGenerator)])
+    class_dict[ModuleGenerator.SYNTAX] = ModuleGenerator
+    return class_dict
+
+
+def module_generator(application, fake=False):
+    """
+    Return ModuleGenerator instance for the specified application, which generates module files in the
+    syntax specified via the 'module_syntax' build option.
+    """
+    syntax = build_option('module_syntax')
+    module_generator_class = avail_module_generators().get(syntax)
+    if module_generator_class is None:
+        _log.error("Unknown module syntax specified: %s" % syntax)
+    return module_generator_class(application, fake=fake)
@@ -0,0 +1,353 @@
+# #
+# Copyright 2014 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Index of available module files, which is maintained incrementally (cfr. Lmod.available and Lmod.update).
+
+Module files are indexed per directory in each module path. The entry for a directory is only refreshed when the
+modification time of that directory changed, so an availability query requires a single stat per directory
+(rather than reading every module file, like 'spider' does), and adding a module file only requires rescanning
+the directories it is located in. Likewise, locating the module file for a particular module only requires
+checking the entry for a single directory in each module path (cfr. ModulesTool.modulefile_path).
+
+The index can be stored in a cache file, which only contains plain data (cfr. ModuleIndex.save): one line per
+indexed directory, with tab-separated module path, relative directory path, modification time, number of module files,
+module files and subdirectories. Cache files that are malformed in any way are discarded (and the index is rebuilt).
+
+Module files are read via a cache that is validated using the modification time (and size) of the module file.
+"""
+import os
+import re
+from vsc.utils import fancylogger
+from vsc.utils.missing import any
+
+from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.filetools import read_file, write_file
+
+
+_log = fancylogger.getLogger('module_index', fname=False)
+
+# extension of module files in Lua syntax
+LUA_MODULE_FILE_EXTENSION = '.lua'
+
+# header (magic cookie) of module files in Tcl syntax
+TCL_MODULE_FILE_HEADER = '#%Module'
+
+# header of module index cache files (cfr. ModuleIndex.save)
+MODULE_INDEX_CACHE_HEADER = '# EasyBuild module index, version 1'
+
+# regular expressions for 'module load' statements in module files (cfr. read_module_loads)
+TCL_MODULE_LOAD_REGEX = re.compile(r"^\s+module load\s+(.*)$", re.M)
+LUA_MODULE_LOAD_REGEX = re.compile(r'^\s*load\("([^"]+)"\)', re.M)
+
+# cache for contents of module files, i.e. (mtime, size, contents, loaded modules) tuple per path;
+# cache is emptied when it reaches the maximum size, to bound memory usage for long sessions
+_module_files_cache = {}
+MODULE_FILES_CACHE_MAX_SIZE = 10000
+
+
+def is_module_file(path):
+    """Check whether the specified file is a module file (either in Lua syntax, or in Tcl syntax)."""
+    if path.endswith(LUA_MODULE_FILE_EXTENSION):
+        return True
+    else:
+        try:
+            f = open(path, 'r')
+            header = f.read(len(TCL_MODULE_FILE_HEADER))
+            f.close()
+        except IOError, err:
+            _log.debug("Failed to read header of %s, so not considering it as a module file: %s" % (path, err))
+            header = None
+        return header == TCL_MODULE_FILE_HEADER
+
+
+class ModulePathIndex(object):
+    """Index of the module files in a particular module path."""
+
+    def __init__(self, path, dirs=None):
+        """
+        Constructor
+        @param path: module path
+        @param dirs: (cached) index entries, i.e. (mtime, module files, subdirectories) tuple per relative dir path
+        """
+        self.path = path
+        if dirs is None:
+            dirs = {}
+        self.dirs = dirs
+        # indicates whether index changed since it was created/loaded
+        self.changed = False
+
+    def _scan_dir(self, relpath):
+        """Create index entry for the specified directory (relative to the module path)."""
+        path = os.path.join(self.path, relpath)
+        mtime = os.stat(path).st_mtime
+
+        mod_files, subdirs = [], []
+        for entry in sorted(os.listdir(path)):
+            # skip hidden files/directories (incl. .version and .modulerc files) and backup files
+            if entry.startswith('.') or entry.endswith('~'):
+                continue
+            full_path = os.path.join(path, entry)
+            if os.path.isdir(full_path):
+                subdirs.append(entry)
+            elif os.path.isfile(full_path) and is_module_file(full_path):
+                mod_files.append(entry)
+
+        self.changed = True
+        return (mtime, mod_files, subdirs)
+
+    def refresh(self):
+        """
+        Refresh index, only (re)scan directories that were added or modified since they were last scanned.
+        Subdirectories that are (symlinks to) one of the directories they are located in are skipped, to avoid cycles.
+        """
+        dirs = {}
+        # directories to (re)scan, with (device, inode) of the directories they are located in
+        todo = [('', ())]
+        while todo:
+            (relpath, parents) = todo.pop()
+            try:
+                stat = os.stat(os.path.join(self.path, relpath))
+                dir_id = (stat.st_dev, stat.st_ino)
+                if dir_id in parents:
+                    _log.debug("Skipping %s in module path %s, cycle detected" % (relpath, self.path))
+                    continue
+                mtime = stat.st_mtime
+                entry = self.dirs.get(relpath)
+                if entry is None or entry[0] != mtime:
+                    _log.debug("Scanning %s in module path %s" % (relpath or '.', self.path))
+                    entry = self._scan_dir(relpath)
+            except OSError, err:
+                _log.debug("Failed to scan %s in module path %s: %s" % (relpath or '.', self.path, err))
+                continue
+
+            dirs[relpath] = entry
+            todo.extend([(os.path.join(relpath, subdir), parents + (dir_id,)) for subdir in entry[2]])
+
+        if len(dirs) != len(self.dirs):
+            self.changed = True
+        self.dirs = dirs
+
+    def add(self, mod_file):
+        """Add specified module file to index, by (only) rescanning the directories it is located in."""
+        relpath = mod_file[len(self.path):].lstrip(os.path.sep)
+        subdirs = relpath.split(os.path.sep)[:-1]
+        try:
+            for idx in range(len(subdirs) + 1):
+                subdir = os.path.join(*([''] + subdirs[:idx]))
+                self.dirs[subdir] = self._scan_dir(subdir)
+        except OSError, err:
+            raise EasyBuildError("Failed to add %s to index for module path %s: %s" % (mod_file, self.path, err))
+
+    def find(self, mod_name):
+        """
+        Return path to module file for specified module in this module path (or None if it's not there),
+        by only (re)scanning the directory it would be located in if that directory was modified.
+        """
+        (relpath, fn) = os.path.split(mod_name)
+        try:
+            mtime = os.stat(os.path.join(self.path, relpath)).st_mtime
+            entry = self.dirs.get(relpath)
+            if entry is None or entry[0] != mtime:
+                entry = self._scan_dir(relpath)
+                self.dirs[relpath] = entry
+        except OSError:
+            return None
+
+        for mod_file in [fn, fn + LUA_MODULE_FILE_EXTENSION]:
+            if mod_file in entry[1]:
+                return os.path.join(self.path, relpath, mod_file)
+        return None
+
+    def module_names(self):
+        """Return list of names of indexed module files."""
+        mod_names = []
+        for (relpath, (_, mod_files, _)) in self.dirs.items():
+            for mod_file in mod_files:
+                if mod_file.endswith(LUA_MODULE_FILE_EXTENSION):
+                    mod_file = mod_file[:-len(LUA_MODULE_FILE_EXTENSION)]
+                mod_names.append(os.path.join(relpath, mod_file))
+        return mod_names
+
+
+class ModuleIndex(object):
+    """Index of module files in module paths, which can be stored in a cache file."""
+
+    def __init__(self, cache_file=None):
+        """
+        Constructor
+        @param cache_file: path to cache file to load index from/save index to (None implies no cache file)
+        """
+        self.cache_file = cache_file
+        self.paths = {}
+        self.load()
+
+    def load(self):
+        """Load index from cache file (if it exists); cache files that are malformed in any way are discarded."""
+        if self.cache_file is not None and os.path.exists(self.cache_file):
+            try:
+                cache = parse_module_index_cache(read_file(self.cache_file))
+                for (path, dirs) in cache.items():
+                    self.paths[path] = ModulePathIndex(path, dirs=dirs)
+                _log.debug("Loaded module index for %d module paths from %s" % (len(cache), self.cache_file))
+            except (EasyBuildError, ValueError), err:
+                _log.warning("Ignoring corrupt module index cache file %s: %s" % (self.cache_file, err))
+                self.paths = {}
+
+    def save(self):
+        """Save index to cache file (if index changed), only retaining existing module paths."""
+        if self.cache_file is not None and any([idx.changed for idx in self.paths.values()]):
+            lines = [MODULE_INDEX_CACHE_HEADER]
+            paths = [path for path in sorted(self.paths.keys()) if os.path.isdir(path)]
+            for path in paths:
+                for (relpath, (mtime, mod_files, subdirs)) in sorted(self.paths[path].dirs.items()):
+                    fields = [path, relpath, repr(mtime), str(len(mod_files))] + mod_files + subdirs
+                    # entries that can not be represented are not cached (so they will be rescanned)
+                    if not any(['\t' in field or '\n' in field for field in fields]):
+                        lines.append('\t'.join(fields))
+
+            # write to temporary file first and move it into place, such that the cache file is replaced atomically
+            # (the index may be saved by multiple processes simultaneously, e.g. when regenerating module files)
+            tmp_cache_file = '%s.%s' % (self.cache_file, os.getpid())
+            write_file(tmp_cache_file, '\n'.join(lines) + '\n')
+            try:
+                os.rename(tmp_cache_file, self.cache_file)
+            except OSError, err:
+                raise EasyBuildError("Failed to move %s to %s: %s" % (tmp_cache_file, self.cache_file, err))
+
+            for idx in self.paths.values():
+                idx.changed = False
+            _log.debug("Saved module index for %d module paths to %s" % (len(paths), self.cache_file))
+
+    def get_path_index(self, path):
+        """Return index for specified module path."""
+        if not path in self.paths:
+            self.paths[path] = ModulePathIndex(path)
+        return self.paths[path]
+
+    def available(self, mod_paths, mod_name=None):
+        """
+        Return sorted list of modules available in the specified module paths (after refreshing the index),
+        optionally only those with a name that starts with the specified (partial) module name.
+        """
+        mod_names = set()
+        for path in mod_paths:
+            idx = self.get_path_index(path)
+            idx.refresh()
+            mod_names.update(idx.module_names())
+
+        if mod_name:
+            mod_names = [mod for mod in mod_names if mod.startswith(mod_name)]
+
+        return sorted(mod_names)
+
+    def find_module_file(self, mod_paths, mod_name):
+        """
+        Return path to module file for specified module, by checking the specified module paths in order
+        (None is returned if no module file was found).
+        """
+        for path in mod_paths:
+            mod_file = self.get_path_index(path).find(mod_name)
+            if mod_file is not None:
+                _log.debug("Found module file for %s in module path %s: %s" % (mod_name, path, mod_file))
+                return mod_file
+
+        _log.debug("No module file found for %s in %s" % (mod_name, mod_paths))
+        return None
+
+    def add_module_file(self, mod_paths, mod_file):
+        """
+        Add specified module file to index of the module path it is located in (if any).
+        Returns True if the module file was added to the index, False otherwise.
+        """
+        # consider longest module paths first, since module paths may be nested
+        for path in sorted(mod_paths, key=len, reverse=True):
+            if mod_file.startswith(os.path.join(path, '')):
+                self.get_path_index(path).add(mod_file)
+                _log.debug("Added %s to index for module path %s" % (mod_file, path))
+                return True
+
+        _log.debug("Not adding %s to module index, not located in any of %s" % (mod_file, mod_paths))
+        return False
+
+
+def parse_module_index_cache(txt):
+    """
+    Parse contents of module index cache file (cfr. ModuleIndex.save), and validate its structure.
+    Returns dict with index entries, i.e. (mtime, module files, subdirectories) tuple per relative dir path,
+    per module path; a ValueError is raised if the contents are malformed.
+    """
+    lines = txt.split('\n')
+    if lines[0] != MODULE_INDEX_CACHE_HEADER:
+        raise ValueError("Unknown header: %s" % lines[0])
+
+    cache = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        fields = line.split('\t')
+        if len(fields) < 4:
+            raise ValueError("Incomplete entry: %s" % line)
+        (path, relpath, mtime, cnt) = fields[:4]
+        names = fields[4:]
+        # raises ValueError if mtime or number of module files is not a number
+        mtime, cnt = float(mtime), int(cnt)
+        if not 0 <= cnt <= len(names) or not os.path.isabs(path) or os.path.isabs(relpath) or '' in names:
+            raise ValueError("Invalid entry: %s" % line)
+        cache.setdefault(path, {})[relpath] = (mtime, names[:cnt], names[cnt:])
+
+    return cache
+
+
+def _cached_module_file(path):
+    """Return cache entry for specified module file, (re)reading it if it was modified since it was cached."""
+    try:
+        stat = os.stat(path)
+    except OSError, err:
+        raise EasyBuildError("Failed to read module file %s: %s" % (path, err))
+
+    entry = _module_files_cache.get(path)
+    if entry is None or entry[0] != stat.st_mtime or entry[1] != stat.st_size:
+        entry = [stat.st_mtime, stat.st_size, read_file(path), None]
+        if path not in _module_files_cache and len(_module_files_cache) >= MODULE_FILES_CACHE_MAX_SIZE:
+            _module_files_cache.clear()
+        _module_files_cache[path] = entry
+    return entry
+
+
+def read_module_file(path):
+    """Return contents of specified module file (cached)."""
+    return _cached_module_file(path)[2]
+
+
+def read_module_loads(path):
+    """Return list of modules that are loaded by specified module file, as specified by 'load' statements (cached)."""
+    entry = _cached_module_file(path)
+    if entry[3] is None:
+        if path.endswith(LUA_MODULE_FILE_EXTENSION):
+            regex = LUA_MODULE_LOAD_REGEX
+        else:
+            regex = TCL_MODULE_LOAD_REGEX
+        entry[3] = regex.findall(entry[2])
+    return entry[3][:]
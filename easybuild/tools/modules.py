@@ -37,10 +37,8 @@ This python module implements the environment modules functionality:
 """
 import os
 import re
-import subprocess
 import sys
 from distutils.version import StrictVersion
-from subprocess import PIPE
 from vsc.utils import fancylogger
 from vsc.utils.missing import get_subclasses, any
 from vsc.utils.patterns import Singleton
@@ -48,8 +46,10 @@ from vsc.utils.patterns import Singleton
 from easybuild.tools.build_log import EasyBuildError
 from easybuild.tools.config import build_option, get_modules_tool, install_path
 from easybuild.tools.environment import modify_env
-from easybuild.tools.filetools import convert_name, mkdir, read_file, which
+from easybuild.tools.filetools import convert_name, mkdir, which
+from easybuild.tools.module_index import ModuleIndex, read_module_file, read_module_loads
 from easybuild.tools.module_naming_scheme import DEVEL_MODULE_SUFFIX
+from easybuild.tools.process import STDERR, STDOUT, Process, run_process
 from easybuild.tools.run import run_cmd
 from easybuild.tools.toolchain import DUMMY_TOOLCHAIN_NAME, DUMMY_TOOLCHAIN_VERSION
 from vsc.utils.missing import nub
@@ -146,6 +146,9 @@ class ModulesTool(object):
 
         self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
         self.mod_paths = None
+
+        # index of available module files, used to locate module files (cfr. modulefile_path)
+        self.module_index = ModuleIndex()
         if mod_paths is not None:
             self.set_mod_paths(mod_paths)
 
@@ -388,9 +391,9 @@ class ModulesTool(object):
         """
         return self.run_module('show', mod_name, return_output=True)
 
-    def get_value_from_modulefile(self, mod_name, regex):
+    def get_value_from_show(self, mod_name, regex):
         """
-        Get info from the module file for the specified module.
+        Get info from the output of 'module show' for the specified module.
 
         @param mod_name: module name
         @param regex: (compiled) regular expression, with one group
@@ -406,12 +409,36 @@ class ModulesTool(object):
         else:
             raise EasyBuildError("Can't get module file path for non-existing module %s" % mod_name)
 
+    def get_value_from_modulefile(self, mod_name, regex):
+        """
+        Get info from the module file for the specified module.
+        The module file is read directly, 'module show' is only used if the pattern is not found in the module file
+        (e.g., when the syntax of the module file is different from the syntax used in the output of 'module show').
+
+        @param mod_name: module name
+        @param regex: (compiled) regular expression, with one group
+        """
+        res = regex.search(read_module_file(self.modulefile_path(mod_name)))
+        if res:
+            return res.group(1)
+        else:
+            self.log.debug("Pattern '%s' not found in module file for %s, using 'show'" % (regex.pattern, mod_name))
+            return self.get_value_from_show(mod_name, regex)
+
     def modulefile_path(self, mod_name):
-        """Get the path of the module file for the specified module."""
-        # (possible relative) path is always followed by a ':', and may be prepended by whitespace
-        # this works for both environment modules and Lmod
-        modpath_re = re.compile('^\s*(?P<modpath>[^/\n]*/[^ ]+):$', re.M)
-        return self.get_value_from_modulefile(mod_name, modpath_re)
+        """
+        Get the path of the module file for the specified module.
+        The module file is located via the index of available module files, by checking the module paths in order;
+        'module show' is only used if the module file was not found that way (e.g., for a partial module name).
+        """
+        mod_paths = [path for path in nub(curr_module_paths()) if os.path.isdir(path)]
+        modfilepath = self.module_index.find_module_file(mod_paths, mod_name)
+        if modfilepath is None:
+            # (possible relative) path is always followed by a ':', and may be prepended by whitespace
+            # this works for both environment modules and Lmod
+            modpath_re = re.compile('^\s*(?P<modpath>[^/\n]*/[^ ]+):$', re.M)
+            modfilepath = self.get_value_from_show(mod_name, modpath_re)
+        return modfilepath
 
     def module_software_name(self, mod_name):
         """Get the software name for a given module name."""
@@ -464,10 +491,11 @@ class ModulesTool(object):
 
         full_cmd = ' '.join(cmdlist + args)
         self.log.debug("Running module command '%s' from %s" % (full_cmd, os.getcwd()))
-        proc = subprocess.Popen(cmdlist + args, stdout=PIPE, stderr=PIPE, env=environ)
+        proc = Process(cmdlist + args, shell=False, env=environ, merge_stderr=False)
+        run_process(proc)
         # stdout will contain python code (to change environment etc)
         # stderr will contain text (just like the normal module command)
-        (stdout, stderr) = proc.communicate()
+        (stdout, stderr) = (proc.get_output(STDOUT), proc.get_output(STDERR))
         self.log.debug("Output of module command '%s': stdout: %s; stderr: %s" % (full_cmd, stdout, stderr))
         if original_module_path is not None:
             os.environ['MODULEPATH'] = original_module_path
@@ -539,10 +567,7 @@ class ModulesTool(object):
         modfilepath = self.modulefile_path(mod_name)
         self.log.debug("modulefile path %s: %s" % (mod_name, modfilepath))
 
-        modtxt = read_file(modfilepath)
-
-        loadregex = re.compile(r"^\s+module load\s+(.*)$", re.M)
-        mods = loadregex.findall(modtxt)
+        mods = read_module_loads(modfilepath)
 
         if depth > 0:
             # recursively determine dependencies for these dependency modules, until depth is non-positive
@@ -559,8 +584,11 @@ class ModulesTool(object):
 
         return mods
 
-    def update(self):
-        """Update after new modules were added."""
+    def update(self, mod_files=None):
+        """
+        Update after new modules were added.
+        @param mod_files: list of paths to module files that were added (None implies unknown)
+        """
         raise NotImplementedError
 
 
@@ -576,7 +604,7 @@ class EnvironmentModulesC(ModulesTool):
         name_re = re.compile('^conflict\s*(?P<name>\S+).*$', re.M)
         return self.get_value_from_modulefile(mod_name, name_re)
 
-    def update(self):
+    def update(self, mod_files=None):
         """Update after new modules were added."""
         pass
 
@@ -655,6 +683,10 @@ class Lmod(ModulesTool):
     # we need at least Lmod v5.6.3 (and it can't be a release candidate)
     REQ_VERSION = '5.6.3'
     VERSION_REGEXP = r"^Modules\s+based\s+on\s+Lua:\s+Version\s+(?P<version>\d\S*)\s"
+    # location of (user) cache directory of Lmod
+    CACHE_DIR = os.path.join('~', '.lmod.d', '.cache')
+    # name of file in cache directory that is used to store index of available modules
+    MODULE_INDEX_FILENAME = 'easybuild-module-index.txt'
 
     def __init__(self, *args, **kwargs):
         """Constructor, set lmod-specific class variable values."""
@@ -665,6 +697,10 @@ class Lmod(ModulesTool):
 
         super(Lmod, self).__init__(*args, **kwargs)
 
+        # index of available modules, which is maintained incrementally by EasyBuild itself (cfr. available, update)
+        self.cache_dir = os.path.expanduser(self.CACHE_DIR)
+        self.module_index = ModuleIndex(os.path.join(self.cache_dir, self.MODULE_INDEX_FILENAME))
+
     def check_module_function(self, *args, **kwargs):
         """Check whether selected module tool matches 'module' function definition."""
         if not 'regex' in kwargs:
@@ -678,43 +714,43 @@ class Lmod(ModulesTool):
 
         @param name: a (partial) module name for filtering (default: None)
         """
-        mods = super(Lmod, self).available(mod_name=mod_name)
-        # only retain actual modules, exclude module directories (which end with a '/')
-        real_mods = [mod for mod in mods if not mod.endswith('/')]
-
-        # only retain modules that with a <mod_name> prefix
-        # Lmod will also returns modules with a matching substring
-        correct_real_mods = [mod for mod in real_mods if mod_name is None or mod.startswith(mod_name)]
-
-        return correct_real_mods
+        # availability is determined using the module index, which is only refreshed for modified directories;
+        # this is a lot faster than 'module avail' (which scans all module files since $LMOD_IGNORE_CACHE is set)
+        mod_paths = [path for path in nub(curr_module_paths()) if os.path.isdir(path)]
+        mods = self.module_index.available(mod_paths, mod_name=mod_name)
+        self.save_module_index()
 
-    def update(self):
-        """Update after new modules were added."""
-        spider_cmd = os.path.join(os.path.dirname(self.cmd), 'spider')
-        cmd = [spider_cmd, '-o', 'moduleT', os.environ['MODULEPATH']]
-        self.log.debug("Running command '%s'..." % ' '.join(cmd))
+        self.log.debug("Available modules for '%s' according to module index: %s" % (mod_name, mods))
+        return mods
 
-        proc = subprocess.Popen(cmd, stdout=PIPE, stderr=PIPE, env=os.environ)
-        (stdout, stderr) = proc.communicate()
+    def save_module_index(self):
+        """Save index of available modules to cache file (not when testing)."""
+        if not self.testing:
+            try:
+                self.module_index.save()
+            except EasyBuildError, err:
+                self.log.warning("Failed to save module index: %s" % err)
 
-        if stderr:
-            self.log.error("An error occured when running '%s': %s" % (' '.join(cmd), stderr))
+    def update(self, mod_files=None):
+        """
+        Update after new modules were added: merge specified module files into index of available modules.
+        The Lmod spider cache is left untouched: regenerating it requires reading every module file, and Lmod
+        already regenerates it by itself when it is outdated.
+        Returns list of available modules.
+        @param mod_files: list of paths to module files that were added (None implies refreshing the whole index)
+        """
+        mod_paths = [path for path in nub(curr_module_paths()) if os.path.isdir(path)]
+        if mod_files is not None:
+            for mod_file in mod_files:
+                self.module_index.add_module_file(mod_paths, mod_file)
+        mods = self.module_index.available(mod_paths)
 
         if self.testing:
-            # don't actually update local cache when testing, just return the cache contents
-            return stdout
+            # don't actually update local cache files when testing, just return the list of available modules
+            return mods
         else:
-            try:
-                cache_filefn = os.path.join(os.path.expanduser('~'), '.lmod.d', '.cache', 'moduleT.lua')
-                self.log.debug("Updating Lmod spider cache %s with output from '%s'" % (cache_filefn, ' '.join(cmd)))
-                cache_dir = os.path.dirname(cache_filefn)
-                if not os.path.exists(cache_dir):
-                    mkdir(cache_dir, parents=True)
-                cache_file = open(cache_filefn, 'w')
-                cache_file.write(stdout)
-                cache_file.close()
-            except (IOError, OSError), err:
-                self.log.error("Failed to update Lmod spider cache %s: %s" % (cache_filefn, err))
+            self.save_module_index()
+            return mods
 
     def module_software_name(self, mod_name):
         """Get the software name for a given module name."""
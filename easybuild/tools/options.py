@@ -53,12 +53,19 @@ from easybuild.tools.config import get_default_configfiles, get_pretend_installp
 from easybuild.tools.config import get_default_oldstyle_configfile_defaults, DEFAULT_MODULECLASSES
 from easybuild.tools.convert import ListOfStrings
 from easybuild.tools.github import HAVE_GITHUB_API, HAVE_KEYRING, fetch_github_token
+from easybuild.tools.job.backend import avail_job_backends
 from easybuild.tools.modules import avail_modules_tools
+from easybuild.tools.module_generator import avail_module_generators
 from easybuild.tools.module_naming_scheme import GENERAL_CLASS
 from easybuild.tools.module_naming_scheme.utilities import avail_module_naming_schemes
 from easybuild.tools.ordereddict import OrderedDict
+from easybuild.tools.parallelbuild import DEFAULT_JOB_MEM_FACTOR, DEFAULT_JOB_MERGE_MAX_TIME, DEFAULT_JOB_WALLTIME
+from easybuild.tools.parallelbuild import DEFAULT_JOB_POLL_INTERVAL, DEFAULT_JOB_RETRIES, DEFAULT_JOB_RETRY_POLICY
+from easybuild.tools.parallelbuild import DEFAULT_JOB_WALLTIME_FACTOR, JOB_RETRY_POLICIES
+from easybuild.tools.toolchain.toolchain import COMPILER_CACHE_SUBDIR
 from easybuild.tools.toolchain.utilities import search_toolchain
 from easybuild.tools.repository.repository import avail_repositories
+from easybuild.tools.resource_monitor import DEFAULT_SAMPLE_INTERVAL
 from easybuild.tools.version import this_is_easybuild
 from vsc.utils import fancylogger
 from vsc.utils.generaloption import GeneralOption
@@ -93,14 +100,47 @@ class EasyBuildOptions(GeneralOption):
             'force': ("Force to rebuild software even if it's already installed (i.e. if it can be found as module)",
                       None, 'store_true', False, 'f'),
             'job': ("Submit the build as a job", None, 'store_true', False),
+            'job-backend': ("Backend to use for submitting jobs (Local runs jobs as processes on the current host)",
+                            'choice', 'store', 'PbsPython', sorted(avail_job_backends(check_usable=False).keys())),
+            'job-default-mem': ("Memory (in MB) to request for jobs that build easyconfigs without recorded "
+                                "peak memory usage (0 implies no specific amount of memory is requested)",
+                                int, 'store', 0),
+            'job-default-walltime': ("Walltime (in hours) to request for jobs that build easyconfigs without recorded "
+                                     "build time", int, 'store', DEFAULT_JOB_WALLTIME),
+            'job-max-jobs': ("Maximum number of jobs to run simultaneously with the Local job backend "
+                             "(0 implies number of available cores)", int, 'store', 0),
+            'job-mem-factor': ("Padding factor for memory requested for jobs, relative to recorded peak memory usage",
+                               float, 'store', DEFAULT_JOB_MEM_FACTOR),
+            'job-merge-chains': ("Merge linear chains of dependencies into a single job", None, 'store_true', True),
+            'job-merge-max-time': ("Maximum total build time (in minutes, based on recorded build times) "
+                                   "of easyconfigs that are merged into a single job",
+                                   int, 'store', DEFAULT_JOB_MERGE_MAX_TIME),
+            'job-poll-interval': ("Interval (in seconds) between checks of the state of jobs (cfr. --wait)",
+                                  float, 'store', DEFAULT_JOB_POLL_INTERVAL),
+            'job-retries': ("Maximum number of times a failed job is resubmitted (cfr. --wait)",
+                            int, 'store', DEFAULT_JOB_RETRIES),
+            'job-retry-policy': ("How to resubmit failed jobs (cfr. --wait): not at all, as is, or with --force",
+                                 'choice', 'store', DEFAULT_JOB_RETRY_POLICY, JOB_RETRY_POLICIES),
+            'job-merge-siblings': ("Merge groups of easyconfigs with the same dependencies into a single job, "
+                                   "if they are known to build quickly", None, 'store_true', False),
+            'job-walltime-factor': ("Padding factor for walltime requested for jobs, relative to recorded build time",
+                                    float, 'store', DEFAULT_JOB_WALLTIME_FACTOR),
             'logtostdout': ("Redirect main log to stdout", None, 'store_true', False, 'l'),
             'only-blocks': ("Only build listed blocks", None, 'extend', None, 'b', {'metavar': 'BLOCKS'}),
+            'rebuild-stale': ("Only rebuild software for which the installation is stale, i.e. for which the easyconfig, "
+                              "easyblock, toolchain or dependencies changed since it was installed",
+                              None, 'store_true', False),
+            'regenerate-modules': ("Regenerate module files for all existing installations, using the easyconfig files "
+                                   "archived in the installation directories (without rebuilding anything)",
+                                   None, 'store_true', False),
             'robot': ("Path(s) to search for easyconfigs for missing dependencies (colon-separated)" ,
                       None, 'store_or_None', default_robot_path, 'r', {'metavar': 'PATH'}),
             'skip': ("Skip existing software (useful for installing additional packages)",
                      None, 'store_true', False, 'k'),
             'stop': ("Stop the installation after certain step", 'choice', 'store_or_None', 'source', 's', all_stops),
             'strict': ("Set strictness level", 'choice', 'store', run.WARN, strictness_options),
+            'wait': ("Wait until all submitted jobs have completed (cfr. --job), resubmit failed jobs and report "
+                     "on all jobs", None, 'store_true', False),
         })
 
         self.log.debug("basic_options: descr %s opts %s" % (descr, opts))
@@ -154,6 +194,10 @@ class EasyBuildOptions(GeneralOption):
             'allow-modules-tool-mismatch': ("Allow mismatch of modules tool and definition of 'module' function",
                                             None, 'store_true', False),
             'cleanup-builddir': ("Cleanup build dir after successful installation.", None, 'store_true', True),
+            'cleanup-builddir-async': ("Cleanup build dir in the background (after moving it out of the way)",
+                                       None, 'store_true', False),
+            'cleanup-builddir-max-rate': ("Maximum number of files/directories to remove per second when cleaning up "
+                                          "build dir in the background (0 implies no limit)", int, 'store', 0),
             'deprecated': ("Run pretending to be (future) version, to test removal of deprecated code.",
                            None, 'store', None),
             'easyblock': ("easyblock to use for processing the spec file or dumping the options",
@@ -167,8 +211,17 @@ class EasyBuildOptions(GeneralOption):
                             str, 'extend', None),
             'oldstyleconfig':   ("Look for and use the oldstyle configuration file.",
                                  None, 'store_true', True),
+            'output-tail-size': ("Maximum amount of output (in bytes) of executed commands to keep in memory; "
+                                 "if more output is produced, the full output is streamed to a temporary file",
+                                 int, 'store', run.DEFAULT_OUTPUT_TAIL_SIZE),
+            'qa-no-output-timeout': ("Number of seconds to wait for new output of interactive commands "
+                                     "before giving up on an unknown question",
+                                     int, 'store', run.DEFAULT_QA_NO_OUTPUT_TIMEOUT),
             'pretend': (("Does the build/installation in a test directory located in $HOME/easybuildinstall"),
                          None, 'store_true', False, 'p'),
+            'resource-sample-interval': ("Interval (in seconds) between samples of resources consumed by build "
+                                         "processes (0 disables monitoring resources; suggested interval: %s)" %
+                                         DEFAULT_SAMPLE_INTERVAL, float, 'store', 0),
             'set-gid-bit': ("Set group ID bit on newly created directories", None, 'store_true', False),
             'sticky-bit': ("Set sticky bit on newly created directories", None, 'store_true', False),
             'skip-test-cases': ("Skip running test cases", None, 'store_true', False, 't'),
@@ -195,6 +248,13 @@ class EasyBuildOptions(GeneralOption):
             'avail-repositories': ("Show all repository types (incl. non-usable)",
                                     None, "store_true", False,),
             'buildpath': ("Temporary build path", None, 'store', oldstyle_defaults['buildpath']),
+            'compiler-cache': ("Wrap compiler commands with specified (ccache-compatible) compiler cache command",
+                               None, 'store_or_None', None, {'metavar': "CMD"}),
+            'compiler-cache-dir': (("Directory for compiler cache, a subdirectory is used per toolchain and "
+                                    "optimisation flags (default: %s subdirectory of build path)" %
+                                    COMPILER_CACHE_SUBDIR), None, 'store_or_None', None, {'metavar': "PATH"}),
+            'compiler-cache-max-size': ("Maximum size of (each) compiler cache directory, e.g. 5G",
+                                        None, 'store_or_None', None, {'metavar': "SIZE"}),
             'ignore-dirs': ("Directory names to ignore when searching for files/dirs",
                             'strlist', 'store', ['.git', '.svn']),
             'installpath': ("Install path for software and modules", None, 'store', oldstyle_defaults['installpath']),
@@ -205,10 +265,13 @@ class EasyBuildOptions(GeneralOption):
             'module-naming-scheme': ("Module naming scheme",
                                      'choice', 'store', oldstyle_defaults['module_naming_scheme'],
                                      sorted(avail_module_naming_schemes().keys())),
+            'module-syntax': ("Syntax to be used for module files (Lua syntax requires Lmod as modules tool)",
+                              'choice', 'store', 'Tcl', sorted(avail_module_generators().keys())),
             'moduleclasses': (("Extend supported module classes "
                                "(For more info on the default classes, use --show-default-moduleclasses)"),
                                None, 'extend', oldstyle_defaults['moduleclasses']),
-            'modules-footer': ("Path to file containing footer to be added to all generated module files",
+            'modules-footer': ("Path to file containing footer (in Tcl syntax) to be added to all generated "
+                               "module files (ignored for module files in Lua syntax)",
                                None, 'store_or_None', None, {'metavar': "PATH"}),
             'modules-tool': ("Modules tool to use",
                              'choice', 'store', oldstyle_defaults['modules_tool'],
@@ -357,6 +420,14 @@ class EasyBuildOptions(GeneralOption):
         if self.options.strict:
             run.strictness = self.options.strict
 
+        # set amount of command output to retain in memory
+        if self.options.output_tail_size:
+            run.output_tail_size = self.options.output_tail_size
+
+        # set timeout for interactive commands that stop producing output
+        if self.options.qa_no_output_timeout:
+            run.qa_no_output_timeout = self.options.qa_no_output_timeout
+
         # override current version of EasyBuild with version specified to --deprecated
         if self.options.deprecated:
             build_log.CURRENT_VERSION = LooseVersion(self.options.deprecated)
@@ -390,6 +461,11 @@ class EasyBuildOptions(GeneralOption):
             if token is None:
                 self.log.error("Failed to obtain required GitHub token for user '%s'" % self.options.github_user)
 
+        # module files in Lua syntax can only be used with Lmod
+        if self.options.module_syntax == 'Lua' and self.options.modules_tool != 'Lmod':
+            self.log.error("Module syntax Lua is only supported when using Lmod as modules tool (not %s)" %
+                           self.options.modules_tool)
+
         self._postprocess_config()
 
     def _postprocess_config(self):
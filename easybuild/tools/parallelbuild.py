@@ -26,7 +26,8 @@
 Module for doing parallel builds. This uses a PBS-like cluster. You should be able to submit jobs (which can have
 dependencies)
 
-Support for PBS is provided via the PbsJob class. If you want you could create other job classes and use them here.
+Jobs are submitted via the job backend that is selected using --job-backend (see easybuild.tools.job),
+e.g. PbsPython to submit jobs to a TORQUE (PBS) server, or Local to run jobs as processes on the current host.
 
 @author: Toon Willems (Ghent University)
 @author: Kenneth Hoste (Ghent University)
@@ -34,20 +35,63 @@ Support for PBS is provided via the PbsJob class. If you want you could create o
 """
 import math
 import os
+import time
 
 import easybuild.tools.config as config
 from easybuild.framework.easyblock import get_easyblock_instance
 from easybuild.framework.easyconfig.easyconfig import ActiveMNS
-from easybuild.tools.build_log import EasyBuildError
-from easybuild.tools.config import get_repository, get_repositorypath
+from easybuild.framework.easyconfig.format.one import split_block_spec
+from easybuild.tools.build_log import EasyBuildError, print_msg
+from easybuild.tools.config import build_option, get_repository, get_repositorypath, install_path
+from easybuild.tools.filetools import read_file, write_file
+from easybuild.tools.module_index import LUA_MODULE_FILE_EXTENSION
 from easybuild.tools.module_naming_scheme.utilities import det_full_ec_version
-from easybuild.tools.pbs_job import PbsJob, connect_to_server, disconnect_from_server, get_ppn
+from easybuild.tools.pbs_job import MAX_WALLTIME
+from easybuild.tools.process import map_in_processes
+from easybuild.tools.job.backend import job_backend
 from easybuild.tools.repository.repository import init_repository
+from easybuild.tools.systemtools import get_avail_core_count
 from vsc.utils import fancylogger
+from vsc.utils.missing import all, nub
 
 
 _log = fancylogger.getLogger('parallelbuild', fname=False)
 
+# name of and resources for sentinel job that all jobs without dependencies depend on
+SENTINEL_JOB_NAME = 'easybuild-sentinel'
+SENTINEL_JOB_RESOURCES = {'hours': 1, 'cores': 1}
+
+# default maximum total build time (in minutes) for easyconfigs that are merged into a single job (cfr. plan_jobs)
+DEFAULT_JOB_MERGE_MAX_TIME = 60
+
+# retry policies for failed jobs (cfr. JobMonitor)
+JOB_RETRY_POLICY_NONE = 'none'
+JOB_RETRY_POLICY_RESUBMIT = 'resubmit'
+JOB_RETRY_POLICY_FORCE = 'force'
+JOB_RETRY_POLICIES = [JOB_RETRY_POLICY_NONE, JOB_RETRY_POLICY_RESUBMIT, JOB_RETRY_POLICY_FORCE]
+DEFAULT_JOB_RETRY_POLICY = JOB_RETRY_POLICY_RESUBMIT
+DEFAULT_JOB_RETRIES = 1
+# default interval (in seconds) between checks of the state of jobs
+DEFAULT_JOB_POLL_INTERVAL = 30
+
+# status of (monitored) jobs
+JOB_PENDING = 'pending'
+JOB_SUCCESS = 'success'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+JOB_STATUSES = [JOB_PENDING, JOB_SUCCESS, JOB_FAILED, JOB_CANCELLED]
+
+# number of lines of output of failed jobs to include in summary
+JOB_OUTPUT_TAIL_LINES = 10
+# name of file in output directory to which summary of jobs is written
+JOBS_SUMMARY_FILENAME = 'jobs-summary.txt'
+
+# default padding factors for requested walltime/memory, relative to recorded build time/peak memory usage,
+# and default walltime (in hours) for easyconfigs without recorded build time (cfr. det_job_resources)
+DEFAULT_JOB_WALLTIME_FACTOR = 2.0
+DEFAULT_JOB_MEM_FACTOR = 1.5
+DEFAULT_JOB_WALLTIME = 24
+
 
 def build_easyconfigs_in_parallel(build_command, easyconfigs, output_dir=None):
     """
@@ -64,75 +108,295 @@ def build_easyconfigs_in_parallel(build_command, easyconfigs, output_dir=None):
     # so one can linearly walk over the list and use previous job id's
     jobs = []
 
-    # create a single connection, and reuse it
-    conn = connect_to_server()
-    if conn is None:
-        _log.error("connect_to_server returned %s, can't submit jobs." % (conn))
-
-    # determine ppn once, and pass is to each job being created
-    # this avoids having to figure out ppn over and over again, every time creating a temp connection to the server
-    ppn = get_ppn()
-
-    def tokey(dep):
-        """Determine key for specified dependency."""
-        return ActiveMNS().det_full_module_name(dep)
+    # initialise job backend once (e.g., create a single connection to the server), and reuse it for all jobs
+    backend = job_backend()
+    backend.init()
 
-    for ec in easyconfigs:
-        # This is very important, otherwise we might have race conditions
-        # e.g. GCC-4.5.3 finds cloog.tar.gz but it was incorrectly downloaded by GCC-4.6.3
-        # running this step here, prevents this
-        prepare_easyconfig(ec)
+    # determine recorded build stats once, which are used both for planning jobs and for requesting resources
+    repo = init_repository(get_repository(), get_repositorypath())
+    buildstats = [get_latest_buildstats(ec, repo) for ec in easyconfigs]
+    build_times = [det_build_time(stats) for stats in buildstats]
+
+    groups = plan_jobs(easyconfigs, build_times, merge_chains=build_option('job_merge_chains'),
+                       merge_siblings=build_option('job_merge_siblings'),
+                       max_time=build_option('job_merge_max_time'))
+
+    # This is very important, otherwise we might have race conditions
+    # e.g. GCC-4.5.3 finds cloog.tar.gz but it was incorrectly downloaded by GCC-4.6.3
+    # preparing all easyconfigs before submitting any job prevents this
+    prepare_easyconfigs(easyconfigs)
+
+    # submit sentinel job with a user hold, which all jobs without dependencies depend on,
+    # to prevent jobs from starting too quickly (we might still need them in the queue to set them as a dependency
+    # for another job); releasing the hold on the sentinel job after submission is completed starts all jobs
+    sentinel = None
+    if groups:
+        sentinel = backend.make_job('true', SENTINEL_JOB_NAME, resources=SENTINEL_JOB_RESOURCES)
+        sentinel.submit(with_hold=True)
+        sentinel.cleanup()
+        _log.info("sentinel job has been submitted (job id: %s)" % sentinel.jobid)
+
+    for group in groups:
+        group_ecs = [easyconfigs[idx] for idx in group]
 
         # the new job will only depend on already submitted jobs
-        _log.info("creating job for ec: %s" % str(ec))
-        new_job = create_job(build_command, ec, output_dir=output_dir, conn=conn, ppn=ppn)
+        _log.info("creating job for ecs: %s" % [ec['spec'] for ec in group_ecs])
+        new_job = create_job(backend, build_command, group_ecs, output_dir=output_dir,
+                             buildstats=[buildstats[idx] for idx in group])
 
         # sometimes unresolved_deps will contain things, not needed to be build
-        job_deps = [job_ids[dep] for dep in map(tokey, ec['unresolved_deps']) if dep in job_ids]
-        new_job.add_dependencies(job_deps)
-
-        # place user hold on job to prevent it from starting too quickly,
-        # we might still need it in the queue to set it as a dependency for another job;
-        # only set hold for job without dependencies, other jobs have a dependency hold set anyway
-        with_hold = False
+        job_deps = []
+        for ec in group_ecs:
+            for dep in [tokey(dep) for dep in ec['unresolved_deps']]:
+                if dep in job_ids and not job_ids[dep] in job_deps:
+                    job_deps.append(job_ids[dep])
         if not job_deps:
-            with_hold = True
+            job_deps = [sentinel.jobid]
+        new_job.add_dependencies(job_deps)
 
         # actually (try to) submit job
-        new_job.submit(with_hold)
-        _log.info("job for module %s has been submitted (job id: %s)" % (new_job.module, new_job.jobid))
+        new_job.submit()
+        _log.info("job for module(s) %s has been submitted (job id: %s)" % (new_job.module, new_job.jobid))
 
         # update dictionary
-        job_ids[new_job.module] = new_job.jobid
+        for mod_name in new_job.modules:
+            job_ids[mod_name] = new_job.jobid
         new_job.cleanup()
         jobs.append(new_job)
 
-    # release all user holds on jobs after submission is completed
-    for job in jobs:
-        if job.has_holds():
-            _log.info("releasing hold on job %s" % job.jobid)
-            job.release_hold()
-
-    disconnect_from_server(conn)
+    # release user hold on sentinel job after submission is completed, which starts all jobs
+    if sentinel is not None:
+        _log.info("releasing hold on sentinel job %s" % sentinel.jobid)
+        sentinel.release_hold()
+
+    # wait until all jobs have completed if requested, resubmitting failed jobs
+    if build_option('wait'):
+        monitor = JobMonitor(backend, jobs, retries=build_option('job_retries'),
+                             retry_policy=build_option('job_retry_policy'),
+                             poll_interval=build_option('job_poll_interval'))
+        monitor.wait()
+        for (job, status) in zip(monitor.jobs, monitor.status):
+            job.status = status
+        summary = monitor.summary()
+        print_msg(summary, log=_log, silent=build_option('silent'), prefix=False)
+        if output_dir is not None:
+            write_file(os.path.join(output_dir, JOBS_SUMMARY_FILENAME), summary + '\n')
+        jobs = monitor.jobs
+
+    # e.g. disconnect from server, or wait until all jobs have completed for job backends that run jobs locally
+    backend.complete()
 
     return jobs
 
 
-def create_job(build_command, easyconfig, output_dir=None, conn=None, ppn=None):
+def tokey(dep):
+    """Determine key for specified dependency."""
+    return ActiveMNS().det_full_module_name(dep)
+
+
+def get_latest_buildstats(easyconfig, repo):
+    """
+    Return build stats of latest build of specified easyconfig, as recorded in the specified repository
+    (None if no build stats are available)
+    """
+    ec_tuple = (easyconfig['ec']['name'], det_full_ec_version(easyconfig['ec']))
+    buildstats = repo.get_buildstats(*ec_tuple)
+    if buildstats:
+        return buildstats[-1]
+    else:
+        return None
+
+
+def det_build_time(buildstats):
+    """Determine build time (in minutes) from specified build stats (None if unknown)."""
+    if buildstats and buildstats.get('build_time'):
+        # build time is recorded in seconds
+        return buildstats['build_time'] / 60.0
+    else:
+        return None
+
+
+def det_job_resources(buildstats):
+    """
+    Estimate resources required for a job that builds easyconfigs with the specified build stats (one after the other),
+    based on the build time, CPU time, number of cores and peak memory usage that were recorded for the latest build.
+
+    The number of cores is derived from the CPU time relative to the build time (i.e., the effective level of
+    parallelism), or from the number of cores that were available if the CPU time was not recorded; the walltime and
+    amount of memory are padded using the job_walltime_factor and job_mem_factor build options.
+    For easyconfigs without (sufficient) build stats, the job_default_walltime and job_default_mem build options are
+    used, and no specific number of cores is requested (i.e., a full node).
+
+    @param buildstats: list of build stats for easyconfigs (None implies no build stats available)
+    returns dict with 'hours', 'cores' and/or 'mem' (in MB) keys
     """
-    Creates a job, to build a *single* easyconfig
+    walltime_factor = build_option('job_walltime_factor') or DEFAULT_JOB_WALLTIME_FACTOR
+    mem_factor = build_option('job_mem_factor') or DEFAULT_JOB_MEM_FACTOR
+    default_walltime = build_option('job_default_walltime') or DEFAULT_JOB_WALLTIME
+    default_mem = build_option('job_default_mem')
+
+    walltime, cores, mems = 0, [], []
+    for stats in buildstats:
+        build_time = det_build_time(stats)
+        if build_time is None:
+            walltime += default_walltime * 3600
+            cores.append(None)
+            mems.append(default_mem or None)
+            continue
+
+        walltime += stats['build_time'] * walltime_factor
+
+        if stats.get('cpu_time'):
+            cores.append(max(1, int(math.ceil(float(stats['cpu_time']) / stats['build_time']))))
+        else:
+            cores.append(stats.get('core_count'))
+
+        if stats.get('peak_rss'):
+            mems.append(int(math.ceil(stats['peak_rss'] * mem_factor / 1024 ** 2)))
+        else:
+            mems.append(default_mem or None)
+
+    resources = {'hours': max(1, int(math.ceil(walltime / 3600.0)))}
+    # builds in a single job run one after the other, so the maximum number of cores/memory is what's required
+    if cores and not None in cores:
+        resources['cores'] = max(cores)
+    if mems and not None in mems:
+        resources['mem'] = max(mems)
+
+    _log.debug("Estimated resources for job based on build stats %s: %s" % (buildstats, resources))
+    return resources
+
+
+def plan_jobs(easyconfigs, build_times, merge_chains=True, merge_siblings=False, max_time=None):
+    """
+    Plan jobs for building specified easyconfigs, by grouping easyconfigs that can be built in a single job.
+
+    Linear chains of dependencies (i.e., an easyconfig that only depends on a single other easyconfig, which no other
+    easyconfig depends on) are merged, since they have to be built one after the other anyway; groups of siblings
+    (i.e., easyconfigs with the exact same dependencies) are merged if they are known to build quickly enough.
+    The recorded build times are used to make sure the total build time of merged easyconfigs doesn't exceed
+    the specified maximum: for linear chains easyconfigs without known build time are considered to take as long as
+    the default walltime (cfr. job_default_walltime build option), while siblings are only merged if the build time
+    for all of them is known (since merging them limits parallelism). Easyconfigs are never merged if the walltime
+    estimated for the resulting job (cfr. det_job_resources) would exceed the maximum walltime for jobs.
+
+    @param easyconfigs: list of easyconfigs (as processed by process_easyconfig), in build order
+    @param build_times: list of build times for easyconfigs (in minutes, None implies unknown), cfr. det_build_time
+    @param merge_chains: merge linear chains of dependencies into a single job
+    @param merge_siblings: merge groups of siblings into a single job
+    @param max_time: maximum total build time (in minutes) for merged easyconfigs (None implies no maximum)
+
+    returns list of groups (lists of indices in list of easyconfigs, in build order),
+    such that each group only depends on earlier groups
+    """
+    walltime_factor = build_option('job_walltime_factor') or DEFAULT_JOB_WALLTIME_FACTOR
+    default_time = (build_option('job_default_walltime') or DEFAULT_JOB_WALLTIME) * 60
+
+    # estimated build time and walltime to request (in minutes), cfr. det_job_resources
+    times, walltimes = [], []
+    for build_time in build_times:
+        if build_time is None:
+            times.append(default_time)
+            walltimes.append(default_time)
+        else:
+            times.append(build_time)
+            walltimes.append(build_time * walltime_factor)
+
+    def fits(gidxs):
+        """
+        Check whether total build time for specified groups doesn't exceed maximum build time for merged easyconfigs,
+        and whether the walltime estimated for building them in a single job doesn't exceed the maximum walltime.
+        """
+        members = sum([groups[gidx] for gidx in gidxs], [])
+        total_time = sum([times[idx] for idx in members])
+        total_walltime = sum([walltimes[idx] for idx in members])
+        return (max_time is None or total_time <= max_time) and total_walltime <= MAX_WALLTIME * 60
+
+    # determine dependencies/dependents of each easyconfig, only considering easyconfigs that are being built
+    indices = dict([(ec['full_mod_name'], idx) for (idx, ec) in enumerate(easyconfigs)])
+    deps = []
+    dependents = [[] for _ in easyconfigs]
+    for (idx, ec) in enumerate(easyconfigs):
+        ec_deps = nub([indices[dep] for dep in map(tokey, ec['unresolved_deps']) if dep in indices])
+        deps.append(ec_deps)
+        for dep in ec_deps:
+            dependents[dep].append(idx)
+
+    # merge linear chains, by appending an easyconfig to the group of its only dependency,
+    # if it's the only easyconfig that depends on it and the dependency is at the end of that group
+    groups, group_of = [], {}
+    for (idx, ec) in enumerate(easyconfigs):
+        gidx = len(groups)
+        groups.append([idx])
+        if merge_chains and len(deps[idx]) == 1 and len(dependents[deps[idx][0]]) == 1:
+            dep_gidx = group_of[deps[idx][0]]
+            if groups[dep_gidx][-1] == deps[idx][0] and fits([dep_gidx, gidx]):
+                groups.pop()
+                groups[dep_gidx].append(idx)
+                gidx = dep_gidx
+
+        group_of[idx] = gidx
+
+    if merge_siblings:
+        # determine dependencies of each group (on other groups), and whether build times are known for all members
+        group_deps, known = [], []
+        for (gidx, group) in enumerate(groups):
+            gdeps = set([group_of[dep] for idx in group for dep in deps[idx]])
+            gdeps.discard(gidx)
+            group_deps.append(frozenset(gdeps))
+            known.append(all([build_times[idx] is not None for idx in group]))
+
+        # merge siblings with known build times using first fit decreasing, largest groups first;
+        # merged groups take the position of their first member, which has the same dependencies as the others
+        siblings = {}
+        for gidx in range(len(groups)):
+            if known[gidx] and fits([gidx]):
+                siblings.setdefault(group_deps[gidx], []).append(gidx)
+
+        group_times = [sum([times[idx] for idx in group]) for group in groups]
+        merged_into = {}
+        for gidxs in siblings.values():
+            bins = []
+            for gidx in sorted(gidxs, key=lambda gidx: (-group_times[gidx], gidx)):
+                for bin_gidxs in bins:
+                    if fits(bin_gidxs + [gidx]):
+                        bin_gidxs.append(gidx)
+                        break
+                else:
+                    bins.append([gidx])
+            for bin_gidxs in bins:
+                for gidx in bin_gidxs:
+                    merged_into[gidx] = min(bin_gidxs)
+
+        merged_groups = []
+        for gidx in range(len(groups)):
+            target = merged_into.get(gidx, gidx)
+            if target == gidx:
+                members = sorted([x for x in merged_into if merged_into[x] == gidx]) or [gidx]
+                merged_groups.append(sum([groups[x] for x in members], []))
+        groups = merged_groups
+
+    _log.info("Planned %d jobs for %d easyconfigs: %s" % (len(groups), len(easyconfigs), groups))
+    return groups
+
+
+def create_job(backend, build_command, easyconfigs, output_dir=None, buildstats=None):
+    """
+    Creates a job, to build a single easyconfig or a group of easyconfigs (one after the other, cfr. plan_jobs)
+    @param backend: job backend to create job with (JobBackend instance)
     @param build_command: format string for command, full path to an easyconfig file will be substituted in it
-    @param easyconfig: easyconfig as processed by process_easyconfig
+    @param easyconfigs: easyconfig as processed by process_easyconfig (or a list thereof, in build order)
     @param output_dir: optional output path; $EASYBUILDTESTOUTPUT will be set inside the job with this variable
-    @param conn: open connection to PBS server
-    @param ppn: ppn setting to use (# 'processors' (cores) per node to use)
+    @param buildstats: list of build stats of latest build for easyconfigs (determined from repository if None)
     returns the job
     """
     if output_dir is None:
         output_dir = 'easybuild-build'
-
-    # create command based on build_command template
-    command = build_command % {'spec': easyconfig['spec']}
+    if not isinstance(easyconfigs, (list, tuple)):
+        easyconfigs = [easyconfigs]
+    if buildstats is None:
+        repo = init_repository(get_repository(), get_repositorypath())
+        buildstats = [get_latest_buildstats(ec, repo) for ec in easyconfigs]
 
     # capture PYTHONPATH, MODULEPATH and all variables starting with EASYBUILD
     easybuild_vars = {}
@@ -148,27 +412,261 @@ def create_job(build_command, easyconfig, output_dir=None, conn=None, ppn=None):
 
     _log.info("Dictionary of environment variables passed to job: %s" % easybuild_vars)
 
-    # obtain unique name based on name/easyconfig version tuple
-    ec_tuple = (easyconfig['ec']['name'], det_full_ec_version(easyconfig['ec']))
-    name = '-'.join(ec_tuple)
-
     var = config.OLDSTYLE_ENVIRONMENT_VARIABLES['test_output_path']
-    easybuild_vars[var] = os.path.join(os.path.abspath(output_dir), name)
 
-    # just use latest build stats
-    repo = init_repository(get_repository(), get_repositorypath())
-    buildstats = repo.get_buildstats(*ec_tuple)
-    resources = {}
-    if buildstats:
-        previous_time = buildstats[-1]['build_time']
-        resources['hours'] = int(math.ceil(previous_time * 2 / 60))
-
-    job = PbsJob(command, name, easybuild_vars, resources=resources, conn=conn, ppn=ppn)
-    job.module = easyconfig['ec'].full_mod_name
+    commands, names, test_output_paths = [], [], []
+    for easyconfig in easyconfigs:
+        # create command based on build_command template
+        # blocks in an easyconfig file only exist in memory, so build the original file restricted to the block
+        (spec, block) = split_block_spec(easyconfig['spec'])
+        if block is None:
+            command = build_command % {'spec': spec}
+        else:
+            command = build_command % {'spec': '%s --only-blocks=%s' % (spec, block)}
+
+        # obtain unique name based on name/easyconfig version tuple
+        name = '-'.join([easyconfig['ec']['name'], det_full_ec_version(easyconfig['ec'])])
+        test_output_path = os.path.join(os.path.abspath(output_dir), name)
+
+        if len(easyconfigs) > 1:
+            # each build in a merged job gets its own test output path;
+            # builds are run in a subshell, such that build commands that consist of multiple commands are grouped
+            command = "(export %s=%s && %s)" % (var, test_output_path, command)
+        else:
+            easybuild_vars[var] = test_output_path
+
+        commands.append(command)
+        names.append(name)
+        test_output_paths.append(test_output_path)
+
+    if len(names) == 1:
+        name = names[0]
+    else:
+        name = '%s+%d' % (names[0], len(names) - 1)
+
+    # estimate required resources based on latest build stats
+    resources = det_job_resources(buildstats)
+
+    # stop at the first failed build in a merged job, such that the job reports the failure (via its exit code),
+    # and subsequent builds (which may depend on the failed one) are not run
+    job = backend.make_job(' && '.join(commands), name, easybuild_vars, resources=resources)
+    job.modules = [easyconfig['ec'].full_mod_name for easyconfig in easyconfigs]
+    job.module = ', '.join(job.modules)
+    # keep track of requested resources and test output paths, required to resubmit job and report on it
+    job.requested_resources = resources
+    job.test_output_paths = test_output_paths
 
     return job
 
 
+class JobMonitor(object):
+    """
+    Monitor submitted jobs until all of them have completed.
+
+    The state of all jobs is determined at once (cfr. job_states method of job backends) at every poll interval.
+    Failed jobs are resubmitted according to the retry policy (after removing the jobs that depend on them, which are
+    resubmitted as well); when no retries are left, jobs that depend on failed jobs are cancelled, since they can no
+    longer succeed.
+    """
+
+    def __init__(self, backend, jobs, retries=None, retry_policy=None, poll_interval=None):
+        """
+        Constructor
+        @param backend: job backend that was used to submit the jobs (JobBackend instance)
+        @param jobs: list of submitted jobs (cfr. create_job), such that jobs only depend on earlier jobs
+        @param retries: maximum number of times a failed job is resubmitted
+        @param retry_policy: how to resubmit failed jobs: 'none' (don't), 'resubmit' (as is) or 'force' (with --force)
+        @param poll_interval: interval (in seconds) between checks of the state of jobs
+        """
+        self.backend = backend
+        self.jobs = jobs[:]
+        if retry_policy is None:
+            retry_policy = DEFAULT_JOB_RETRY_POLICY
+        if retry_policy == JOB_RETRY_POLICY_NONE or retries is None:
+            retries = 0
+        if not retry_policy in JOB_RETRY_POLICIES:
+            _log.error("Unknown retry policy for jobs: %s (known policies: %s)" % (retry_policy, JOB_RETRY_POLICIES))
+        self.retries = retries
+        self.retry_policy = retry_policy
+        if poll_interval is None:
+            poll_interval = DEFAULT_JOB_POLL_INTERVAL
+        self.poll_interval = poll_interval
+
+        # status of each job: one of JOB_STATUSES (i.e., pending, success, failed or cancelled)
+        self.status = [JOB_PENDING] * len(jobs)
+        # job ids for all attempts for each job
+        self.job_ids = [[job.jobid] for job in jobs]
+        # number of times each job was resubmitted because it failed
+        self.attempts = [0] * len(jobs)
+
+        # dependencies between jobs, as indices in list of jobs
+        indices = dict([(job.jobid, idx) for (idx, job) in enumerate(jobs)])
+        self.deps = [[indices[dep] for dep in job.deps if dep in indices] for job in jobs]
+
+        self.progress = None
+
+    def dependents(self, idx):
+        """Return (sorted) list of indices of jobs that (transitively) depend on specified job."""
+        dependents = set([idx])
+        for (dep_idx, deps) in enumerate(self.deps):
+            if dep_idx > idx and dependents.intersection(deps):
+                dependents.add(dep_idx)
+        dependents.remove(idx)
+        return sorted(dependents)
+
+    def job_succeeded(self, job):
+        """
+        Determine whether specified (finished) job was successful, i.e. whether the module files for all modules
+        it should install exist (and whether its exit code is zero, if it's known).
+        Module files are checked for in the install path for modules (cfr. ModuleGenerator.prepare) rather than
+        via $MODULEPATH, which may not include it (e.g. for modules in a hierarchy).
+        """
+        if getattr(job, 'exit_code', None):
+            return False
+
+        mod_path = os.path.join(install_path('mod'), build_option('suffix_modules_path'))
+        for mod_name in getattr(job, 'modules', []):
+            mod_file = os.path.join(mod_path, mod_name)
+            if not [path for path in [mod_file, mod_file + LUA_MODULE_FILE_EXTENSION] if os.path.isfile(path)]:
+                _log.debug("Module file for %s not found in %s" % (mod_name, mod_path))
+                return False
+        return True
+
+    def resubmit(self, idx, force=False):
+        """Resubmit specified job (optionally with --force), which depends on all of its pending dependencies."""
+        job = self.jobs[idx]
+        env_vars = job.env_vars.copy()
+        if force:
+            env_vars['EASYBUILD_FORCE'] = '1'
+
+        new_job = self.backend.make_job(job.script, job.name, env_vars, resources=job.requested_resources)
+        for attr in ['modules', 'module', 'requested_resources', 'test_output_paths']:
+            setattr(new_job, attr, getattr(job, attr, None))
+        new_job.add_dependencies([self.jobs[dep].jobid for dep in self.deps[idx] if self.status[dep] == JOB_PENDING])
+        new_job.submit()
+        new_job.cleanup()
+        _log.info("Resubmitted job %s (job id: %s, was %s)" % (job.name, new_job.jobid, job.jobid))
+
+        self.jobs[idx] = new_job
+        self.job_ids[idx].append(new_job.jobid)
+
+    def handle_failed_job(self, idx, states):
+        """
+        Handle failed job: remove jobs that depend on it (since they can no longer succeed), and
+        either resubmit the failed job and the jobs that depend on it (if retries are left), or cancel them.
+        """
+        job = self.jobs[idx]
+        dependents = [dep for dep in self.dependents(idx) if self.status[dep] == JOB_PENDING]
+        for dep in dependents:
+            if states.get(self.jobs[dep].jobid) in ['queued', 'running']:
+                self.jobs[dep].remove()
+
+        if self.attempts[idx] < self.retries:
+            self.attempts[idx] += 1
+            tup = (job.name, job.jobid, self.attempts[idx], self.retries)
+            print_msg("job %s (job id: %s) failed, resubmitting it (attempt %d of %d)" % tup, log=_log,
+                      silent=build_option('silent'))
+            self.resubmit(idx, force=self.retry_policy == JOB_RETRY_POLICY_FORCE)
+            for dep in dependents:
+                self.resubmit(dep)
+        else:
+            self.status[idx] = JOB_FAILED
+            for dep in dependents:
+                self.status[dep] = JOB_CANCELLED
+            tup = (job.name, job.jobid, len(dependents))
+            print_msg("job %s (job id: %s) failed, cancelled %d jobs that depend on it" % tup, log=_log,
+                      silent=build_option('silent'))
+
+    def report_progress(self, states):
+        """Report progress across all jobs (only if it changed since last report)."""
+        counts = dict([(status, self.status.count(status)) for status in JOB_STATUSES])
+        pending_states = [states.get(self.jobs[idx].jobid) for idx in range(len(self.jobs))
+                          if self.status[idx] == JOB_PENDING]
+        counts.update({
+            'running': pending_states.count('running'),
+            'queued': len(pending_states) - pending_states.count('running'),
+            'total': len(self.jobs),
+        })
+        progress = ("%(success)d/%(total)d jobs completed successfully, %(failed)d failed, %(cancelled)d cancelled, "
+                    "%(running)d running, %(queued)d queued" % counts)
+        if progress != self.progress:
+            print_msg(progress, log=_log, silent=build_option('silent'))
+            self.progress = progress
+
+    def wait(self):
+        """Wait until all jobs have completed (successfully or not), while resubmitting or cancelling jobs."""
+        while JOB_PENDING in self.status:
+            pending = [idx for idx in range(len(self.jobs)) if self.status[idx] == JOB_PENDING]
+            states = self.backend.job_states([self.jobs[idx] for idx in pending])
+            for idx in pending:
+                # status may have changed because of a failed job in the meantime
+                if self.status[idx] == JOB_PENDING and states.get(self.jobs[idx].jobid) == 'finished':
+                    if self.job_succeeded(self.jobs[idx]):
+                        self.status[idx] = JOB_SUCCESS
+                    else:
+                        self.handle_failed_job(idx, states)
+
+            self.report_progress(states)
+            if JOB_PENDING in self.status:
+                time.sleep(self.poll_interval)
+
+        return self.status.count(JOB_SUCCESS) == len(self.jobs)
+
+    def summary(self):
+        """Return summary for all jobs: location of job output/test reports, and tail of output of failed jobs."""
+        lines = ["Summary of jobs:"]
+        for (idx, job) in enumerate(self.jobs):
+            tup = (job.name, self.status[idx], ', '.join([str(x) for x in self.job_ids[idx]]))
+            lines.append("* %s: %s (job id(s): %s)" % tup)
+
+            output_file = getattr(job, 'output_file', None)
+            if output_file is None and job.jobid is not None:
+                # PBS places output in <job name>.o<job id> in working directory of job (by default)
+                output_file = os.path.join(os.getcwd(), '%s.o%s' % (job.name, str(job.jobid).split('.')[0]))
+            if output_file is not None and os.path.exists(output_file):
+                lines.append("  output: %s" % output_file)
+                if self.status[idx] == JOB_FAILED:
+                    tail = read_file(output_file).splitlines()[-JOB_OUTPUT_TAIL_LINES:]
+                    lines.extend(["  | %s" % line for line in tail])
+
+            for path in getattr(job, 'test_output_paths', None) or []:
+                if os.path.exists(path):
+                    lines.append("  test report: %s" % path)
+
+        tup = (self.status.count(JOB_SUCCESS), len(self.jobs), self.status.count(JOB_FAILED),
+               self.status.count(JOB_CANCELLED), sum(self.attempts))
+        lines.append("%d/%d jobs completed successfully, %d failed, %d cancelled (%d resubmissions)" % tup)
+        return '\n'.join(lines)
+
+
+def _prepare_easyconfigs(easyconfigs):
+    """Prepare for building specified easyconfigs, one after the other (worker function)."""
+    for ec in easyconfigs:
+        prepare_easyconfig(ec)
+
+
+def prepare_easyconfigs(easyconfigs):
+    """
+    Prepare for building specified easyconfigs (fetch sources), in parallel (one process per available core).
+    Easyconfigs for the same software are prepared one after the other in the same process,
+    since they are likely to share sources.
+    """
+    names, ecs = [], {}
+    for ec in easyconfigs:
+        name = ec['ec']['name']
+        if not name in ecs:
+            names.append(name)
+            ecs[name] = []
+        ecs[name].append(ec)
+
+    max_procs = get_avail_core_count()
+    _log.info("Preparing %d easyconfigs, using up to %d processes" % (len(easyconfigs), max_procs))
+    res = map_in_processes(_prepare_easyconfigs, [ecs[name] for name in names], max_procs)
+    errors = [err for (ok, err) in res if not ok]
+    if errors:
+        _log.error("Failed to prepare easyconfigs: %s" % '; '.join(errors))
+
+
 def prepare_easyconfig(ec):
     """
     Prepare for building specified easyconfig (fetch sources)
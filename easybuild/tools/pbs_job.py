@@ -76,6 +76,34 @@ def disconnect_from_server(conn):
     pbs.pbs_disconnect(conn)
 
 
+def get_job_states(conn):
+    """
+    Determine state and exit status of all jobs known to PBS server, using a single query.
+    Returns dict with tuple of PBS job state (e.g. 'Q', 'R', 'C') and exit status (None if unknown) per job id.
+    """
+    if pbs_import_failed:
+        _log.error(pbs_import_failed)
+        return None
+
+    jobattr = pbs.new_attrl(2)
+    jobattr[0].name = 'job_state'
+    jobattr[1].name = 'exit_status'
+    jobs = pbs.pbs_statjob(conn, '', jobattr, NULL)
+    is_error, errormsg = pbs.error()
+    if is_error:
+        _log.error("Failed to query PBS server for job states: %s" % errormsg)
+
+    job_states = {}
+    for job in jobs:
+        attribs = dict([(attrib.name, attrib.value) for attrib in job.attribs])
+        exit_status = attribs.get('exit_status')
+        if exit_status is not None:
+            exit_status = int(exit_status)
+        job_states[job.name] = (attribs.get('job_state'), exit_status)
+    _log.debug("Found states for %d jobs: %s" % (len(job_states), job_states))
+    return job_states
+
+
 def get_ppn():
     """Guess the ppn for full node"""
 
@@ -103,8 +131,8 @@ class PbsJob(object):
         """
         create a new Job to be submitted to PBS
         env_vars is a dictionary with key-value pairs of environment variables that should be passed on to the job
-        resources is a dictionary with optional keys: ['hours', 'cores'] both of these should be integer values.
-        hours can be 1 - MAX_WALLTIME, cores depends on which cluster it is being run.
+        resources is a dictionary with optional keys: ['hours', 'cores', 'mem'] all of these should be integer values.
+        hours can be 1 - MAX_WALLTIME, cores depends on which cluster it is being run, mem is specified in MB.
         """
         self.clean_conn = True
         self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
@@ -145,11 +173,13 @@ class PbsJob(object):
             self.log.warn("number of requested cores (%s) was greater than available (%s) " % (cores, max_cores))
             cores = max_cores
 
-        # only allow cores and hours for now.
+        # only allow cores, hours and memory for now.
         self.resources = {
                           "walltime": "%s:00:00" % hours,
                           "nodes": "1:ppn=%s" % cores
                          }
+        if resources.get('mem'):
+            self.resources['mem'] = "%smb" % resources['mem']
         # set queue based on the hours requested
         if hours >= 12:
             self.queue = 'long'
@@ -0,0 +1,435 @@
+# #
+# Copyright 2014 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Process layer to drive (several) child processes concurrently, from a single select-based event loop.
+
+Child processes for which a timeout applies run in a process group of their own (in the same session, so they keep
+the controlling terminal), such that they can be killed together with all processes they spawned.
+Output is handed to a callback as soon as it becomes available, input is fed to the child process without blocking,
+and both a total timeout and a no-output timeout can be specified per command.
+"""
+import errno
+import os
+import select
+import signal
+import subprocess
+import time
+
+from vsc.utils import fancylogger
+
+# multiprocessing is only available in Python 2.6 and more recent,
+# functions are applied sequentially in the current process if it is missing (cfr. map_in_processes)
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None
+
+import easybuild.tools.build_log  # this import is required to obtain a correct (EasyBuild) logger!
+
+
+_log = fancylogger.getLogger('process', fname=False)
+
+
+READ_SIZE = 1024 * 8
+# minimal size of pipe buffer, as specified by POSIX
+WRITE_SIZE = 512
+
+# interval (in seconds) for checking whether processes that closed their output have exited (when a timeout applies)
+EXIT_POLL_INTERVAL = 0.1
+
+# function and list of items being mapped by map_in_processes;
+# set before worker processes are forked, so only indices and results need to be passed around (pickled)
+_map_args = None
+
+STDOUT = 'stdout'
+STDERR = 'stderr'
+
+
+class Process(object):
+    """
+    A child process, of which the output is handled as soon as it becomes available.
+    """
+
+    def __init__(self, cmd, shell=True, inp=None, env=None, merge_stderr=True, interactive=False,
+                 timeout=None, no_output_timeout=None, output_handler=None, idle_handler=None):
+        """
+        Constructor
+        @param cmd: command to run (string if shell is True, list of arguments otherwise)
+        @param shell: run command through bash
+        @param inp: input to feed to the command via stdin
+        @param env: environment to run command in (None implies current environment)
+        @param merge_stderr: merge stderr into stdout
+        @param interactive: keep stdin open after feeding input, so more input can be sent (cfr. send method)
+        @param timeout: maximum number of seconds the command is allowed to run
+        @param no_output_timeout: maximum number of seconds to wait for new output
+        @param output_handler: function to call with process, new output and stream name as soon as output is available;
+                               if no output handler is specified, output is retained (cfr. get_output method)
+        @param idle_handler: function to call with process when no output was produced for no_output_timeout seconds;
+                             command will be killed unless True is returned
+        """
+        self.cmd = cmd
+        self.shell = shell
+        self.env = env
+        self.merge_stderr = merge_stderr
+        self.interactive = interactive
+        self.timeout = timeout
+        self.no_output_timeout = no_output_timeout
+        self.output_handler = output_handler
+        self.idle_handler = idle_handler
+        self.own_process_group = timeout is not None or no_output_timeout is not None
+
+        self.pending_input = inp or ''
+        self.output = {STDOUT: [], STDERR: []}
+
+        self.proc = None
+        self.pid = None
+        self.streams = {}
+        self.stdin_fd = None
+
+        self.start_time = None
+        self.end_time = None
+        self.last_output_time = None
+        self.exit_code = None
+        self.cancelled = False
+        self.timed_out = False
+
+    def start(self):
+        """Start the command, in a new process group."""
+        kwargs = {
+            'stdin': subprocess.PIPE,
+            'stdout': subprocess.PIPE,
+            'stderr': subprocess.PIPE,
+            'close_fds': True,
+            'env': self.env,
+            'shell': self.shell,
+        }
+        if self.own_process_group:
+            # run command in a process group of its own, so it can be killed as a whole when a timeout expires
+            kwargs['preexec_fn'] = os.setpgrp
+        if self.merge_stderr:
+            kwargs['stderr'] = subprocess.STDOUT
+        if self.shell:
+            kwargs['executable'] = '/bin/bash'
+
+        self.proc = subprocess.Popen(self.cmd, **kwargs)
+        self.pid = self.proc.pid
+        self.start_time = self.last_output_time = time.time()
+        _log.debug("Started command '%s' (pid %s)" % (self.cmd, self.pid))
+
+        self.streams[self.proc.stdout.fileno()] = STDOUT
+        if not self.merge_stderr:
+            self.streams[self.proc.stderr.fileno()] = STDERR
+
+        self.stdin_fd = self.proc.stdin.fileno()
+        if not self.pending_input and not self.interactive:
+            self.close_stdin()
+
+    def send(self, txt):
+        """Send input to the command (without blocking)."""
+        if self.stdin_fd is None:
+            _log.debug("Not sending input to command '%s', stdin is closed: %s" % (self.cmd, txt))
+        else:
+            self.pending_input += txt
+
+    def close_stdin(self):
+        """Close stdin of the command."""
+        if self.stdin_fd is not None:
+            self.proc.stdin.close()
+            self.stdin_fd = None
+            self.pending_input = ''
+
+    def handle_read(self, fd):
+        """Read available output from specified file descriptor."""
+        try:
+            txt = os.read(fd, READ_SIZE)
+        except OSError, err:
+            if err.errno in [errno.EINTR, errno.EAGAIN]:
+                return
+            _log.debug("Failed to read output of command '%s': %s" % (self.cmd, err))
+            txt = ''
+
+        stream = self.streams[fd]
+        if txt:
+            self.last_output_time = time.time()
+            if self.output_handler is None:
+                self.output[stream].append(txt)
+            else:
+                self.output_handler(self, txt, stream)
+        else:
+            del self.streams[fd]
+
+    def handle_write(self):
+        """Feed (part of) pending input to the command."""
+        try:
+            # only write as much as is guaranteed not to block
+            cnt = os.write(self.stdin_fd, self.pending_input[:WRITE_SIZE])
+            self.pending_input = self.pending_input[cnt:]
+        except OSError, err:
+            if err.errno in [errno.EINTR, errno.EAGAIN]:
+                return
+            # command stopped reading input (e.g., EPIPE)
+            _log.debug("Failed to send input to command '%s': %s" % (self.cmd, err))
+            self.close_stdin()
+
+        if not self.pending_input and not self.interactive:
+            self.close_stdin()
+
+    def deadline(self):
+        """Determine time at which a timeout should be checked next (None if no timeout applies)."""
+        deadlines = []
+        if self.timed_out or self.cancelled:
+            return None
+        if self.timeout is not None:
+            deadlines.append(self.start_time + self.timeout)
+        if self.streams and self.no_output_timeout is not None:
+            deadlines.append(self.last_output_time + self.no_output_timeout)
+        if deadlines:
+            return min(deadlines)
+        else:
+            return None
+
+    def check_timeouts(self, now):
+        """Check whether timeouts for this command expired, and kill it if so."""
+        if self.timed_out or self.cancelled:
+            return
+
+        if self.timeout is not None and now - self.start_time >= self.timeout:
+            _log.warning("Command '%s' did not complete within %s seconds, killing it" % (self.cmd, self.timeout))
+            self.timed_out = True
+            self.kill()
+
+        elif self.streams and self.no_output_timeout is not None and \
+                now - self.last_output_time >= self.no_output_timeout:
+            if self.idle_handler is not None and self.idle_handler(self):
+                self.last_output_time = now
+            else:
+                tup = (self.cmd, self.no_output_timeout)
+                _log.warning("Command '%s' did not produce output for %s seconds, killing it" % tup)
+                self.timed_out = True
+                self.kill()
+
+    def kill(self, sig=signal.SIGKILL):
+        """Kill the command, and all processes in its process group (if it runs in a process group of its own)."""
+        killed = False
+        if self.own_process_group:
+            _log.debug("Sending signal %s to process group of command '%s' (pid %s)" % (sig, self.cmd, self.pid))
+            try:
+                os.killpg(self.pid, sig)
+                killed = True
+            except OSError, err:
+                _log.debug("Failed to kill process group %s: %s" % (self.pid, err))
+
+        if not killed:
+            _log.debug("Sending signal %s to command '%s' (pid %s)" % (sig, self.cmd, self.pid))
+            try:
+                os.kill(self.pid, sig)
+            except OSError, err:
+                _log.debug("Failed to kill process %s: %s" % (self.pid, err))
+
+        # don't wait for output of processes that escaped from the process group
+        self.close_stdin()
+        for fd in self.streams.keys():
+            del self.streams[fd]
+
+    def cancel(self):
+        """Cancel the command."""
+        self.cancelled = True
+        self.kill()
+        self.finish(self.proc.wait())
+
+    def is_done(self):
+        """Check whether all output was read, and reap the command if so."""
+        if self.streams:
+            return False
+
+        self.close_stdin()
+        exit_code = self.proc.poll()
+        if exit_code is None:
+            # command closed its output, but is still running
+            return False
+
+        self.finish(exit_code)
+        return True
+
+    def finish(self, exit_code):
+        """Wrap up after command exited with specified exit code."""
+        self.exit_code = exit_code
+        self.end_time = time.time()
+        self.proc.stdout.close()
+        if not self.merge_stderr:
+            self.proc.stderr.close()
+
+        tup = (self.cmd, self.exit_code, self.end_time - self.start_time)
+        _log.debug("Command '%s' exited with exit code %s after %.2fs" % tup)
+
+    def get_output(self, stream=STDOUT):
+        """Return retained output for specified stream."""
+        return ''.join(self.output[stream])
+
+
+class ProcessMultiplexer(object):
+    """
+    Drive several child processes concurrently, using a single select-based event loop.
+    """
+
+    def __init__(self, max_procs=None):
+        """
+        Constructor
+        @param max_procs: maximum number of processes to run concurrently (None implies no limit)
+        """
+        self.max_procs = max_procs
+        self.queued = []
+        self.running = []
+        self.done = []
+
+    def add(self, proc):
+        """Add process to run."""
+        self.queued.append(proc)
+
+    def cancel(self):
+        """Cancel all running processes, and discard queued ones."""
+        for proc in self.running:
+            proc.cancel()
+            self.done.append(proc)
+        for proc in self.queued:
+            proc.cancelled = True
+        self.running = []
+        self.queued = []
+
+    def start_procs(self):
+        """Start queued processes, taking into account maximum number of concurrent processes."""
+        while self.queued and (self.max_procs is None or len(self.running) < self.max_procs):
+            proc = self.queued.pop(0)
+            proc.start()
+            self.running.append(proc)
+
+    def poll(self):
+        """Wait for one of the running processes to produce output or accept input, and handle it."""
+        readers, writers = {}, {}
+        deadlines = []
+        for proc in self.running:
+            for fd in proc.streams:
+                readers[fd] = proc
+            if proc.stdin_fd is not None and proc.pending_input:
+                writers[proc.stdin_fd] = proc
+            deadline = proc.deadline()
+            if deadline is not None:
+                deadlines.append(deadline)
+
+        timeout = None
+        if deadlines:
+            timeout = max(0, min(deadlines) - time.time())
+
+        if readers or writers:
+            try:
+                (ready_read, ready_write, _) = select.select(readers.keys(), writers.keys(), [], timeout)
+            except select.error, err:
+                if err.args[0] == errno.EINTR:
+                    return
+                raise
+
+            for fd in ready_write:
+                writers[fd].handle_write()
+            for fd in ready_read:
+                # stream may have been closed already because process got killed
+                if fd in readers[fd].streams:
+                    readers[fd].handle_read(fd)
+        else:
+            # all running processes closed their output, so just wait for them to exit
+            if timeout is None:
+                self.running[0].proc.wait()
+            else:
+                time.sleep(min(timeout, EXIT_POLL_INTERVAL))
+
+        now = time.time()
+        for proc in self.running[:]:
+            proc.check_timeouts(now)
+            if proc.is_done():
+                self.running.remove(proc)
+                self.done.append(proc)
+
+    def run(self):
+        """Run all processes, until they're all done; return list of processes (in order of completion)."""
+        try:
+            self.start_procs()
+            while self.running:
+                self.poll()
+                self.start_procs()
+        except:
+            # make sure no processes are left behind on errors or interrupts
+            self.cancel()
+            raise
+
+        return self.done
+
+
+def run_process(proc):
+    """Run specified process (synchronous)."""
+    run_processes([proc])
+    return proc
+
+
+def run_processes(procs, max_procs=None):
+    """Run specified processes concurrently, until they're all done (synchronous)."""
+    mux = ProcessMultiplexer(max_procs=max_procs)
+    for proc in procs:
+        mux.add(proc)
+    mux.run()
+    return procs
+
+
+def _map_one(idx):
+    """Apply function being mapped to item with specified index (worker function)."""
+    (func, items) = _map_args
+    try:
+        return (True, func(items[idx]))
+    except Exception, err:
+        # purposely catch all exceptions, since they can not be passed back from a worker process as is
+        return (False, "%s: %s" % (err.__class__.__name__, err))
+
+
+def map_in_processes(func, items, max_procs):
+    """
+    Apply specified function to each of the items, using a pool of (at most max_procs) worker processes.
+    Worker processes inherit the items when they are forked, so only the results must be picklable.
+    Returns a list of (success, result or error message) tuples, in the same order as the items.
+    """
+    global _map_args
+
+    _map_args = (func, items)
+    try:
+        if multiprocessing is not None and max_procs > 1 and len(items) > 1:
+            pool = multiprocessing.Pool(min(max_procs, len(items)))
+            try:
+                res = pool.map(_map_one, range(len(items)))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            res = [_map_one(idx) for idx in range(len(items))]
+    finally:
+        _map_args = None
+
+    return res
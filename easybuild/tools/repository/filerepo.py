@@ -40,8 +40,9 @@ import os
 import time
 
 from easybuild.framework.easyconfig.easyconfig import EasyConfig
+from easybuild.framework.easyconfig.format.one import read_easyconfig_spec
 from easybuild.framework.easyconfig.tools import stats_to_str
-from easybuild.tools.filetools import mkdir, read_file, write_file
+from easybuild.tools.filetools import mkdir, write_file
 from easybuild.tools.repository.repository import Repository
 from easybuild.tools.version import VERBOSE_VERSION
 
@@ -83,7 +84,7 @@ class FileRepository(Repository):
         txt = "# Built with EasyBuild version %s on %s\n" % (VERBOSE_VERSION, time.strftime("%Y-%m-%d_%H-%M-%S"))
 
         # copy file
-        txt += read_file(cfg)
+        txt += read_easyconfig_spec(cfg)
 
         # append a line to the eb file so that we don't have git merge conflicts
         if not previous:
@@ -0,0 +1,396 @@
+# #
+# Copyright 2014 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+# #
+"""
+Monitor resources (memory, CPU time, I/O) consumed by the processes spawned during a build, via /proc.
+
+Resource usage is sampled periodically for the whole process tree below the EasyBuild process
+(i.e., all commands run via run_cmd/run_cmd_qa and whatever they spawn), and summarized per step.
+Monitoring is only done when requested, via --resource-sample-interval.
+
+CPU time and I/O of processes that already exited are accounted for via the EasyBuild process itself,
+since the kernel adds these to the totals of the parent process when a child process is reaped.
+"""
+import os
+import resource
+import threading
+import time
+
+from vsc.utils import fancylogger
+
+from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.filetools import read_file, write_file
+
+
+_log = fancylogger.getLogger('resource_monitor', fname=False)
+
+# default interval (in seconds) between samples
+DEFAULT_SAMPLE_INTERVAL = 5
+
+# name of file (in log directory of installation) that time series of resource usage is written to
+RESOURCE_USAGE_FILENAME = 'easybuild-resource-usage.tsv'
+
+RESOURCE_USAGE_FIELDS = ['time', 'step', 'parallel', 'nprocs', 'rss', 'cpu_time', 'read_bytes', 'write_bytes']
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+
+
+def _read_proc_file(pid, name):
+    """Read /proc/<pid>/<name>, return None if it's not available (e.g., when process already exited)."""
+    try:
+        f = open(os.path.join('/proc', str(pid), name), 'r')
+        txt = f.read()
+        f.close()
+    except (IOError, OSError):
+        txt = None
+    return txt
+
+
+def _parse_stat(txt):
+    """Parse contents of /proc/<pid>/stat, return list of fields following the command name."""
+    # command name may contain spaces and parentheses, so split on the last closing parenthesis
+    return txt[txt.rfind(')') + 2:].split()
+
+
+def get_children(pid):
+    """
+    Return list of PIDs of the (live) child processes of the process with the specified PID,
+    via /proc/<pid>/task/<tid>/children; returns None if that is not supported by the kernel.
+    """
+    try:
+        tids = os.listdir(os.path.join('/proc', str(pid), 'task'))
+    except OSError:
+        tids = []
+
+    children = None
+    for tid in tids:
+        txt = _read_proc_file(pid, os.path.join('task', tid, 'children'))
+        if txt is not None:
+            children = (children or []) + [int(x) for x in txt.split()]
+
+    return children
+
+
+def get_process_tree(root_pid):
+    """Return list of PIDs of all (live) descendants of the process with the specified PID."""
+    children_of = get_children
+    todo = get_children(root_pid)
+    if todo is None:
+        # /proc/<pid>/task/<tid>/children is not available, so determine parent of every process instead
+        children = {}
+        for entry in os.listdir('/proc'):
+            if entry.isdigit():
+                txt = _read_proc_file(entry, 'stat')
+                if txt:
+                    ppid = int(_parse_stat(txt)[1])
+                    children.setdefault(ppid, []).append(int(entry))
+        children_of = children.get
+        todo = children_of(root_pid, [])
+
+    pids = []
+    while todo:
+        pid = todo.pop()
+        pids.append(pid)
+        todo.extend(children_of(pid) or [])
+
+    return pids
+
+
+def get_io_counters(pid='self'):
+    """Return (read_bytes, write_bytes) tuple of I/O counters for specified process (zeros if not available)."""
+    counters = {'read_bytes': 0, 'write_bytes': 0}
+    txt = _read_proc_file(pid, 'io')
+    if txt:
+        for line in txt.splitlines():
+            parts = line.split(':', 1)
+            if parts[0] in counters:
+                counters[parts[0]] = int(parts[1])
+    return (counters['read_bytes'], counters['write_bytes'])
+
+
+def get_children_cpu_time():
+    """Return CPU time (user + system, in seconds) consumed by child processes that already exited."""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def sample_process_tree(root_pid=None):
+    """
+    Sample resource usage of process tree below the process with specified PID (default: current process).
+    Returns a dict with number of processes, total resident memory (in bytes), and cumulative CPU time
+    (in seconds) and I/O (in bytes), including that of processes in the tree that already exited.
+    """
+    if root_pid is None:
+        root_pid = os.getpid()
+
+    (read_bytes, write_bytes) = get_io_counters(root_pid)
+    res = {
+        'nprocs': 0,
+        'rss': 0,
+        'cpu_time': get_children_cpu_time(),
+        'read_bytes': read_bytes,
+        'write_bytes': write_bytes,
+    }
+    for pid in get_process_tree(root_pid):
+        stat = _read_proc_file(pid, 'stat')
+        if stat:
+            fields = _parse_stat(stat)
+            res['nprocs'] += 1
+            # utime, stime, cutime, cstime (in clock ticks); rss (in pages)
+            res['cpu_time'] += float(sum([int(x) for x in fields[11:15]])) / CLOCK_TICKS
+            res['rss'] += int(fields[21]) * PAGE_SIZE
+            (read_bytes, write_bytes) = get_io_counters(pid)
+            res['read_bytes'] += read_bytes
+            res['write_bytes'] += write_bytes
+
+    return res
+
+
+class ResourceMonitor(object):
+    """
+    Periodically sample resource usage of the process tree below the EasyBuild process, and summarize it per step.
+    """
+
+    def __init__(self, interval=None, root_pid=None):
+        """
+        Constructor
+        @param interval: interval (in seconds) between samples (None implies default, cfr. DEFAULT_SAMPLE_INTERVAL)
+        @param root_pid: PID of process of which the descendants should be monitored (default: current process)
+        """
+        if interval is None:
+            interval = DEFAULT_SAMPLE_INTERVAL
+        self.interval = interval
+        self.root_pid = root_pid
+
+        self.start_time = None
+        self.samples = []
+        self.steps = []
+        self.step = None
+        self.step_info = None
+        self.parallel = None
+
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def take_sample(self):
+        """Take a sample of current resource usage."""
+        sample = sample_process_tree(self.root_pid)
+        self.lock.acquire()
+        try:
+            sample.update({
+                'time': round(time.time() - self.start_time, 2),
+                'step': self.step,
+                'parallel': self.parallel,
+            })
+            self.samples.append(sample)
+            if self.step_info is not None:
+                self.step_info['peak_rss'] = max(self.step_info['peak_rss'], sample['rss'])
+                self.step_info['peak_nprocs'] = max(self.step_info['peak_nprocs'], sample['nprocs'])
+        finally:
+            self.lock.release()
+        return sample
+
+    def _try_sample(self):
+        """Take a sample of current resource usage, return None if that failed (e.g., /proc is not available)."""
+        try:
+            return self.take_sample()
+        except Exception, err:
+            _log.debug("Failed to sample resource usage: %s" % err)
+            return None
+
+    def _sample_loop(self):
+        """Take samples until monitor is stopped."""
+        while not self.stop_event.isSet():
+            self._try_sample()
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        """Start monitoring resource usage (in a background thread)."""
+        self.start_time = time.time()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._sample_loop, name='resource-monitor')
+        self.thread.setDaemon(True)
+        self.thread.start()
+        _log.debug("Started monitoring resource usage (sample interval: %ss)" % self.interval)
+
+    def stop(self):
+        """Stop monitoring resource usage."""
+        if self.step is not None:
+            self.stop_step()
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+            _log.debug("Stopped monitoring resource usage (%d samples)" % len(self.samples))
+
+    def start_step(self, step, parallel=None):
+        """
+        Start monitoring resource usage for the specified step.
+        If resource usage can not be sampled, the step is not monitored (cfr. stop_step).
+        @param parallel: level of parallelism for this step (if known)
+        """
+        if self.thread is None:
+            self.start()
+
+        start = self._try_sample()
+        self.lock.acquire()
+        try:
+            self.step = step
+            self.parallel = parallel
+            if start is None:
+                self.step_info = None
+            else:
+                self.step_info = {
+                    'step': step,
+                    'start': start,
+                    'peak_rss': start['rss'],
+                    'peak_nprocs': start['nprocs'],
+                }
+        finally:
+            self.lock.release()
+
+    def stop_step(self, parallel=None):
+        """
+        Stop monitoring resource usage for the current step, and return a summary for it
+        (or None if resource usage could not be sampled).
+        @param parallel: level of parallelism that was used, to determine CPU utilisation (default: as for start_step)
+        """
+        self.lock.acquire()
+        try:
+            if parallel is not None:
+                self.parallel = parallel
+        finally:
+            self.lock.release()
+
+        end = None
+        if self.step_info is not None:
+            end = self._try_sample()
+        self.lock.acquire()
+        try:
+            step = self.step
+            info = self.step_info
+            parallel = self.parallel
+            self.step = self.step_info = self.parallel = None
+        finally:
+            self.lock.release()
+
+        if info is None or end is None:
+            _log.debug("No resource usage available for %s step" % step)
+            return None
+
+        start = info.pop('start')
+        wall_time = max(end['time'] - start['time'], 0.01)
+        info.update({
+            'parallel': parallel,
+            'wall_time': round(wall_time, 2),
+            'cpu_time': round(end['cpu_time'] - start['cpu_time'], 2),
+            'read_bytes': end['read_bytes'] - start['read_bytes'],
+            'write_bytes': end['write_bytes'] - start['write_bytes'],
+        })
+        info['cpu_utilisation'] = round(info['cpu_time'] / (wall_time * max(parallel or 1, 1)), 2)
+        self.steps.append(info)
+
+        _log.debug("Resource usage for %s step: %s" % (info['step'], info))
+        return info
+
+    def summary(self):
+        """Return summary of resource usage, across all (monitored) steps."""
+        res = {
+            'peak_rss': 0,
+            'cpu_time': 0,
+            'read_bytes': 0,
+            'write_bytes': 0,
+        }
+        for info in self.steps:
+            res['peak_rss'] = max(res['peak_rss'], info['peak_rss'])
+            for key in ['cpu_time', 'read_bytes', 'write_bytes']:
+                res[key] += info[key]
+        res['cpu_time'] = round(res['cpu_time'], 2)
+        res['steps'] = [(info['step'], dict([(k, v) for (k, v) in info.items() if k != 'step'])) for info in self.steps]
+        return res
+
+    def write_time_series(self, path):
+        """Write time series of collected samples to specified file (tab-separated values)."""
+        lines = ['\t'.join(RESOURCE_USAGE_FIELDS)]
+        self.lock.acquire()
+        try:
+            for sample in self.samples:
+                vals = dict(sample)
+                vals.update({
+                    'cpu_time': '%.2f' % sample['cpu_time'],
+                    'step': sample['step'] or '-',
+                    'parallel': sample['parallel'] or '-',
+                })
+                lines.append('\t'.join([str(vals[key]) for key in RESOURCE_USAGE_FIELDS]))
+        finally:
+            self.lock.release()
+        write_file(path, '\n'.join(lines) + '\n')
+
+
+def read_time_series(path):
+    """
+    Read time series of resource usage from specified file (cfr. ResourceMonitor.write_time_series).
+    Returns a list of dicts, one per sample; unknown values (e.g. step or level of parallelism) are None.
+    """
+    samples = []
+    lines = read_file(path).splitlines()
+    if lines:
+        fields = lines[0].split('\t')
+        for line in lines[1:]:
+            sample = {}
+            for (key, val) in zip(fields, line.split('\t')):
+                if val == '-':
+                    val = None
+                elif key in ['time', 'cpu_time']:
+                    val = float(val)
+                elif key != 'step':
+                    val = int(val)
+                sample[key] = val
+            samples.append(sample)
+    return samples
+
+
+def det_mem_per_job(paths):
+    """
+    Estimate amount of memory (in bytes) required per job, based on the time series of resource usage for previous
+    builds in the specified files (peak memory usage relative to level of parallelism); returns None if unknown.
+    """
+    mem_per_job = None
+    for path in paths:
+        try:
+            samples = read_time_series(path)
+        except (EasyBuildError, IndexError, ValueError), err:
+            _log.warning("Failed to read time series of resource usage from %s: %s" % (path, err))
+            continue
+
+        for sample in samples:
+            if sample.get('parallel') and sample.get('rss'):
+                mem = sample['rss'] / sample['parallel']
+                if mem_per_job is None or mem > mem_per_job:
+                    mem_per_job = mem
+
+    _log.debug("Estimated memory required per job based on %s: %s" % (paths, mem_per_job))
+    return mem_per_job
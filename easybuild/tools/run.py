@@ -35,15 +35,12 @@ Tools to run commands.
 """
 import os
 import re
-import signal
-import subprocess
 import tempfile
-import time
 
 from vsc.utils import fancylogger
 
-from easybuild.tools.asyncprocess import PIPE, STDOUT, Popen, recv_some, send_all
 import easybuild.tools.build_log  # this import is required to obtain a correct (EasyBuild) logger!
+from easybuild.tools.process import Process, run_process, run_processes
 
 
 _log = fancylogger.getLogger('run', fname=False)
@@ -59,31 +56,151 @@ ERROR = 'error'
 # default strictness level
 strictness = WARN
 
+# default regular expression used to check command output for errors
+DEFAULT_ERROR_REGEXP = r"(?<![(,-]|\w)(?:error|segmentation fault|failed)(?![(,-]|\.?\w)"
 
-def adjust_cmd(func):
-    """Make adjustments to given command, if required."""
+# maximum amount of command output (in bytes) that is kept in memory (by default),
+# if more output is produced, only the tail is retained and the full output is streamed to a temporary file
+DEFAULT_OUTPUT_TAIL_SIZE = 10 * 1024 * 1024
+output_tail_size = DEFAULT_OUTPUT_TAIL_SIZE
+
+# default number of seconds to wait for new output in run_cmd_qa, before concluding that the command is stuck
+# on an unknown question (unless the output matches one of the specified 'no question' patterns)
+DEFAULT_QA_NO_OUTPUT_TIMEOUT = 60
+qa_no_output_timeout = DEFAULT_QA_NO_OUTPUT_TIMEOUT
+
+# size (in bytes) of the window of most recent output that questions are matched against in run_cmd_qa
+QA_WINDOW_SIZE = 16 * 1024
 
-    def inner(cmd, *args, **kwargs):
-        # SuSE hack
-        # - profile is not resourced, and functions (e.g. module) is not inherited
-        if 'PROFILEREAD' in os.environ and (len(os.environ['PROFILEREAD']) > 0):
-            filepaths = ['/etc/profile.d/modules.sh']
-            extra = ''
-            for fp in filepaths:
-                if os.path.exists(fp):
-                    extra = ". %s &&%s" % (fp, extra)
-                else:
-                    _log.warning("Can't find file %s" % fp)
 
-            cmd = "%s %s" % (extra, cmd)
+class OutputTail(object):
+    """
+    Ring buffer for command output, which only retains the last max_size bytes;
+    as soon as more output is added, all output is streamed to a temporary file instead.
+    """
 
-        return func(cmd, *args, **kwargs)
+    def __init__(self, cmd, max_size=None, log_file=None):
+        """
+        Constructor
+        @param cmd: command that is producing the output
+        @param max_size: maximum size of output to retain in memory (None implies default, cfr. output_tail_size)
+        @param log_file: file object to which output should be streamed (if any)
+        """
+        self.cmd = cmd
+        if max_size is None:
+            max_size = output_tail_size
+        self.max_size = max_size
+        self.log_file = log_file
+        # path to file to which full output is streamed (only used when no log file was provided)
+        self.full_output_path = None
+
+        self.chunks = []
+        self.size = 0
+        self.total_size = 0
+        self.truncated = False
+
+    def add(self, txt):
+        """Add (chunk of) output."""
+        if self.log_file is not None:
+            self.log_file.write(txt)
+
+        self.chunks.append(txt)
+        self.size += len(txt)
+        self.total_size += len(txt)
+
+        # only trim when we're well over the limit, to keep the amortized cost linear in the amount of output
+        if self.size > 2 * self.max_size:
+            if self.log_file is None:
+                # stream full output to a file from here on, so no output is lost
+                fd, self.full_output_path = tempfile.mkstemp(suffix='.log', prefix='easybuild-run_cmd-')
+                self.log_file = os.fdopen(fd, 'w')
+                tup = (self.cmd, self.max_size, self.full_output_path)
+                _log.info("Output of cmd %s exceeds %d bytes, full output is streamed to %s" % tup)
+                self.log_file.write(''.join(self.chunks))
+            self.chunks = [self.get()]
+            self.size = len(self.chunks[0])
+            self.truncated = True
+
+    def get(self):
+        """Return (tail of) output."""
+        txt = ''.join(self.chunks)
+        if len(txt) > self.max_size:
+            txt = txt[-self.max_size:]
+            self.truncated = True
+        return txt
+
+
+class ErrorScanner(object):
+    """Scan (chunks of) command output for errors on the fly, line per line."""
+
+    def __init__(self, regExp=True):
+        """
+        Constructor
+        @param regExp: regular expression to use (True implies default, cfr. DEFAULT_ERROR_REGEXP)
+        """
+        if regExp and type(regExp) == bool:
+            regExp = DEFAULT_ERROR_REGEXP
+            _log.debug('Using default regular expression: %s' % regExp)
+        elif type(regExp) == str:
+            pass
+        else:
+            _log.error("parse_log_for_error no valid regExp used: %s" % regExp)
+
+        self.pattern = regExp
+        self.regexp = re.compile(regExp, re.I)
+        self.partial_line = ''
+        self.errors = []
+
+    def scan_line(self, line):
+        """Scan a single line of output for errors."""
+        res = self.regexp.search(line)
+        if res:
+            self.errors.append([line, res.groups()])
+
+    def feed(self, txt):
+        """Scan (chunk of) output, complete lines only."""
+        lines = (self.partial_line + txt).split('\n')
+        self.partial_line = lines.pop()
+        for line in lines:
+            self.scan_line(line)
+
+    def finish(self):
+        """Scan remaining partial line, and return list of errors."""
+        self.scan_line(self.partial_line)
+        self.partial_line = ''
+        return self.errors
+
+
+def adjusted_cmd(cmd):
+    """Return given command, with adjustments made to it if required."""
+    # SuSE hack
+    # - profile is not resourced, and functions (e.g. module) is not inherited
+    if 'PROFILEREAD' in os.environ and (len(os.environ['PROFILEREAD']) > 0):
+        filepaths = ['/etc/profile.d/modules.sh']
+        extra = ''
+        for fp in filepaths:
+            if os.path.exists(fp):
+                extra = ". %s &&%s" % (fp, extra)
+            else:
+                _log.warning("Can't find file %s" % fp)
+
+        cmd = "%s %s" % (extra, cmd)
+
+    return cmd
+
+
+def adjust_cmd(func):
+    """Make adjustments to given command, if required (cfr. adjusted_cmd)."""
+
+    def inner(cmd, *args, **kwargs):
+        return func(adjusted_cmd(cmd), *args, **kwargs)
 
     return inner
 
 
 @adjust_cmd
-def run_cmd(cmd, log_ok=True, log_all=False, simple=False, inp=None, regexp=True, log_output=False, path=None):
+def run_cmd(cmd, log_ok=True, log_all=False, simple=False, inp=None, regexp=True, log_output=False, path=None,
+            timeout=None):
     """
     Executes a command cmd
     - returns exitcode and stdout+stderr (mixed)
@@ -94,6 +211,7 @@ def run_cmd(cmd, log_ok=True, log_all=False, simple=False, inp=None, regexp=True
     - regexp -> Regex used to check the output for errors. If True will use default (see parselogForError)
     - if log_output is True -> all output of command will be logged to a tempfile
     - path is the path run_cmd should chdir to before doing anything
+    - timeout is the maximum number of seconds the command is allowed to run (None implies no limit)
     """
     cwd = os.getcwd()
     try:
@@ -113,48 +231,113 @@ def run_cmd(cmd, log_ok=True, log_all=False, simple=False, inp=None, regexp=True
     else:
         runLog = None
 
-    readSize = 1024 * 8
+    # only retain tail of output in memory, and scan for errors on the fly
+    output = OutputTail(cmd, log_file=runLog)
+    scanner = None
+    if regexp:
+        scanner = ErrorScanner(regexp)
 
+    def handle_output(proc, txt, stream):
+        """Handle output produced by command."""
+        output.add(txt)
+        if scanner is not None:
+            scanner.feed(txt)
+
+    proc = Process(cmd, inp=inp, timeout=timeout, output_handler=handle_output)
     try:
-        p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                             stdin=subprocess.PIPE, close_fds=True, executable="/bin/bash")
+        run_process(proc)
     except OSError, err:
         _log.error("run_cmd init cmd %s failed:%s" % (cmd, err))
-    if inp:
-        p.stdin.write(inp)
-    p.stdin.close()
-
-    ec = p.poll()
-    stdouterr = ''
-    while ec < 0:
-        # need to read from time to time.
-        # - otherwise the stdout/stderr buffer gets filled and it all stops working
-        output = p.stdout.read(readSize)
-        if runLog:
-            runLog.write(output)
-        stdouterr += output
-        ec = p.poll()
-
-    # read remaining data (all of it)
-    stdouterr += p.stdout.read()
-
-    # not needed anymore. subprocess does this correct?
-    # ec=os.WEXITSTATUS(ec)
+
+    ec = proc.exit_code
+    stdouterr = output.get()
+
+    tup = (cmd, ec, proc.end_time - proc.start_time, output.total_size)
+    _log.debug("run_cmd: cmd %s exited with exit code %s after %.2fs (%d bytes of output)" % tup)
 
     # # Command log output
     if log_output:
         runLog.close()
+    elif output.full_output_path is not None:
+        output.log_file.close()
+        _log.info("Full output of cmd %s is available in %s" % (cmd, output.full_output_path))
 
     try:
         os.chdir(cwd)
     except OSError, err:
         _log.error("Failed to return to %s after executing command: %s" % (cwd, err))
 
-    return parse_cmd_output(cmd, stdouterr, ec, simple, log_all, log_ok, regexp)
+    if proc.timed_out:
+        tup = (cmd, timeout, stdouterr[-500:])
+        _log.error("run_cmd: cmd %s did not complete within %s seconds: end of output %s" % tup)
+
+    errors = None
+    if scanner is not None:
+        errors = scanner.finish()
+
+    return parse_cmd_output(cmd, stdouterr, ec, simple, log_all, log_ok, regexp, errors=errors)
+
+
+def run_cmds(cmds, max_procs=None, timeout=None, log_ok=False, log_all=False, simple=False, regexp=True):
+    """
+    Executes a list of commands concurrently
+    - returns list of (stdout+stderr, exitcode) tuples, in the same order as the commands
+    - no input though stdin
+    - max_procs is the maximum number of commands to run at the same time (None implies no limit)
+    - timeout is the maximum number of seconds each command is allowed to run (None implies no limit)
+    - log_ok, log_all, simple and regexp: checks on exit code and output of each command, cfr. run_cmd
+      (exit codes are not checked by default)
+    """
+    # make same adjustments as for run_cmd
+    cmds = [adjusted_cmd(cmd) for cmd in cmds]
+
+    # only retain tail of output of each command in memory, and scan for errors on the fly (cfr. run_cmd)
+    outputs, scanners = [], []
+    for cmd in cmds:
+        outputs.append(OutputTail(cmd))
+        if regexp:
+            scanners.append(ErrorScanner(regexp))
+        else:
+            scanners.append(None)
+
+    def output_handler(output, scanner):
+        """Create handler for output produced by a command."""
+        def handle_output(proc, txt, stream):
+            output.add(txt)
+            if scanner is not None:
+                scanner.feed(txt)
+        return handle_output
+
+    procs = [Process(cmd, timeout=timeout, output_handler=output_handler(output, scanner))
+             for (cmd, output, scanner) in zip(cmds, outputs, scanners)]
+
+    _log.debug("run_cmds: running cmds %s (in %s, max. %s at a time)" % (cmds, os.getcwd(), max_procs))
+    try:
+        run_processes(procs, max_procs=max_procs)
+    except OSError, err:
+        _log.error("run_cmds: running cmds %s failed: %s" % (cmds, err))
+
+    res = []
+    for (proc, output, scanner) in zip(procs, outputs, scanners):
+        tup = (proc.cmd, proc.exit_code, proc.end_time - proc.start_time, output.total_size)
+        _log.debug("run_cmds: cmd %s exited with exit code %s after %.2fs (%d bytes of output)" % tup)
+        if output.full_output_path is not None:
+            output.log_file.close()
+            _log.info("Full output of cmd %s is available in %s" % (proc.cmd, output.full_output_path))
+
+        errors = None
+        if scanner is not None:
+            errors = scanner.finish()
+
+        res.append(parse_cmd_output(proc.cmd, output.get(), proc.exit_code, simple, log_all, log_ok, regexp,
+                                    errors=errors))
+
+    return res
 
 
 @adjust_cmd
-def run_cmd_qa(cmd, qa, no_qa=None, log_ok=True, log_all=False, simple=False, regexp=True, std_qa=None, path=None):
+def run_cmd_qa(cmd, qa, no_qa=None, log_ok=True, log_all=False, simple=False, regexp=True, std_qa=None, path=None,
+               no_output_timeout=None):
     """
     Executes a command cmd
     - looks for questions and tries to answer based on qa dictionary
@@ -166,6 +349,8 @@ def run_cmd_qa(cmd, qa, no_qa=None, log_ok=True, log_all=False, simple=False, re
     - regexp -> Regex used to check the output for errors. If True will use default (see parselogForError)
     - if log_output is True -> all output of command will be logged to a tempfile
     - path is the path run_cmd should chdir to before doing anything
+    - no_output_timeout is the number of seconds to wait for new output (unless a no_qa pattern matches),
+      before giving up (None implies default, cfr. qa_no_output_timeout)
     """
     cwd = os.getcwd()
     try:
@@ -238,7 +423,7 @@ def run_cmd_qa(cmd, qa, no_qa=None, log_ok=True, log_all=False, simple=False, re
     _log.debug("New noQandA list is: %s" % [x.pattern for x in new_no_qa])
 
     # Part 2: Run the command and answer questions
-    # - this needs asynchronous stdout
+    # - questions are answered as soon as they are asked, since output is handled as soon as it is available
 
     # # Log command output
     if log_all:
@@ -251,114 +436,94 @@ def run_cmd_qa(cmd, qa, no_qa=None, log_ok=True, log_all=False, simple=False, re
     else:
         runLog = None
 
-    maxHitCount = 50
+    if no_output_timeout is None:
+        no_output_timeout = qa_no_output_timeout
 
-    try:
-        p = Popen(cmd, shell=True, stdout=PIPE, stderr=STDOUT, stdin=PIPE, close_fds=True, executable="/bin/bash")
-    except OSError, err:
-        _log.error("run_cmd_qa init cmd %s failed:%s" % (cmd, err))
+    # only retain tail of output in memory, and scan for errors on the fly
+    output = OutputTail(cmd, log_file=runLog)
+    scanner = None
+    if regexp:
+        scanner = ErrorScanner(regexp)
 
-    ec = p.poll()
-    stdoutErr = ''
-    oldLenOut = -1
-    hitCount = 0
+    # questions are only matched against the end of the output (cfr. '$' at the end of the question patterns),
+    # so we only need to consider a window of the most recent output
+    state = {'window': ''}
 
-    while ec < 0:
-        # need to read from time to time.
-        # - otherwise the stdout/stderr buffer gets filled and it all stops working
-        try:
-            tmpOut = recv_some(p)
-            if runLog:
-                runLog.write(tmpOut)
-            stdoutErr += tmpOut
-        # recv_some may throw Exception
-        except (IOError, Exception), err:
-            _log.debug("run_cmd_qa cmd %s: read failed: %s" % (cmd, err))
-            tmpOut = None
-
-        hit = False
-        for question, answers in newQA.items():
-            res = question.search(stdoutErr)
-            if tmpOut and res:
+    def answer(proc, qa_dict, txt, std=''):
+        """Try and answer question at the end of the given output, using provided dictionary; return True on a hit."""
+        for question, answers in qa_dict.items():
+            res = question.search(txt)
+            if res:
                 fa = answers[0] % res.groupdict()
                 # cycle through list of answers
                 last_answer = answers.pop(0)
                 answers.append(last_answer)
                 _log.debug("List of answers for question %s after cycling: %s" % (question.pattern, answers))
 
-                _log.debug("run_cmd_qa answer %s question %s out %s" % (fa, question.pattern, stdoutErr[-50:]))
-                send_all(p, fa)
-                hit = True
-                break
-        if not hit:
-            for question, answers in newstdQA.items():
-                res = question.search(stdoutErr)
-                if tmpOut and res:
-                    fa = answers[0] % res.groupdict()
-                    # cycle through list of answers
-                    last_answer = answers.pop(0)
-                    answers.append(last_answer)
-                    _log.debug("List of answers for question %s after cycling: %s" % (question.pattern, answers))
-
-                    _log.debug("run_cmd_qa answer %s std question %s out %s" % (fa, question.pattern, stdoutErr[-50:]))
-                    send_all(p, fa)
-                    hit = True
-                    break
-            if not hit:
-                if len(stdoutErr) > oldLenOut:
-                    oldLenOut = len(stdoutErr)
-                else:
-                    noqa = False
-                    for r in new_no_qa:
-                        if r.search(stdoutErr):
-                            _log.debug("runqanda: noQandA found for out %s" % stdoutErr[-50:])
-                            noqa = True
-                    if not noqa:
-                        hitCount += 1
-            else:
-                hitCount = 0
+                _log.debug("run_cmd_qa answer %s %squestion %s out %s" % (fa, std, question.pattern, txt[-50:]))
+                proc.send(fa)
+                return True
+        return False
+
+    def handle_output(proc, txt, stream):
+        """Handle output produced by command, answer questions as soon as they are asked."""
+        output.add(txt)
+        if scanner is not None:
+            scanner.feed(txt)
+        state['window'] = (state['window'] + txt)[-QA_WINDOW_SIZE:]
+
+        # only start looking for the next question in output produced after answering
+        if answer(proc, newQA, state['window']) or answer(proc, newstdQA, state['window'], std='std '):
+            state['window'] = ''
+
+    def handle_idle(proc):
+        """Check whether it's expected that command is not producing new output."""
+        if [r for r in new_no_qa if r.search(state['window'])]:
+            _log.debug("runqanda: noQandA found for out %s" % state['window'][-50:])
+            return True
         else:
-            hitCount = 0
-
-        if hitCount > maxHitCount:
-            # explicitly kill the child process before exiting
-            try:
-                os.killpg(p.pid, signal.SIGKILL)
-                os.kill(p.pid, signal.SIGKILL)
-            except OSError, err:
-                _log.debug("run_cmd_qa exception caught when killing child process: %s" % err)
-            _log.debug("run_cmd_qa: full stdouterr: %s" % stdoutErr)
-            _log.error("run_cmd_qa: cmd %s : Max nohits %s reached: end of output %s" %
-                       (cmd, maxHitCount, stdoutErr[-500:]))
-
-        # the sleep below is required to avoid exiting on unknown 'questions' too early (see above)
-        time.sleep(1)
-        ec = p.poll()
-
-    # Process stopped. Read all remaining data
+            return False
+
+    proc = Process(cmd, interactive=True, no_output_timeout=no_output_timeout,
+                   output_handler=handle_output, idle_handler=handle_idle)
     try:
-        if p.stdout:
-            readTxt = p.stdout.read()
-            stdoutErr += readTxt
-            if runLog:
-                runLog.write(readTxt)
-    except IOError, err:
-        _log.debug("runqanda cmd %s: remaining data read failed: %s" % (cmd, err))
+        run_process(proc)
+    except OSError, err:
+        _log.error("run_cmd_qa init cmd %s failed:%s" % (cmd, err))
+
+    ec = proc.exit_code
+    stdoutErr = output.get()
+
+    if proc.timed_out:
+        _log.debug("run_cmd_qa: full stdouterr: %s" % stdoutErr)
+        _log.error("run_cmd_qa: cmd %s : no new output for %s seconds: end of output %s" %
+                   (cmd, no_output_timeout, state['window'][-500:]))
+
+    tup = (cmd, ec, proc.end_time - proc.start_time, output.total_size)
+    _log.debug("run_cmd_qa: cmd %s exited with exit code %s after %.2fs (%d bytes of output)" % tup)
 
-    # Not needed anymore. Subprocess does this correct?
-    # ec=os.WEXITSTATUS(ec)
+    if runLog:
+        runLog.close()
+    elif output.full_output_path is not None:
+        output.log_file.close()
+        _log.info("Full output of cmd %s is available in %s" % (cmd, output.full_output_path))
 
     try:
         os.chdir(cwd)
     except OSError, err:
         _log.error("Failed to return to %s after executing command: %s" % (cwd, err))
 
-    return parse_cmd_output(cmd, stdoutErr, ec, simple, log_all, log_ok, regexp)
+    errors = None
+    if scanner is not None:
+        errors = scanner.finish()
+
+    return parse_cmd_output(cmd, stdoutErr, ec, simple, log_all, log_ok, regexp, errors=errors)
 
 
-def parse_cmd_output(cmd, stdouterr, ec, simple, log_all, log_ok, regexp):
+def parse_cmd_output(cmd, stdouterr, ec, simple, log_all, log_ok, regexp, errors=None):
     """
     will parse and perform error checks based on strictness setting
+    - errors: list of errors found in output (if output was already scanned on the fly)
     """
     if strictness == IGNORE:
         check_ec = False
@@ -391,7 +556,10 @@ def parse_cmd_output(cmd, stdouterr, ec, simple, log_all, log_ok, regexp):
 
     # parse the stdout/stderr for errors when strictness dictates this or when regexp is passed in
     if use_regexp or regexp:
-        res = parse_log_for_error(stdouterr, regexp, msg="Command used: %s" % cmd)
+        if errors is None:
+            res = parse_log_for_error(stdouterr, regexp, msg="Command used: %s" % cmd)
+        else:
+            res = report_log_errors(errors, regexp, msg="Command used: %s" % cmd)
         if len(res) > 0:
             message = "Found %s errors in command output (output: %s)" % (len(res), ", ".join([r[0] for r in res]))
             if use_regexp:
@@ -417,31 +585,25 @@ def parse_log_for_error(txt, regExp=None, stdout=True, msg=None):
     regExp is a one-line regular expression
     - default
     """
-    global errors_found_in_log
+    scanner = ErrorScanner(regExp)
+    scanner.feed(txt)
+    return report_log_errors(scanner.finish(), scanner.pattern, stdout=stdout, msg=msg)
 
-    if regExp and type(regExp) == bool:
-        regExp = r"(?<![(,-]|\w)(?:error|segmentation fault|failed)(?![(,-]|\.?\w)"
-        _log.debug('Using default regular expression: %s' % regExp)
-    elif type(regExp) == str:
-        pass
-    else:
-        _log.error("parse_log_for_error no valid regExp used: %s" % regExp)
 
-    reg = re.compile(regExp, re.I)
+def report_log_errors(res, regExp, stdout=True, msg=None):
+    """
+    Keep track of (and report) errors found in output (cfr. ErrorScanner).
+    """
+    global errors_found_in_log
 
-    res = []
-    for l in txt.split('\n'):
-        r = reg.search(l)
-        if r:
-            res.append([l, r.groups()])
-            errors_found_in_log += 1
+    errors_found_in_log += len(res)
 
     if stdout and res:
         if msg:
             _log.info("parse_log_for_error msg: %s" % msg)
+        if type(regExp) == bool:
+            regExp = DEFAULT_ERROR_REGEXP
         _log.info("parse_log_for_error (some may be harmless) regExp %s found:\n%s" %
                   (regExp, '\n'.join([x[0] for x in res])))
 
     return res
-
-
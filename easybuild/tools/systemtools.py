@@ -29,6 +29,7 @@ Module with useful functions for getting system information
 @auther: Ward Poelmans (Ghent University)
 """
 import grp  # @UnresolvedImport
+import math
 import os
 import platform
 import pwd
@@ -58,6 +59,12 @@ DARWIN = 'Darwin'
 
 UNKNOWN = 'UNKNOWN'
 
+# mount point of cgroup filesystem(s), and file listing cgroups for current process
+CGROUP_ROOT = '/sys/fs/cgroup'
+PROC_SELF_CGROUP = '/proc/self/cgroup'
+# memory limits for cgroups v1 beyond this value imply no limit
+CGROUP_V1_NO_MEMORY_LIMIT = 2 ** 60
+
 
 class SystemToolsException(Exception):
     """raised when systemtools fails"""
@@ -127,6 +134,140 @@ def get_avail_core_count():
     raise SystemToolsException('Can not determine number of cores on this system')
 
 
+def _read_cgroup_file(cgroup_dir, fn):
+    """Read (first line of) specified file in cgroup directory, return None if it's not available."""
+    try:
+        f = open(os.path.join(cgroup_dir, fn), 'r')
+        txt = f.readline().strip()
+        f.close()
+    except (IOError, OSError):
+        txt = None
+    return txt
+
+
+def get_cgroup_dirs(controller):
+    """
+    Determine cgroup directories that apply to the current process for the specified controller (e.g., 'cpu'),
+    starting with the innermost cgroup; returns tuple with cgroup version (1 or 2) and list of directories.
+    """
+    txt = read_file(PROC_SELF_CGROUP, log_error=False)
+
+    version, base_dir, cgroup_path = None, None, None
+    if txt:
+        for line in txt.splitlines():
+            (_, controllers, path) = line.split(':', 2)
+            if controller in controllers.split(','):
+                # cgroups v1: hierarchy per (set of) controller(s)
+                version, cgroup_path = 1, path
+                base_dir = os.path.join(CGROUP_ROOT, controllers)
+                if not os.path.isdir(base_dir):
+                    base_dir = os.path.join(CGROUP_ROOT, controller)
+                break
+            elif not controllers and line.startswith('0::'):
+                # cgroups v2: unified hierarchy
+                version, cgroup_path, base_dir = 2, path, CGROUP_ROOT
+
+    cgroup_dirs = []
+    if version is not None:
+        # limits may be imposed at any level in the hierarchy
+        cgroup_path = cgroup_path.strip('/')
+        while cgroup_path:
+            cgroup_dir = os.path.join(base_dir, cgroup_path)
+            if os.path.isdir(cgroup_dir):
+                cgroup_dirs.append(cgroup_dir)
+            cgroup_path = os.path.dirname(cgroup_path)
+        # in a container, the cgroup of the current process is typically mounted as the root of the hierarchy
+        if os.path.isdir(base_dir):
+            cgroup_dirs.append(base_dir)
+
+    _log.debug("cgroup (v%s) directories for '%s' controller: %s" % (version, controller, cgroup_dirs))
+    return (version, cgroup_dirs)
+
+
+def get_cgroup_cpu_quota():
+    """
+    Determine number of CPUs that can be used according to the CPU quota of the cgroup(s) for the current process
+    (cpu.max for cgroups v2, cpu.cfs_quota_us and cpu.cfs_period_us for cgroups v1); returns None if there's no quota.
+    """
+    quotas = []
+    (version, cgroup_dirs) = get_cgroup_dirs('cpu')
+    for cgroup_dir in cgroup_dirs:
+        if version == 2:
+            # format: '<quota> <period>', or 'max <period>' if there's no quota
+            cpu_max = (_read_cgroup_file(cgroup_dir, 'cpu.max') or 'max').split() + ['100000']
+            quota, period = cpu_max[0], cpu_max[1]
+        else:
+            quota = _read_cgroup_file(cgroup_dir, 'cpu.cfs_quota_us') or '-1'
+            period = _read_cgroup_file(cgroup_dir, 'cpu.cfs_period_us') or '100000'
+
+        if quota not in ['max', '-1']:
+            try:
+                quotas.append(float(quota) / float(period))
+            except ValueError, err:
+                _log.warning("Failed to determine CPU quota for cgroup %s: %s" % (cgroup_dir, err))
+
+    if quotas:
+        _log.info("CPU quota for cgroup(s): %s CPUs" % min(quotas))
+        return min(quotas)
+    else:
+        return None
+
+
+def get_cgroup_avail_memory():
+    """
+    Determine amount of memory (in bytes) that is still available according to the memory limit of the cgroup(s)
+    for the current process; returns None if there's no limit.
+    """
+    avail = []
+    (version, cgroup_dirs) = get_cgroup_dirs('memory')
+    for cgroup_dir in cgroup_dirs:
+        if version == 2:
+            limit = _read_cgroup_file(cgroup_dir, 'memory.max')
+            usage = _read_cgroup_file(cgroup_dir, 'memory.current')
+        else:
+            limit = _read_cgroup_file(cgroup_dir, 'memory.limit_in_bytes')
+            usage = _read_cgroup_file(cgroup_dir, 'memory.usage_in_bytes')
+
+        if limit not in [None, 'max'] and int(limit) < CGROUP_V1_NO_MEMORY_LIMIT:
+            avail.append(max(int(limit) - int(usage or 0), 0))
+
+    if avail:
+        _log.info("Available memory according to memory limit of cgroup(s): %s bytes" % min(avail))
+        return min(avail)
+    else:
+        return None
+
+
+def get_avail_memory():
+    """
+    Determine amount of memory (in bytes) that is available for use without swapping,
+    taking into account memory limits of cgroups; returns None if it can't be determined.
+    """
+    avail_mem = None
+    if get_os_type() == LINUX:
+        meminfo = {}
+        txt = read_file('/proc/meminfo', log_error=False)
+        if txt is None:
+            _log.warning("Failed to determine available memory: /proc/meminfo could not be read")
+        else:
+            for line in txt.splitlines():
+                res = re.match(r"^(?P<key>\w+):\s+(?P<val>[0-9]+)\s*kB", line)
+                if res:
+                    meminfo[res.group('key')] = int(res.group('val')) * 1024
+
+        if 'MemAvailable' in meminfo:
+            avail_mem = meminfo['MemAvailable']
+        elif 'MemFree' in meminfo:
+            # older kernels don't provide MemAvailable yet
+            avail_mem = sum([meminfo.get(key, 0) for key in ['MemFree', 'Buffers', 'Cached']])
+
+        cgroup_avail_mem = get_cgroup_avail_memory()
+        if cgroup_avail_mem is not None and (avail_mem is None or cgroup_avail_mem < avail_mem):
+            avail_mem = cgroup_avail_mem
+
+    return avail_mem
+
+
 def get_core_count():
     """
     Try to detect the number of virtual or physical CPUs on this system
@@ -499,10 +640,12 @@ def use_group(group_name):
     return group
 
 
-def det_parallelism(par, maxpar):
+def det_parallelism(par, maxpar, mem_per_job=None):
     """
     Determine level of parallelism that should be used.
-    Default: educated guess based on # cores and 'ulimit -u' setting: min(# cores, ((ulimit -u) - 15) / 6)
+    Default: educated guess based on # cores and 'ulimit -u' setting: min(# cores, ((ulimit -u) - 15) / 6),
+    also taking into account the CPU quota of the cgroup we're in (if any), and the available memory
+    if an estimate of the amount of memory required per job (in bytes) is specified.
     """
     if par is not None:
         if not isinstance(par, int):
@@ -512,6 +655,13 @@ def det_parallelism(par, maxpar):
                 _log.error("Specified level of parallelism '%s' is not an integer value: %s" % (par, err))
     else:
         par = get_avail_core_count()
+
+        # take CPU quota into account (e.g. in containers or batch jobs), to avoid being throttled
+        cpu_quota = get_cgroup_cpu_quota()
+        if cpu_quota is not None and cpu_quota < par:
+            par = max(1, int(math.ceil(cpu_quota)))
+            _log.info("Limit parallel builds to %s because of CPU quota of %s CPUs" % (par, cpu_quota))
+
         # check ulimit -u
         out, ec = run_cmd('ulimit -u')
         try:
@@ -526,6 +676,16 @@ def det_parallelism(par, maxpar):
         except ValueError, err:
             _log.exception("Failed to determine max user processes (%s, %s): %s" % (ec, out, err))
 
+        # avoid running out of memory (or swapping) by running too many jobs at the same time
+        if mem_per_job:
+            avail_mem = get_avail_memory()
+            if avail_mem is not None:
+                par_mem = max(1, int(avail_mem / mem_per_job))
+                if par_mem < par:
+                    par = par_mem
+                    tup = (par, avail_mem, mem_per_job)
+                    _log.info("Limit parallel builds to %s because of available memory (%s bytes, %s/job)" % tup)
+
     if maxpar is not None and maxpar < par:
         _log.info("Limiting parallellism from %s to %s" % (par, maxpar))
         par = min(par, maxpar)
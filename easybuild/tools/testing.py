@@ -42,6 +42,7 @@ from time import gmtime, strftime
 
 import easybuild.tools.config as config
 from easybuild.framework.easyblock import build_easyconfigs
+from easybuild.framework.easyconfig.format.one import split_block_spec
 from easybuild.framework.easyconfig.tools import process_easyconfig, resolve_dependencies
 from easybuild.framework.easyconfig.tools import skip_available
 from easybuild.tools.build_log import EasyBuildError
@@ -121,9 +122,11 @@ def regtest(easyconfig_paths, build_specs=None):
         resolved = resolve_dependencies(easyconfigs, build_specs=build_specs)
 
         cmd = "eb %(spec)s --regtest --sequential -ld"
-        command = "unset TMPDIR && cd %s && %s; " % (cur_dir, cmd)
-        # retry twice in case of failure, to avoid fluke errors
-        command += "if [ $? -ne 0 ]; then %(cmd)s --force && %(cmd)s --force; fi" % {'cmd': cmd}
+        command = "unset TMPDIR && cd %s && %s" % (cur_dir, cmd)
+        if not build_option('wait'):
+            # retry twice in case of failure, to avoid fluke errors
+            # (failed jobs are resubmitted according to the retry policy when waiting for jobs to complete)
+            command += "; if [ $? -ne 0 ]; then %(cmd)s --force && %(cmd)s --force; fi" % {'cmd': cmd}
 
         jobs = build_easyconfigs_in_parallel(command, resolved, output_dir=output_dir)
 
@@ -205,7 +208,11 @@ def create_test_report(msg, ecs_with_res, init_session_state, pr_nr=None, gist_l
                 descr = "(partial) EasyBuild log for failed build of %s" % ec['spec']
                 if pr_nr is not None:
                     descr += " (PR #%s)" % pr_nr
-                fn = '%s_partial.log' % os.path.basename(ec['spec'])[:-3]
+                (spec, block) = split_block_spec(ec['spec'])
+                fn = os.path.basename(spec)[:-3]
+                if block is not None:
+                    fn += '_%s' % block
+                fn += '_partial.log'
                 gist_url = create_gist(partial_log_txt, fn, descr=descr, github_user=user)
                 test_log = "(partial log available at %s)" % gist_url
 
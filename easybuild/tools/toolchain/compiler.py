@@ -33,7 +33,7 @@ import os
 
 from easybuild.tools import systemtools
 from easybuild.tools.config import build_option
-from easybuild.tools.toolchain.constants import COMPILER_VARIABLES
+from easybuild.tools.toolchain.constants import COMPILER_VARIABLES, MPI_COMPILER_VARIABLES, SEQ_COMPILER_VARIABLES
 from easybuild.tools.toolchain.toolchain import Toolchain
 
 
@@ -103,6 +103,9 @@ class Compiler(Toolchain):
     COMPILER_OPT_FLAGS = ['noopt', 'lowopt', 'defaultopt', 'opt']  # optimisation args, ordered !
     COMPILER_PREC_FLAGS = ['strict', 'precise', 'defaultprec', 'loose', 'veryloose']  # precision flags, ordered !
 
+    # compiler commands that are wrapped with the compiler cache, if one is used (also MPI compiler wrappers)
+    COMPILER_CACHE_VARIABLES = [v for (v, _) in COMPILER_VARIABLES + MPI_COMPILER_VARIABLES + SEQ_COMPILER_VARIABLES]
+
     COMPILER_CC = None
     COMPILER_CXX = None
     COMPILER_C_FLAGS = ['cstd']
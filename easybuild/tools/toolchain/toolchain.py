@@ -31,12 +31,16 @@ Creating a new toolchain should be as simple as possible.
 @author: Kenneth Hoste (Ghent University)
 """
 
+import copy
 import os
+import re
 from vsc.utils import fancylogger
 
-from easybuild.tools.config import build_option, install_path
-from easybuild.tools.environment import setvar
+from easybuild.tools.config import build_option, build_path, install_path
+from easybuild.tools.environment import modify_env, setvar
+from easybuild.tools.filetools import sha1_class, which
 from easybuild.tools.modules import get_software_root, get_software_version, modules_tool
+from easybuild.tools.process import STDOUT, Process, run_process
 from easybuild.tools.toolchain import DUMMY_TOOLCHAIN_NAME, DUMMY_TOOLCHAIN_VERSION
 from easybuild.tools.toolchain.options import ToolchainOptions
 from easybuild.tools.toolchain.toolchainvariables import ToolchainVariables
@@ -44,6 +48,52 @@ from easybuild.tools.toolchain.toolchainvariables import ToolchainVariables
 
 _log = fancylogger.getLogger('tools.toolchain', fname=False)
 
+# name of subdirectory of build path that is used as compiler cache directory by default
+COMPILER_CACHE_SUBDIR = 'compiler-cache'
+
+# per-session cache of toolchain environment snapshots (cfr. Toolchain.prepare),
+# indexed by toolchain module name and a hash of the environment in which the toolchain module is loaded
+_toolchain_env_cache = {}
+
+
+def det_env_hash(environ=None):
+    """Determine hash for specified environment (default: current environment)."""
+    if environ is None:
+        environ = os.environ
+    return sha1_class(repr(sorted(environ.items()))).hexdigest()
+
+
+def get_compiler_cache_stats(cmd, cache_dir):
+    """
+    Obtain number of hits/misses for specified cache directory, using specified (ccache-compatible) compiler cache
+    command. Returns a dict with 'hits' and 'misses' keys, or None if statistics are not available.
+    """
+    env = dict(os.environ)
+    env['CCACHE_DIR'] = cache_dir
+
+    stats = None
+    # machine-readable statistics (ccache >= 3.7): one '<counter>\t<value>' line per counter
+    proc = run_process(Process([cmd, '--print-stats'], shell=False, env=env, merge_stderr=False))
+    if proc.exit_code == 0:
+        counters = dict([line.split('\t', 1) for line in proc.get_output(STDOUT).splitlines() if '\t' in line])
+        try:
+            hits = int(counters.get('direct_cache_hit', 0)) + int(counters.get('preprocessed_cache_hit', 0))
+            stats = {'hits': hits, 'misses': int(counters.get('cache_miss', 0))}
+        except ValueError, err:
+            _log.warning("Failed to parse compiler cache statistics %s: %s" % (counters, err))
+    else:
+        # human-readable statistics (older ccache versions)
+        proc = run_process(Process([cmd, '-s'], shell=False, env=env, merge_stderr=False))
+        if proc.exit_code == 0:
+            out = proc.get_output(STDOUT)
+            hits = re.findall(r'^cache hit \((?:direct|preprocessed)\)\s+([0-9]+)', out, re.M)
+            misses = re.findall(r'^cache miss\s+([0-9]+)', out, re.M)
+            if hits or misses:
+                stats = {'hits': sum([int(x) for x in hits]), 'misses': sum([int(x) for x in misses])}
+
+    _log.debug("Statistics for compiler cache %s (using %s): %s" % (cache_dir, cmd, stats))
+    return stats
+
 
 class Toolchain(object):
     """General toolchain class"""
@@ -91,6 +141,9 @@ class Toolchain(object):
 
         self.vars = None
 
+        # compiler cache details (cfr. _set_compiler_cache)
+        self.compiler_cache = None
+
         self.modules_tool = modules_tool()
         self.mod_full_name = None
         self.mod_short_name = None
@@ -336,19 +389,37 @@ class Toolchain(object):
 
         # Load the toolchain and dependencies modules
         self.log.debug("Loading toolchain module and dependencies...")
-        # make sure toolchain is available using short module name by running 'module use' on module path subdir
-        if self.init_modpaths:
-            mod_path_suffix = build_option('suffix_modules_path')
-            for modpath in self.init_modpaths:
-                self.modules_tool.prepend_module_path(os.path.join(install_path('mod'), mod_path_suffix, modpath))
-        self.modules_tool.load([self.det_short_module_name()])
-        self.modules_tool.load([dep['short_mod_name'] for dep in self.dependencies])
-
-        # determine direct toolchain dependencies
         mod_name = self.det_short_module_name()
-        self.toolchain_dependencies = self.modules_tool.dependencies_for(mod_name, depth=0)
+        env_cache_key = (mod_name, det_env_hash())
+        env_snapshot = _toolchain_env_cache.get(env_cache_key)
+        if env_snapshot is None:
+            # make sure toolchain is available using short module name by running 'module use' on module path subdir
+            if self.init_modpaths:
+                mod_path_suffix = build_option('suffix_modules_path')
+                for modpath in self.init_modpaths:
+                    modpath = os.path.join(install_path('mod'), mod_path_suffix, modpath)
+                    self.modules_tool.prepend_module_path(modpath)
+            self.modules_tool.load([mod_name])
+
+            # determine direct toolchain dependencies
+            env_snapshot = {
+                'environ': copy.deepcopy(os.environ),
+                'toolchain_dependencies': self.modules_tool.dependencies_for(mod_name, depth=0),
+                'variables': {},
+            }
+            _toolchain_env_cache[env_cache_key] = env_snapshot
+        else:
+            # same toolchain module was loaded in the same environment before, so just restore resulting environment
+            self.log.debug("prepare: restoring environment for toolchain module %s from cache" % mod_name)
+            modify_env(os.environ, env_snapshot['environ'])
+            if self.init_modpaths:
+                self.modules_tool.set_mod_paths()
+
+        self.toolchain_dependencies = env_snapshot['toolchain_dependencies'][:]
         self.log.debug('prepare: list of direct toolchain dependencies: %s' % self.toolchain_dependencies)
 
+        self.modules_tool.load([dep['short_mod_name'] for dep in self.dependencies])
+
         # verify whether elements in toolchain definition match toolchain deps specified by loaded toolchain module
         toolchain_module_deps = set([self.modules_tool.module_software_name(d) for d in self.toolchain_dependencies])
         # only retain names of toolchain elements, excluding toolchain name
@@ -371,7 +442,7 @@ class Toolchain(object):
                            "(%s vs %s)" % (toolchain_module_deps, toolchain_definition))
 
         # Generate the variables to be set
-        self.set_variables()
+        self._set_variables_cached(env_snapshot['variables'])
 
         # set the variables
         # onlymod can be comma-separated string of variables not to be set
@@ -384,8 +455,81 @@ class Toolchain(object):
             # add LDFLAGS and CPPFLAGS from dependencies to self.vars
             self._add_dependency_variables()
             self.generate_vars()
+            self._set_compiler_cache()
             self._setenv_variables(onlymod)
 
+    def _set_compiler_cache(self):
+        """
+        Wrap compiler commands with a (ccache-compatible) compiler cache, if one is configured.
+        A separate cache directory is used per toolchain and set of optimisation/precision flags (incl. optarch).
+        """
+        cache_cmd = build_option('compiler_cache')
+        if not cache_cmd:
+            return
+
+        cache_cmd_path = which(cache_cmd)
+        if cache_cmd_path is None:
+            self.log.error("Compiler cache command '%s' not found" % cache_cmd)
+
+        cache_root = build_option('compiler_cache_dir') or os.path.join(build_path(), COMPILER_CACHE_SUBDIR)
+        flags = ' '.join([self.vars.get(var, '') for var in ['OPTFLAGS', 'PRECFLAGS']])
+        cache_dir = os.path.join(cache_root, '%s-%s' % (self.name, self.version), sha1_class(flags).hexdigest()[:8])
+        self.log.info("Using compiler cache %s for compiler flags '%s'" % (cache_dir, flags))
+
+        for var in getattr(self, 'COMPILER_CACHE_VARIABLES', []):
+            if self.vars.get(var):
+                self.vars[var] = '%s %s' % (cache_cmd_path, self.vars[var])
+
+        setvar('CCACHE_DIR', cache_dir)
+        # rewrite absolute paths in build directories to relative ones, to get cache hits across build directories
+        setvar('CCACHE_BASEDIR', build_path())
+        max_size = build_option('compiler_cache_max_size')
+        if max_size:
+            setvar('CCACHE_MAXSIZE', max_size)
+
+        self.compiler_cache = {
+            'cmd': cache_cmd_path,
+            'dir': cache_dir,
+            'stats': get_compiler_cache_stats(cache_cmd_path, cache_dir),
+        }
+
+    def compiler_cache_stats(self):
+        """
+        Return statistics for compiler cache since toolchain was prepared,
+        or None if no compiler cache was used (or statistics are not available).
+        """
+        res = None
+        if self.compiler_cache is not None and self.compiler_cache['stats'] is not None:
+            stats = get_compiler_cache_stats(self.compiler_cache['cmd'], self.compiler_cache['dir'])
+            if stats is not None:
+                res = {'dir': self.compiler_cache['dir']}
+                for key in ['hits', 'misses']:
+                    res[key] = stats[key] - self.compiler_cache['stats'][key]
+        return res
+
+    def _set_variables_cached(self, cache):
+        """
+        Set toolchain variables, or restore them from the specified cache if they were set before
+        for the same toolchain options. Toolchain variables only depend on the toolchain options and the
+        environment defined by the toolchain module, so the specified cache should be specific to the latter.
+        """
+        key = (repr(sorted(self.options.items())), repr(sorted(self.options.options_map.items())))
+        if key in cache:
+            self.log.debug("Restoring toolchain variables from cache")
+            (variables, attrs) = cache[key]
+            self.variables = copy.deepcopy(variables)
+            for (attr, val) in attrs.items():
+                setattr(self, attr, copy.deepcopy(val))
+        else:
+            orig_attrs = self.__dict__.copy()
+            self.set_variables()
+            # also retain instance attributes that were (re)defined while setting variables, e.g. BLAS_LIB
+            attrs = {}
+            for (attr, val) in self.__dict__.items():
+                if attr != 'variables' and (attr not in orig_attrs or orig_attrs[attr] is not val):
+                    attrs[attr] = copy.deepcopy(val)
+            cache[key] = (copy.deepcopy(self.variables), attrs)
+
     def _add_dependency_variables(self, names=None, cpp=None, ld=None):
         """ Add LDFLAGS and CPPFLAGS to the self.variables based on the dependencies
             names should be a list of strings containing the name of the dependency
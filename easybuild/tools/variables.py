@@ -445,6 +445,15 @@ class Variables(dict):
         super(Variables, self).__init__(*args, **kwargs)
         self.log = fancylogger.getLogger(self.__class__.__name__, fname=False)
 
+    def __deepcopy__(self, memo):
+        """Return deep copy of self, without wrapping the values in a new list (cfr. __setitem__)"""
+        res = self.__class__.__new__(self.__class__)
+        memo[id(self)] = res
+        for key, value in self.items():
+            dict.__setitem__(res, key, copy.deepcopy(value, memo))
+        res.__dict__.update(copy.deepcopy(self.__dict__, memo))
+        return res
+
     def get_list_class(self, name):
         """Return the class associated with the name according to the DEFAULT_LISTCLASS and MAP_LISTCLASS"""
         return get_class(name, self.DEFAULT_LISTCLASS, self.MAP_LISTCLASS)
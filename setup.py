@@ -73,7 +73,7 @@ easybuild_packages = [
     "easybuild.toolchains", "easybuild.toolchains.compiler", "easybuild.toolchains.mpi",
     "easybuild.toolchains.fft", "easybuild.toolchains.linalg", "easybuild.tools",
     "easybuild.tools.toolchain", "easybuild.tools.module_naming_scheme", "easybuild.tools.repository",
-    "test.framework", "test",
+    "easybuild.tools.job", "test.framework", "test",
     "vsc", "vsc.utils",
 ]
 
@@ -300,6 +300,37 @@ class EasyBlockTest(EnhancedTestCase):
         for (key, val) in modextrapaths.items():
             self.assertTrue(re.search('^prepend-path\s+%s\s+\$root/%s$' % (key, val), txt, re.M))
 
+    def test_make_module_footer(self):
+        """Test including footer specified via --modules-footer in module file."""
+        self.contents = '\n'.join([
+            'name = "pi"',
+            'version = "3.14"',
+            'homepage = "http://example.com"',
+            'description = "test easyconfig"',
+            "toolchain = {'name': 'dummy', 'version': 'dummy'}",
+        ])
+        self.writeEC()
+        modules_footer = os.path.join(self.test_buildpath, 'modules-footer.txt')
+        write_file(modules_footer, "setenv SITE_SPECIFIC_ENV_VAR foobar\n")
+
+        build_options = {
+            'modules_footer': modules_footer,
+            'valid_module_classes': config.module_classes(),
+        }
+        init_config(build_options=build_options)
+        eb = EasyBlock(EasyConfig(self.eb_file))
+        txt = eb.make_module_footer()
+        self.assertTrue(re.search(r"^# Built with EasyBuild version", txt, re.M))
+        self.assertTrue(re.search(r"^setenv SITE_SPECIFIC_ENV_VAR foobar$", txt, re.M))
+
+        # footer is in Tcl syntax, so it is not included in module files in Lua syntax
+        build_options.update({'module_syntax': 'Lua'})
+        init_config(build_options=build_options)
+        eb = EasyBlock(EasyConfig(self.eb_file))
+        txt = eb.make_module_footer()
+        self.assertTrue(re.search(r"^-- Built with EasyBuild version", txt, re.M))
+        self.assertFalse(re.search(r"SITE_SPECIFIC_ENV_VAR", txt))
+
     def test_gen_dirs(self):
         """Test methods that generate/set build/install directory names."""
         self.contents = '\n'.join([
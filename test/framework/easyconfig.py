@@ -30,6 +30,7 @@ Unit tests for easyconfig.py
 @author: Stijn De Weirdt (Ghent University)
 """
 
+import copy
 import os
 import re
 import shutil
@@ -41,9 +42,13 @@ from vsc.utils.fancylogger import setLogLevelDebug, logToScreen
 import easybuild.tools.build_log
 import easybuild.framework.easyconfig as easyconfig
 from easybuild.framework.easyblock import EasyBlock
+from easybuild.framework.easyconfig import CUSTOM, MANDATORY
+from easybuild.framework.easyconfig.dependency import Dependency
 from easybuild.framework.easyconfig.easyconfig import EasyConfig
 from easybuild.framework.easyconfig.easyconfig import create_paths, det_installversion
 from easybuild.framework.easyconfig.easyconfig import fetch_parameter_from_easyconfig_file, get_easyblock_class
+from easybuild.framework.easyconfig.format.one import is_block_spec, read_easyconfig_spec, split_block_spec
+from easybuild.framework.easyconfig.parser import EasyConfigParser
 from easybuild.framework.easyconfig.tweak import obtain_ec_for, tweak_one
 from easybuild.tools.build_log import EasyBuildError
 from easybuild.tools.config import module_classes
@@ -211,6 +216,47 @@ class EasyConfigTest(EnhancedTestCase):
         self.assertErrorRegex(EasyBuildError, "without name", eb._parse_dependency, ())
         self.assertErrorRegex(EasyBuildError, "without version", eb._parse_dependency, {'name': 'test'})
 
+    def test_dependency_type(self):
+        """Test Dependency type used for parsed dependencies."""
+        self.contents = '\n'.join([
+            'name = "pi"',
+            'version = "3.14"',
+            'homepage = "http://example.com"',
+            'description = "test easyconfig"',
+            'toolchain = {"name":"GCC", "version": "4.6.3"}',
+            'dependencies = [("first", "1.1", "-%(name)s"), {"name": "second", "version": "2.2", "dummy": True}]',
+            'builddependencies = [("first", "1.1", "-pi")]',
+        ])
+        self.prep()
+        ec = EasyConfig(self.eb_file)
+        (first, second, build_first) = ec.dependencies()
+        self.assertTrue(isinstance(first, Dependency))
+
+        # dict-like read interface, templates are resolved
+        self.assertEqual(first['versionsuffix'], '-pi')
+        self.assertEqual(first['toolchain'], {'name': 'GCC', 'version': '4.6.3'})
+        self.assertEqual(first.get('nosuchkey', 'default'), 'default')
+        self.assertErrorRegex(KeyError, 'nosuchkey', lambda: first['nosuchkey'])
+        self.assertEqual(sorted(first.keys()), sorted(first.copy().keys()))
+        self.assertEqual(first.full_version, '1.1-GCC-4.6.3-pi')
+        self.assertEqual(second.full_version, '2.2')
+        self.assertEqual(second['dummy'], True)
+        self.assertEqual(second['toolchain'], {'name': 'dummy', 'version': 'dummy'})
+        self.assertEqual(second, second.copy())
+
+        # immutable and hashable, equal specs yield equal dependencies
+        self.assertErrorRegex(TypeError, 'immutable', first.__setitem__, 'version', '1.2')
+        self.assertErrorRegex(AttributeError, 'immutable', setattr, first, '_version', '1.2')
+        self.assertEqual(first, build_first)
+        self.assertEqual(len(set([first, second, build_first])), 2)
+        self.assertTrue(Dependency.from_dict(build_first.copy()) in set([first]))
+        self.assertTrue(copy.deepcopy(first) is first)
+
+        # obtaining a mutable copy and modifying it doesn't affect the original
+        dep = first.copy()
+        dep['toolchain']['name'] = 'foo'
+        self.assertEqual(first['toolchain']['name'], 'GCC')
+
     def test_extra_options(self):
         """ extra_options should allow other variables to be stored """
         self.contents = '\n'.join([
@@ -871,6 +917,83 @@ class EasyConfigTest(EnhancedTestCase):
         ]
         self.assertEqual(cand_paths, expected_paths)
 
+    def test_shared_parameter_schema(self):
+        """Test whether easyconfig parameter metadata is shared between EasyConfig instances."""
+        self.contents = '\n'.join([
+            'name = "pi"',
+            'version = "3.14"',
+            'homepage = "http://example.com"',
+            'description = "test easyconfig"',
+            'toolchain = {"name": "dummy", "version": "dummy"}',
+            'patches = ["foo.patch"]',
+            'req = 1',
+        ])
+        self.prep()
+        extra_options = {'custom': ['bar', "a custom parameter", CUSTOM], 'req': [None, "required", MANDATORY]}
+        ec1 = EasyConfig(self.eb_file, extra_options=extra_options)
+        ec2 = EasyConfig(self.eb_file, extra_options=extra_options)
+        self.assertTrue(ec1._config.schema is ec2._config.schema)
+        self.assertFalse(EasyConfig(self.eb_file)._config.schema is ec1._config.schema)
+        self.assertTrue('req' in ec1.mandatory)
+
+        # values are not shared, not even default values that are modified in place
+        ec1._config['patches'][0].append('bar.patch')
+        ec1['configopts'] = '--foo'
+        ec1._config['sources'][0].append('pi.tar.gz')
+        self.assertEqual(ec1['patches'], ['foo.patch', 'bar.patch'])
+        self.assertEqual(ec2['patches'], ['foo.patch'])
+        self.assertEqual(ec2['configopts'], '')
+        self.assertEqual(ec2['sources'], [])
+        self.assertEqual(ec2['custom'], 'bar')
+
+        # [value, description, category] view is retained
+        self.assertEqual(ec1._config['custom'], ['bar', "a custom parameter", CUSTOM])
+        self.assertEqual(ec1._config['configopts'][0], '--foo')
+        ec1._config['custom'][0] = 'foo'
+        self.assertEqual(ec1['custom'], 'foo')
+        (value, descr, _) = ec1._config['version']
+        self.assertEqual((value, descr), ('3.14', "Version of software"))
+        self.assertTrue('parsed' in ec1._config and 'parsed' in ec1._config.keys())
+        self.assertEqual(sorted(ec1.asdict().keys()), sorted(ec1._config.keys()))
+
+        # copies are independent, but share the schema
+        ec3 = ec1.copy()
+        self.assertTrue(ec3._config.schema is ec1._config.schema)
+        ec3._config['patches'][0].append('baz.patch')
+        self.assertEqual(ec1['patches'], ['foo.patch', 'bar.patch'])
+
+    def test_blocks_in_memory(self):
+        """Test processing an easyconfig file with multiple blocks, which are expanded in memory."""
+        ec_file = os.path.join(os.path.dirname(__file__), 'easyconfigs', 'toy-0.0-multiple.eb')
+        tmpfiles = os.listdir(tempfile.gettempdir())
+
+        ecs = easyconfig.easyconfig.process_easyconfig(ec_file)
+        specs = [ec['spec'] for ec in ecs]
+        self.assertEqual(specs, ['%s[versionsuffixed]' % ec_file, '%s[versionprefixed]' % ec_file])
+        for ec in ecs:
+            self.assertEqual(ec['original_spec'], ec_file)
+            self.assertTrue(is_block_spec(ec['spec']))
+            self.assertEqual(ec['ec'].path, ec['spec'])
+            self.assertTrue("# Main block" in read_easyconfig_spec(ec['spec']))
+            self.assertEqual(split_block_spec(ec['spec']), (ec_file, ec['spec'][len(ec_file) + 1:-1]))
+        self.assertEqual(fetch_parameter_from_easyconfig_file(specs[1], 'versionprefix'), 'someprefix-')
+
+        # blocks can not be written back, since they only exist in memory
+        parser = EasyConfigParser(specs[0])
+        self.assertErrorRegex(EasyBuildError, "blocks in an easyconfig file only exist in memory", parser.write)
+        self.assertFalse(os.path.exists(specs[0]))
+
+        # no temporary files are created, and block identifiers are stable
+        self.assertEqual(sorted(os.listdir(tempfile.gettempdir())), sorted(tmpfiles))
+        ecs_bis = easyconfig.easyconfig.process_easyconfig(ec_file)
+        self.assertEqual([ec['spec'] for ec in ecs_bis], specs)
+        self.assertEqual([ec['full_mod_name'] for ec in ecs_bis], [ec['full_mod_name'] for ec in ecs])
+
+        # regular easyconfig files are read from disk
+        self.assertFalse(is_block_spec(ec_file))
+        self.assertEqual(read_easyconfig_spec(ec_file), read_file(ec_file))
+        self.assertEqual(split_block_spec(ec_file), (ec_file, None))
+
     def test_deprecated_options(self):
         """Test whether deprecated options are handled correctly."""
         deprecated_options = [
@@ -62,6 +62,26 @@ class EasyConfigVersion(EnhancedTestCase):
         self.assertTrue(vop.regex.search('>%s2.4_' % vop.SEPARATOR))  # version starts/ends with *any* word character
         self.assertTrue(vop.regex.search('>%sG2.4_' % vop.SEPARATOR))  # version starts/ends with *any* word character
 
+    def test_versop_caches(self):
+        """Test caching of regular expressions and EasyVersion instances."""
+        vop1 = VersionOperator('>= 1.2.3')
+        vop2 = VersionOperator('< 2.0')
+        self.assertTrue(vop1.regex is vop2.regex)
+        self.assertTrue(vop1._convert('1.2.3') is vop1.version)
+        self.assertTrue(vop2._convert('1.2.3') is vop1.version)
+
+        tcname = search_toolchain('')[1][0].NAME
+        tcvop1 = ToolchainVersionOperator('%s >= 1.0' % tcname)
+        tcvop2 = ToolchainVersionOperator('%s == 2.0' % tcname)
+        self.assertTrue(tcvop1.regex is tcvop2.regex)
+        self.assertFalse(tcvop1.regex is vop1.regex)
+        self.assertTrue(tcvop1.test(tcname, '2.0'))
+
+        # deep copies share the compiled regex
+        tcvop3 = copy.deepcopy(tcvop1)
+        self.assertTrue(tcvop3.regex is tcvop1.regex)
+        self.assertEqual(str(tcvop3), str(tcvop1))
+
     def test_boolean(self):
         """Test boolean test"""
         self.assertTrue(VersionOperator('>= 123'))
@@ -206,6 +206,27 @@ class TestEBConfigObj(EnhancedTestCase):
             squashed = cov.squash(version, tc['name'], tc['version'])
             self.assertEqual(squashed, res, 'Test for tc %s version %s' % (tc, version))
 
+        # squash results are memoized per version/toolchain, and can be modified without affecting the cache
+        cov = EBConfigObj(ConfigObj(txt))
+        for tc, version, res in tests:
+            squashed = cov.squash(version, tc['name'], tc['version'])
+            squashed['foo'] = 'bar'
+            self.assertTrue((version, tc['name'], tc['version']) in cov.squash_cache)
+        self.assertEqual(len(cov.squash_cache), len(tests))
+        for tc, version, res in tests:
+            squashed = cov.squash(version, tc['name'], tc['version'])
+            self.assertEqual(squashed, res, 'Test for tc %s version %s (cached)' % (tc, version))
+
+        # distinct versions for which the same section markers match share the same squashed result
+        self.assertEqual(len(cov.squash_index), len(tests))
+        for version in ['1.2', '1.3', '1.4']:
+            self.assertEqual(cov.squash(version, tc_last['name'], tc_last['version']), {})
+        self.assertEqual(len(cov.squash_cache), len(tests) + 3)
+        self.assertEqual(len(cov.squash_index), len(tests) + 1)
+        squashed = cov.squash('2.2', tc_last['name'], tc_last['version'])
+        self.assertEqual(squashed, {})
+        self.assertEqual(len(cov.squash_index), len(tests) + 2)
+
     def test_nested_version(self):
         """Test nested config"""
         tc = {'version': '10', 'name': self.tc_first}
@@ -33,6 +33,7 @@ import os
 import shutil
 import stat
 import tempfile
+import time
 from test.framework.utilities import EnhancedTestCase, find_full_path
 from unittest import TestLoader, main
 
@@ -266,6 +267,134 @@ class FileToolsTest(EnhancedTestCase):
         ]:
             self.assertEqual(ft.guess_patch_level([patched_file], self.test_buildpath), correct_patch_level)
 
+    def test_adjust_permissions(self):
+        """Test adjust_permissions and apply_permission_rules functions."""
+        tmpdir = tempfile.mkdtemp()
+        paths = [os.path.join(tmpdir, 'foo'), os.path.join(tmpdir, 'bar', 'baz')]
+        for path in paths:
+            ft.write_file(path, 'test')
+            os.chmod(path, stat.S_IRUSR | stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+
+        def perms(path):
+            """Return permission bits for specified path."""
+            return stat.S_IMODE(os.stat(path).st_mode)
+
+        ft.adjust_permissions(tmpdir, stat.S_IWGRP | stat.S_IWOTH, add=False, recursive=True)
+        for path in paths:
+            self.assertEqual(perms(path), stat.S_IRUSR | stat.S_IWUSR)
+
+        ft.adjust_permissions(paths[0], stat.S_IRUSR, relative=False, recursive=False)
+        self.assertEqual(perms(paths[0]), stat.S_IRUSR)
+        self.assertEqual(perms(paths[1]), stat.S_IRUSR | stat.S_IWUSR)
+
+        # multiple rules are applied in order, in a single pass (using multiple threads)
+        rules = [
+            (stat.S_IWUSR, True),
+            (stat.S_IRGRP | stat.S_IROTH, True),
+            (stat.S_IROTH, False),
+        ]
+        bar_perms = perms(os.path.join(tmpdir, 'bar'))
+        ft.apply_permission_rules(tmpdir, rules, onlyfiles=True, threads=3)
+        for path in paths:
+            self.assertEqual(perms(path), stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP)
+        self.assertEqual(perms(tmpdir), stat.S_IRWXU | stat.S_IRGRP)
+        self.assertEqual(perms(os.path.join(tmpdir, 'bar')), bar_perms)
+
+        # errors for individual paths result in an error, unless they're ignored (and not too many occur)
+        os.symlink(os.path.join(tmpdir, 'nosuchfile'), os.path.join(tmpdir, 'bar', 'broken_link'))
+        self.assertErrorRegex(EasyBuildError, "Failed to chmod/chown", ft.adjust_permissions, tmpdir, stat.S_IRGRP)
+        ft.adjust_permissions(tmpdir, stat.S_IRGRP, ignore_errors=True)
+
+        shutil.rmtree(tmpdir)
+
+    def test_scan_dir(self):
+        """Test scan_dir function."""
+        tmpdir = tempfile.mkdtemp()
+        ft.write_file(os.path.join(tmpdir, 'bin', 'foo'), 'x' * 100)
+        ft.write_file(os.path.join(tmpdir, 'lib', 'libfoo.a'), 'x' * 1000)
+        ft.write_file(os.path.join(tmpdir, 'README'), 'x' * 10)
+        os.link(os.path.join(tmpdir, 'lib', 'libfoo.a'), os.path.join(tmpdir, 'lib', 'libbar.a'))
+        os.symlink('lib', os.path.join(tmpdir, 'lib64'))
+        os.symlink('nosuchfile', os.path.join(tmpdir, 'bin', 'broken'))
+
+        res = ft.scan_dir(tmpdir, max_largest_files=2)
+        # hard links are only counted once
+        self.assertEqual(res['size'], 1110)
+        self.assertEqual(res['file_count'], 3)
+        self.assertEqual(res['dir_count'], 2)
+        self.assertEqual(res['symlink_count'], 2)
+        self.assertEqual(res['inode_count'], 5)
+        self.assertEqual(res['largest_files'][0][1], 1000)
+        self.assertEqual(res['largest_files'][1], ('bin/foo', 100))
+        self.assertEqual(res['broken_symlinks'], ['bin/broken'])
+        self.assertEqual(sorted(res['paths'].keys()),
+                         ['README', 'bin', 'bin/foo', 'lib', 'lib/libbar.a', 'lib/libfoo.a', 'lib64'])
+        self.assertTrue(res['paths']['lib64'])
+        self.assertFalse(res['paths']['README'])
+
+        res = ft.scan_dir(tmpdir, max_largest_files=1)
+        self.assertEqual([size for (_, size) in res['largest_files']], [1000])
+        res = ft.scan_dir(tmpdir, max_largest_files=0)
+        self.assertEqual(res['largest_files'], [])
+
+        # scanning a non-existing directory yields empty results
+        res = ft.scan_dir(os.path.join(tmpdir, 'nosuchdir'))
+        self.assertEqual((res['size'], res['paths']), (0, {}))
+
+        # directory tree can be scanned while adjusting permissions, in the same pass
+        res = ft.scan_dir(tmpdir)
+        scan = ft.DirScan(tmpdir)
+        ft.apply_permission_rules(tmpdir, [(stat.S_IWOTH, False)], ignore_errors=True, threads=3, scan=scan)
+        scan_res = scan.result()
+        # which of the hard links to libfoo.a is counted depends on the order in which the threads process them
+        largest_file_sizes = [size for (_, size) in scan_res['largest_files']]
+        self.assertEqual(largest_file_sizes, [size for (_, size) in res['largest_files']])
+        del res['largest_files']
+        del scan_res['largest_files']
+        self.assertEqual(scan_res, res)
+
+        # adding paths that were already scanned doesn't affect the results
+        scan.add(os.path.join(tmpdir, 'bin', 'foo'))
+        self.assertEqual(scan.result()['file_count'], 3)
+
+        # scanning requires walking over the whole directory tree
+        scan = ft.DirScan(tmpdir)
+        self.assertErrorRegex(EasyBuildError, "requires walking over all", ft.apply_permission_rules, tmpdir,
+                              [(stat.S_IWOTH, False)], onlyfiles=True, scan=scan)
+
+        shutil.rmtree(tmpdir)
+
+    def test_remove_dir_async(self):
+        """Test removing directories in the background."""
+        tmpdir = tempfile.mkdtemp()
+        trash_dir = os.path.join(tmpdir, 'trash')
+        paths = []
+        for subdir in ['one', 'two']:
+            path = os.path.join(tmpdir, subdir)
+            for i in range(10):
+                ft.write_file(os.path.join(path, 'sub%d' % (i % 3), 'file%d' % i), 'test')
+            os.symlink('sub0', os.path.join(path, 'link'))
+            paths.append(path)
+
+        # directory is moved out of the way right away
+        ft.remove_dir_async(paths[0], trash_dir)
+        self.assertFalse(os.path.exists(paths[0]))
+        ft.wait_for_async_removals()
+        self.assertEqual(os.listdir(trash_dir), [])
+
+        # throttled removal is handed off to a detached process when it takes too long
+        ft.remove_dir_async(paths[1], trash_dir, max_rate=5)
+        self.assertFalse(os.path.exists(paths[1]))
+        self.assertEqual(len(os.listdir(trash_dir)), 1)
+        ft.wait_for_async_removals(timeout=0)
+        for _ in range(50):
+            if not os.listdir(trash_dir):
+                break
+            time.sleep(0.1)
+        self.assertEqual(os.listdir(trash_dir), [])
+
+        shutil.rmtree(tmpdir)
+
 def suite():
     """ returns all the testcases in this module """
     return TestLoader().loadTestsFromTestCase(FileToolsTest)
@@ -0,0 +1,131 @@
+##
+# Copyright 2014 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Unit tests for job backends (easybuild.tools.job).
+"""
+import os
+import shutil
+import tempfile
+from test.framework.utilities import EnhancedTestCase, init_config
+from unittest import TestLoader, main
+
+from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.filetools import read_file
+from easybuild.tools.job.backend import avail_job_backends, job_backend
+from easybuild.tools.job.local import Local
+
+
+class JobBackendTest(EnhancedTestCase):
+    """Tests for job backends."""
+
+    def setUp(self):
+        """Set up test directory, in which jobs are submitted."""
+        super(JobBackendTest, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+
+    def tearDown(self):
+        """Clean up test directory."""
+        super(JobBackendTest, self).tearDown()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    def test_avail_job_backends(self):
+        """Test determining available job backends, and selecting one."""
+        job_backends = avail_job_backends(check_usable=False)
+        self.assertTrue('Local' in job_backends)
+        self.assertTrue('PbsPython' in job_backends)
+        self.assertTrue('Local' in avail_job_backends())
+
+        init_config(build_options={'job_backend': 'Local'})
+        self.assertTrue(isinstance(job_backend(), Local))
+
+        init_config(build_options={'job_backend': 'nosuchjobbackend'})
+        self.assertErrorRegex(EasyBuildError, "Unknown or unusable job backend", job_backend)
+
+    def test_local_job_backend(self):
+        """Test running jobs locally, with dependencies, holds and a limit on number of simultaneous jobs."""
+        init_config(build_options={'job_backend': 'Local', 'job_max_jobs': 1})
+        backend = job_backend()
+        backend.init()
+        os.chdir(self.tmpdir)
+
+        job1 = backend.make_job("sleep 0.2; echo $FOO >> order.txt", 'one', env_vars={'FOO': 'one'})
+        self.assertEqual(job1.state(), 'not submitted')
+        job1.submit(with_hold=True)
+        self.assertTrue(job1.has_holds())
+        self.assertEqual(job1.state(), 'queued')
+
+        job2 = backend.make_job("echo two >> order.txt", 'two')
+        job2.add_dependencies([job1.jobid])
+        job2.submit()
+        self.assertEqual(job2.deps, [job1.jobid])
+        self.assertEqual(job2.state(), 'queued')
+
+        # jobs without holds or dependencies are started right away
+        job3 = backend.make_job("sleep 0.5; echo three >> order.txt", 'three')
+        job3.submit()
+        self.assertEqual(job3.state(), 'running')
+
+        # only a single job is run at a time, and dependencies are taken into account
+        job1.release_hold()
+        self.assertFalse(job1.has_holds())
+        self.assertEqual(job1.state(), 'queued')
+        backend.complete()
+        self.assertEqual(read_file('order.txt').split(), ['three', 'one', 'two'])
+        for job in [job1, job2, job3]:
+            self.assertEqual(job.state(), 'finished')
+            self.assertEqual(job.exit_code, 0)
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir, 'one.o%s' % job1.jobid)))
+
+        # jobs can be removed, jobs that depend on removed jobs are still run
+        job4 = backend.make_job("sleep 60", 'four')
+        job4.submit()
+        self.assertEqual(job4.state(), 'running')
+        job5 = backend.make_job("exit 3", 'five')
+        job5.add_dependencies(job4.jobid)
+        job5.submit()
+        job4.remove()
+        self.assertEqual(job4.state(), 'finished')
+        backend.complete()
+        self.assertEqual(job5.exit_code, 3)
+
+        # dependencies on unknown jobs are not allowed
+        job6 = backend.make_job("true", 'six')
+        self.assertErrorRegex(EasyBuildError, "unknown job", job6.add_dependencies, ['nosuchjob'])
+
+        # waiting for jobs that can't be started results in an error, rather than waiting forever
+        job6.submit(with_hold=True)
+        self.assertErrorRegex(EasyBuildError, "can't be started.*six", backend.complete)
+        job6.remove()
+        backend.complete()
+
+
+def suite():
+    """ returns all the testcases in this module """
+    return TestLoader().loadTestsFromTestCase(JobBackendTest)
+
+if __name__ == '__main__':
+    main()
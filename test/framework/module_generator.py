@@ -29,6 +29,7 @@ Unit tests for module_generator.py.
 @author: Kenneth Hoste (Ghent University)
 """
 
+import copy
 import os
 import shutil
 import sys
@@ -41,7 +42,7 @@ from vsc.utils.missing import get_subclasses
 import easybuild.tools.module_generator
 from easybuild.framework.easyconfig.tools import process_easyconfig
 from easybuild.tools import config
-from easybuild.tools.module_generator import ModuleGenerator
+from easybuild.tools.module_generator import ModuleGenerator, ModuleGeneratorLua, module_generator
 from easybuild.tools.module_naming_scheme.utilities import is_valid_module_name
 from easybuild.framework.easyblock import EasyBlock
 from easybuild.framework.easyconfig.easyconfig import EasyConfig, ActiveMNS
@@ -178,6 +179,91 @@ class ModuleGeneratorTest(EnhancedTestCase):
         tcltxt = 'puts stderr "foo"'
         self.assertEqual(tcltxt, self.modgen.add_tcl_footer(tcltxt))
 
+    def test_lua_syntax(self):
+        """Test generating module files in Lua syntax."""
+        modgen = ModuleGeneratorLua(self.eb)
+        installdir = self.modgen.app.installdir
+
+        gzip_txt = "gzip (GNU zip) is a popular data compression program as a replacement for compress "
+        gzip_txt += "- Homepage: http://www.gzip.org/"
+        expected = '\n'.join([
+            'help("%s")' % gzip_txt,
+            "",
+            'whatis("Description: %s")' % gzip_txt,
+            "",
+            'local root = "%s"' % installdir,
+            "",
+            'conflict("gzip")',
+            "",
+        ])
+        self.assertEqual(modgen.get_description(), expected)
+
+        expected = '\nif not isloaded("mod_name") then\n    load("mod_name")\nend\n'
+        self.assertEqual(modgen.load_module("mod_name"), expected)
+        self.assertEqual(modgen.load_module("mod_name", recursive_unload=True), '\nload("mod_name")\n')
+        expected = '\nif isloaded("mod_name") then\n    unload("mod_name")\nend\n'
+        self.assertEqual(modgen.unload_module("mod_name"), expected)
+
+        expected = 'prepend_path("key", pathJoin(root, "path1"))\nprepend_path("key", pathJoin(root, "path2"))\n'
+        self.assertEqual(modgen.prepend_paths("key", ["path1", "path2"]), expected)
+        self.assertEqual(modgen.prepend_paths("key", "/abs/path", allow_abs=True), 'prepend_path("key", "/abs/path")\n')
+        self.assertErrorRegex(EasyBuildError, "Absolute path /foo passed to prepend_paths",
+                              modgen.prepend_paths, "key", ["/foo"])
+
+        expected = 'prepend_path("MODULEPATH", "/some/path")\nprepend_path("MODULEPATH", "/foo/bar/baz")'
+        self.assertEqual(modgen.use(["/some/path", "/foo/bar/baz"]), expected)
+
+        self.assertEqual(modgen.set_environment("key", "value"), 'setenv("key", "value")\n')
+        self.assertEqual(modgen.set_environment("key", 'va"lue'), 'setenv("key", \'va"lue\')\n')
+        self.assertEqual(modgen.set_environment("key", """va"l'ue"""), 'setenv("key", [=[va"l\'ue]=])\n')
+        self.assertEqual(modgen.set_environment("key", "$root"), 'setenv("key", root)\n')
+        self.assertEqual(modgen.set_environment("key", "$root/foo"), 'setenv("key", pathJoin(root, "foo"))\n')
+        self.assertEqual(modgen.set_alias("key", "value"), 'set_alias("key", "value")\n')
+        # non-string values are included as is
+        self.assertEqual(modgen.set_environment("key", 123), 'setenv("key", 123)\n')
+
+        # long brackets are used for values that include newlines or backslashes,
+        # with a level that ensures the closing long bracket does not occur in the value
+        self.assertEqual(modgen.set_environment("key", 'foo\\bar'), 'setenv("key", [=[foo\\bar]=])\n')
+        self.assertEqual(modgen.set_environment("key", 'foo\nbar]='), 'setenv("key", [==[foo\nbar]=]==])\n')
+        self.assertEqual(modgen.set_environment("key", '\nfoo'), 'setenv("key", [=[\n\nfoo]=])\n')
+
+        expected = '\nif mode() == "load" then\n    io.stderr:write("test" .. "\\n")\nend\n'
+        self.assertEqual(modgen.msg_on_load('test'), expected)
+        expected = '\nif mode() == "load" then\n    io.stderr:write([=[multi-line\nmessage\\n]=] .. "\\n")\nend\n'
+        self.assertEqual(modgen.msg_on_load('multi-line\nmessage\\n'), expected)
+        self.assertEqual(modgen.add_lua_footer('io.stderr:write("foo")'), 'io.stderr:write("foo")')
+        self.assertEqual(modgen.add_tcl_footer('puts stderr "foo"'), '')
+        self.assertEqual(self.modgen.add_lua_footer('io.stderr:write("foo")'), '')
+        self.assertEqual(modgen.comment("foo"), "-- foo\n")
+        self.assertEqual(self.modgen.comment("foo"), "# foo\n")
+
+        # multi-line descriptions are included using long brackets
+        ec = EasyConfig(os.path.join(os.path.dirname(__file__), 'easyconfigs', 'GCC-4.7.2.eb'))
+        gcc_modgen = ModuleGeneratorLua(EasyBlock(ec))
+        gcc_txt = '\n'.join([
+            "The GNU Compiler Collection includes front ends for C, C++, Objective-C, Fortran,",
+            " Java, and Ada, as well as libraries for these languages (libstdc++, libgcj,...). "
+            "- Homepage: http://gcc.gnu.org/",
+        ])
+        descr = gcc_modgen.get_description()
+        self.assertTrue(descr.startswith('help([=[%s]=])\n\nwhatis([=[Description: %s]=])\n' % (gcc_txt, gcc_txt)))
+        os.remove(gcc_modgen.app.logfile)
+
+        # module files in Lua syntax have a .lua extension
+        modgen.set_fake(True)
+        modgen.prepare()
+        self.assertTrue(modgen.filename.endswith('%s.lua' % self.eb.full_mod_name))
+        shutil.rmtree(modgen.tmpdir)
+
+    def test_module_generator(self):
+        """Test obtaining module generator for configured module syntax."""
+        self.assertTrue(type(module_generator(self.eb)) is ModuleGenerator)
+        init_config(build_options={'module_syntax': 'Lua'})
+        self.assertTrue(type(module_generator(self.eb)) is ModuleGeneratorLua)
+        init_config(build_options={'module_syntax': 'foo'})
+        self.assertErrorRegex(EasyBuildError, "Unknown module syntax", module_generator, self.eb)
+
     def test_module_naming_scheme(self):
         """Test using default module naming scheme."""
         all_stops = [x[0] for x in EasyBlock.get_steps()]
@@ -232,6 +318,21 @@ class ModuleGeneratorTest(EnhancedTestCase):
         }
         self.assertEqual('foo/1.2.3-t00ls-6.6.6-bar', ActiveMNS().det_full_module_name(non_parsed))
 
+        # module names are cached, based on the easyconfig parameters relevant to the module naming scheme
+        ActiveMNS().clear_cache()
+        (hits, misses) = (ActiveMNS().cache_hits, ActiveMNS().cache_misses)
+        self.assertEqual('foo/1.2.3-t00ls-6.6.6-bar', ActiveMNS().det_full_module_name(non_parsed))
+        self.assertEqual('foo/1.2.3-t00ls-6.6.6-bar', ActiveMNS().det_full_module_name(copy.deepcopy(non_parsed)))
+        self.assertEqual((ActiveMNS().cache_hits, ActiveMNS().cache_misses), (hits + 1, misses + 1))
+        non_parsed_bis = copy.deepcopy(non_parsed)
+        non_parsed_bis['toolchain']['version'] = '6.6.7'
+        non_parsed_bis['moduleclass'] = 'tools'
+        self.assertEqual('foo/1.2.3-t00ls-6.6.7-bar', ActiveMNS().det_full_module_name(non_parsed_bis))
+        self.assertEqual((ActiveMNS().cache_hits, ActiveMNS().cache_misses), (hits + 1, misses + 2))
+        ActiveMNS().clear_cache()
+        self.assertEqual('foo/1.2.3-t00ls-6.6.6-bar', ActiveMNS().det_full_module_name(non_parsed))
+        self.assertEqual((ActiveMNS().cache_hits, ActiveMNS().cache_misses), (hits + 1, misses + 3))
+
         # install custom module naming scheme dynamically
         test_mns_parent_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sandbox')
         sys.path.append(test_mns_parent_dir)
@@ -240,7 +341,8 @@ class ModuleGeneratorTest(EnhancedTestCase):
         reload(easybuild.tools.module_naming_scheme)
 
         # make sure test module naming schemes are available
-        mns_mods = ['broken_module_naming_scheme', 'test_module_naming_scheme', 'test_module_naming_scheme_more']
+        mns_mods = ['broken_module_naming_scheme', 'test_module_naming_scheme', 'test_module_naming_scheme_flat',
+                    'test_module_naming_scheme_more']
         for test_mns_mod in mns_mods:
             mns_path = "easybuild.tools.module_naming_scheme.%s" % test_mns_mod
             __import__(mns_path, globals(), locals(), [''])
@@ -270,6 +372,24 @@ class ModuleGeneratorTest(EnhancedTestCase):
         ec = EasyConfig(os.path.join(ecs_dir, 'gzip-1.5-goolf-1.4.10.eb'))
         self.assertEqual(ec.toolchain.det_short_module_name(), 'goolf/1.4.10')
 
+        # easyconfigs that only differ in version prefix/suffix get different module names,
+        # even if the module naming scheme doesn't list these as required keys (cfr. module name cache)
+        os.environ['EASYBUILD_MODULE_NAMING_SCHEME'] = 'TestModuleNamingSchemeFlat'
+        init_config(build_options=build_options)
+        (hits, misses) = (ActiveMNS().cache_hits, ActiveMNS().cache_misses)
+        mod_names = []
+        for (versionprefix, versionsuffix) in [('', ''), ('pre-', ''), ('', '-bar'), ('pre-', '-bar'), ('', '')]:
+            dep_spec = {
+                'name': 'foo',
+                'version': '1.2.3',
+                'versionprefix': versionprefix,
+                'versionsuffix': versionsuffix,
+                'toolchain': {'name': 'dummy', 'version': 'dummy'},
+            }
+            mod_names.append(ActiveMNS().det_full_module_name(dep_spec))
+        self.assertEqual(mod_names, ['foo/1.2.3', 'foo/pre-1.2.3', 'foo/1.2.3-bar', 'foo/pre-1.2.3-bar', 'foo/1.2.3'])
+        self.assertEqual((ActiveMNS().cache_hits, ActiveMNS().cache_misses), (hits + 1, misses + 4))
+
         # test module naming scheme using all available easyconfig parameters
         os.environ['EASYBUILD_MODULE_NAMING_SCHEME'] = 'TestModuleNamingSchemeMore'
         init_config(build_options=build_options)
@@ -0,0 +1,210 @@
+##
+# Copyright 2014 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Unit tests for module_index.py.
+"""
+import os
+import shutil
+import tempfile
+from test.framework.utilities import EnhancedTestCase
+from test.framework.modules import TEST_MODULES_COUNT
+from unittest import TestLoader, main
+
+import easybuild.tools.module_index as module_index
+from easybuild.tools.filetools import mkdir, read_file, write_file
+from easybuild.tools.module_index import MODULE_INDEX_CACHE_HEADER, ModuleIndex, ModulePathIndex, is_module_file
+from easybuild.tools.module_index import read_module_file
+from easybuild.tools.module_index import read_module_loads
+
+
+class ModuleIndexTest(EnhancedTestCase):
+    """Tests for index of available modules."""
+
+    def setUp(self):
+        """Set up test module path."""
+        super(ModuleIndexTest, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.mod_path = os.path.join(self.tmpdir, 'modules')
+        shutil.copytree(os.path.join(os.path.dirname(__file__), 'modules'), self.mod_path)
+
+    def tearDown(self):
+        """Clean up test module path."""
+        super(ModuleIndexTest, self).tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def touch_dir(self, path):
+        """Bump modification time of specified directory (or file)."""
+        mtime = os.stat(path).st_mtime + 10
+        os.utime(path, (mtime, mtime))
+
+    def test_is_module_file(self):
+        """Test recognizing module files."""
+        self.assertTrue(is_module_file(os.path.join(self.mod_path, 'GCC', '4.7.2')))
+        write_file(os.path.join(self.tmpdir, '1.0.lua'), 'setenv("FOO", "bar")')
+        self.assertTrue(is_module_file(os.path.join(self.tmpdir, '1.0.lua')))
+        write_file(os.path.join(self.tmpdir, 'README'), 'this is not a module file')
+        self.assertFalse(is_module_file(os.path.join(self.tmpdir, 'README')))
+
+    def test_module_path_index(self):
+        """Test indexing a module path, and refreshing it incrementally."""
+        idx = ModulePathIndex(self.mod_path)
+        idx.refresh()
+        mod_names = idx.module_names()
+        self.assertEqual(len(mod_names), TEST_MODULES_COUNT)
+        self.assertTrue('GCC/4.7.2' in mod_names)
+        self.assertTrue(idx.changed)
+
+        # unmodified directories are not rescanned
+        idx.changed = False
+        gcc_entry = idx.dirs['GCC']
+        idx.refresh()
+        self.assertFalse(idx.changed)
+        self.assertTrue(idx.dirs['GCC'] is gcc_entry)
+
+        # modified directories are rescanned
+        write_file(os.path.join(self.mod_path, 'GCC', '4.9.0.lua'), 'setenv("FOO", "bar")')
+        self.touch_dir(os.path.join(self.mod_path, 'GCC'))
+        idx.refresh()
+        self.assertTrue(idx.changed)
+        self.assertTrue('GCC/4.9.0' in idx.module_names())
+        self.assertEqual(len(idx.module_names()), TEST_MODULES_COUNT + 1)
+
+        # removed directories are dropped from the index
+        shutil.rmtree(os.path.join(self.mod_path, 'GCC'))
+        self.touch_dir(self.mod_path)
+        idx.refresh()
+        self.assertFalse([mod for mod in idx.module_names() if mod.startswith('GCC/')])
+
+        # symlinks to directories are followed, but cycles are not
+        os.symlink(os.path.join(self.mod_path, 'gompi'), os.path.join(self.mod_path, 'gompi-alias'))
+        os.symlink('..', os.path.join(self.mod_path, 'gompi', 'cycle'))
+        self.touch_dir(self.mod_path)
+        self.touch_dir(os.path.join(self.mod_path, 'gompi'))
+        idx.refresh()
+        mod_names = idx.module_names()
+        self.assertTrue('gompi-alias/1.3.12' in mod_names)
+        self.assertFalse([mod for mod in mod_names if 'cycle' in mod])
+
+    def test_module_index(self):
+        """Test index of available modules, incl. adding module files and using a cache file."""
+        cache_file = os.path.join(self.tmpdir, 'cache', 'index.py')
+        mod_index = ModuleIndex(cache_file)
+        self.assertEqual(len(mod_index.available([self.mod_path])), TEST_MODULES_COUNT)
+        self.assertEqual(mod_index.available([self.mod_path], mod_name='GCC/'), ['GCC/4.6.3', 'GCC/4.6.4', 'GCC/4.7.2'])
+
+        # adding a module file only rescans the directories it is located in
+        mod_file = os.path.join(self.mod_path, 'foo', 'bar', '1.0')
+        mkdir(os.path.dirname(mod_file), parents=True)
+        write_file(mod_file, '#%Module\n')
+        self.assertTrue(mod_index.add_module_file([self.mod_path], mod_file))
+        self.assertTrue('foo/bar/1.0' in mod_index.paths[self.mod_path].module_names())
+        self.assertFalse(mod_index.add_module_file([self.mod_path], os.path.join(self.tmpdir, 'foo', '1.0')))
+
+        mod_index.save()
+        self.assertTrue(os.path.exists(cache_file))
+        # cache file is written to a temporary file first, which is moved into place
+        self.assertEqual(os.listdir(os.path.dirname(cache_file)), [os.path.basename(cache_file)])
+
+        # index is loaded from cache file, and cached entries are reused
+        mod_index = ModuleIndex(cache_file)
+        self.assertTrue(self.mod_path in mod_index.paths)
+        gcc_entry = mod_index.paths[self.mod_path].dirs['GCC']
+        self.assertEqual(mod_index.available([self.mod_path], mod_name='foo'), ['foo/bar/1.0'])
+        self.assertTrue(mod_index.paths[self.mod_path].dirs['GCC'] is gcc_entry)
+
+        # cache file only contains plain data
+        self.assertEqual(read_file(cache_file).split('\n')[0], MODULE_INDEX_CACHE_HEADER)
+        self.assertTrue('%s\tGCC\t' % self.mod_path in read_file(cache_file))
+
+        # corrupt cache files are ignored
+        write_file(cache_file, "this is not a valid cache file")
+        mod_index = ModuleIndex(cache_file)
+        self.assertEqual(mod_index.paths, {})
+        for entry in ['%s\tGCC' % self.mod_path, '%s\tGCC\tfoo\t0' % self.mod_path,
+                      '%s\tGCC\t1.0\t2\t4.7.2' % self.mod_path, 'relpath\tGCC\t1.0\t0']:
+            write_file(cache_file, '\n'.join([MODULE_INDEX_CACHE_HEADER, '%s\t\t1.0\t0' % self.mod_path, entry]))
+            mod_index = ModuleIndex(cache_file)
+            self.assertEqual(mod_index.paths, {})
+        self.assertEqual(len(mod_index.available([self.mod_path])), TEST_MODULES_COUNT + 1)
+
+    def test_find_module_file(self):
+        """Test locating module files via module index."""
+        other_mod_path = os.path.join(self.tmpdir, 'other_modules')
+        mod_index = ModuleIndex()
+        mod_paths = [other_mod_path, self.mod_path]
+
+        gcc_mod_file = os.path.join(self.mod_path, 'GCC', '4.7.2')
+        self.assertEqual(mod_index.find_module_file(mod_paths, 'GCC/4.7.2'), gcc_mod_file)
+        self.assertEqual(mod_index.find_module_file(mod_paths, 'GCC/4.9.0'), None)
+        self.assertEqual(mod_index.find_module_file(mod_paths, 'GCC'), None)
+
+        # module paths are considered in order, module files in Lua syntax are found too
+        other_gcc_mod_file = os.path.join(other_mod_path, 'GCC', '4.7.2.lua')
+        write_file(other_gcc_mod_file, 'setenv("FOO", "bar")')
+        self.touch_dir(os.path.dirname(other_gcc_mod_file))
+        self.assertEqual(mod_index.find_module_file(mod_paths, 'GCC/4.7.2'), other_gcc_mod_file)
+        self.assertEqual(mod_index.find_module_file(mod_paths[::-1], 'GCC/4.7.2'), gcc_mod_file)
+
+        # only the directories the module files would be located in are scanned
+        self.assertEqual(sorted(mod_index.paths[self.mod_path].dirs.keys()), ['', 'GCC'])
+
+    def test_read_module_loads(self):
+        """Test (cached) reading of module files, and determining modules loaded by them."""
+        gompi_mod_file = os.path.join(self.mod_path, 'gompi', '1.3.12')
+        self.assertEqual(read_module_loads(gompi_mod_file), ['GCC/4.6.4', 'OpenMPI/1.6.4-GCC-4.6.4'])
+        self.assertTrue(read_module_file(gompi_mod_file).startswith('#%Module'))
+
+        lua_mod_file = os.path.join(self.tmpdir, 'gompi-1.3.12.lua')
+        write_file(lua_mod_file, '\n'.join([
+            'if not isloaded("GCC/4.6.4") then',
+            '    load("GCC/4.6.4")',
+            'end',
+            '',
+        ]))
+        self.assertEqual(read_module_loads(lua_mod_file), ['GCC/4.6.4'])
+
+        # modified module files are read again
+        write_file(lua_mod_file, read_file(lua_mod_file) + 'load("OpenMPI/1.6.4-GCC-4.6.4")\n')
+        self.touch_dir(lua_mod_file)
+        self.assertEqual(read_module_loads(lua_mod_file), ['GCC/4.6.4', 'OpenMPI/1.6.4-GCC-4.6.4'])
+
+        # cache of module files is bounded
+        orig_max_size = module_index.MODULE_FILES_CACHE_MAX_SIZE
+        module_index.MODULE_FILES_CACHE_MAX_SIZE = 2
+        try:
+            for mod_file in [gompi_mod_file, lua_mod_file, os.path.join(self.mod_path, 'GCC', '4.6.3')]:
+                read_module_file(mod_file)
+                self.assertTrue(len(module_index._module_files_cache) <= 2)
+            self.assertEqual(read_module_loads(gompi_mod_file), ['GCC/4.6.4', 'OpenMPI/1.6.4-GCC-4.6.4'])
+        finally:
+            module_index.MODULE_FILES_CACHE_MAX_SIZE = orig_max_size
+
+
+def suite():
+    """ returns all the testcases in this module """
+    return TestLoader().loadTestsFromTestCase(ModuleIndexTest)
+
+if __name__ == '__main__':
+    main()
@@ -124,6 +124,22 @@ class ModulesTest(EnhancedTestCase):
             self.assertTrue(m in self.testmods.loaded_modules())
             self.testmods.purge()
 
+    def test_modulefile_path(self):
+        """Test locating module files, and determining dependencies of modules."""
+        self.init_testmods()
+        test_modules_path = os.path.abspath(os.path.join(os.path.dirname(__file__), 'modules'))
+
+        modfile_path = self.testmods.modulefile_path('gompi/1.3.12')
+        self.assertEqual(modfile_path, os.path.join(test_modules_path, 'gompi', '1.3.12'))
+        self.assertErrorRegex(EasyBuildError, "non-existing module", self.testmods.modulefile_path, 'foo/1.2.3')
+
+        deps = self.testmods.dependencies_for('gompi/1.3.12', depth=0)
+        self.assertEqual(deps, ['GCC/4.6.4', 'OpenMPI/1.6.4-GCC-4.6.4'])
+        deps = self.testmods.dependencies_for('gompi/1.3.12')
+        self.assertEqual(deps, ['GCC/4.6.4', 'OpenMPI/1.6.4-GCC-4.6.4', 'hwloc/1.6.2-GCC-4.6.4'])
+
+        self.assertEqual(self.testmods.module_software_name('OpenMPI/1.6.4-GCC-4.6.4'), 'OpenMPI')
+
     def test_ld_library_path(self):
         """Make sure LD_LIBRARY_PATH is what it should be when loaded multiple modules."""
         self.init_testmods()
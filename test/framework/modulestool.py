@@ -179,8 +179,8 @@ class ModulesToolTest(EnhancedTestCase):
             # obtain list of availabe modules, should be non-empty
             self.assertTrue(lmod.available(), "List of available modules obtained using Lmod is non-empty")
 
-            # test updating local spider cache (but don't actually update the local cache file!)
-            self.assertTrue(lmod.update(), "Updated local Lmod spider cache is non-empty")
+            # test updating module index (but don't actually update the local cache files!)
+            self.assertTrue(lmod.update(), "Updated module index is non-empty")
 
     def tearDown(self):
         """Testcase cleanup."""
@@ -762,6 +762,21 @@ class CommandLineOptionsTest(EnhancedTestCase):
         shutil.rmtree(installpath)
         shutil.rmtree(tmpdir)
 
+    def test_module_syntax(self):
+        """Test specifying syntax for generated module files."""
+        eb_file = os.path.join(os.path.dirname(__file__), 'easyconfigs', 'toy-0.0.eb')
+
+        # module files in Lua syntax require Lmod as modules tool
+        args = [
+            eb_file,
+            '--module-syntax=Lua',
+            '--modules-tool=EnvironmentModulesC',
+            '--dry-run',
+        ]
+        outtxt, err = self.eb_main(args, return_error=True)
+        error_regex = re.compile("Module syntax Lua is only supported when using Lmod as modules tool")
+        self.assertTrue(error_regex.search(str(err)), "Pattern '%s' found in: %s" % (error_regex.pattern, err))
+
     def test_tmpdir(self):
         """Test setting temporary directory to use by EasyBuild."""
 
@@ -1030,6 +1045,18 @@ class CommandLineOptionsTest(EnhancedTestCase):
         self.assertTrue(os.path.exists(toy_buildpath), "Build dir %s is retained when requested" % toy_buildpath)
         shutil.rmtree(toy_buildpath)
 
+        # build dir can also be cleaned up in the background, after moving it out of the way
+        args = [
+            toy_ec,
+            '--force',
+            '--cleanup-builddir-async',
+        ]
+        self.eb_main(args, do_build=True, verbose=True)
+        self.assertFalse(os.path.exists(toy_buildpath), "Build dir %s removed after succesful build" % toy_buildpath)
+        trash_dir = os.path.join(self.test_buildpath, '.eb-trash')
+        self.assertTrue(os.path.isdir(trash_dir))
+        self.assertEqual(os.listdir(trash_dir), [])
+
         # make sure build dir stays in case of failed build
         args = [
             toy_ec,
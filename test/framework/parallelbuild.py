@@ -28,17 +28,29 @@ Unit tests for parallelbuild.py
 @author: Kenneth Hoste (Ghent University)
 """
 import os
+import re
+import shutil
+import tempfile
 from test.framework.utilities import EnhancedTestCase, init_config
 from unittest import TestLoader, main
 from vsc.utils.fancylogger import setLogLevelDebug, logToScreen
+from vsc.utils.missing import nub
 
 from easybuild.framework.easyconfig.tools import process_easyconfig, resolve_dependencies
 from easybuild.tools import config, parallelbuild
-from easybuild.tools.parallelbuild import PbsJob, build_easyconfigs_in_parallel
+from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.config import install_path
+from easybuild.tools.filetools import read_file
+from easybuild.tools.job import pbs_python
+from easybuild.tools.job.backend import job_backend
+from easybuild.tools.module_naming_scheme import GENERAL_CLASS
+from easybuild.tools.parallelbuild import DEFAULT_JOB_WALLTIME, JOB_CANCELLED, JOB_FAILED, JOB_SUCCESS, JobMonitor
+from easybuild.tools.parallelbuild import build_easyconfigs_in_parallel, create_job, det_job_resources, plan_jobs
+from easybuild.tools.parallelbuild import prepare_easyconfigs
 
 
 def mock(*args, **kwargs):
-    """Function used for mocking several functions imported in parallelbuild module."""
+    """Function used for mocking several functions imported in pbs_python job backend module."""
     return 1
 
 
@@ -58,6 +70,9 @@ class MockPbsJob(object):
     def has_holds(self, *args, **kwargs):
         pass
 
+    def release_hold(self, *args, **kwargs):
+        pass
+
     def submit(self, *args, **kwargs):
         pass
 
@@ -65,20 +80,33 @@ class MockPbsJob(object):
 class ParallelBuildTest(EnhancedTestCase):
     """ Testcase for run module """
 
+    # functions/classes that are mocked in pbs_python job backend module
+    MOCKED = ['connect_to_server', 'disconnect_from_server', 'get_ppn', 'PbsJob']
+
     def setUp(self):
         """Set up testcase."""
         super(ParallelBuildTest, self).setUp()
         build_options = {
+            'job_backend': 'PbsPython',
             'robot_path': os.path.join(os.path.dirname(__file__), 'easyconfigs'),
             'valid_module_classes': config.module_classes(),
         }
         init_config(build_options=build_options)
 
         # put mocked functions in place
-        parallelbuild.connect_to_server = mock
-        parallelbuild.disconnect_from_server = mock
-        parallelbuild.get_ppn = mock
-        parallelbuild.PbsJob = MockPbsJob
+        self.orig_pbs_python = dict([(key, getattr(pbs_python, key)) for key in self.MOCKED])
+        pbs_python.connect_to_server = mock
+        pbs_python.disconnect_from_server = mock
+        pbs_python.get_ppn = mock
+        pbs_python.PbsJob = MockPbsJob
+        pbs_python.PbsPython.USABLE = True
+
+    def tearDown(self):
+        """Restore mocked functions."""
+        super(ParallelBuildTest, self).tearDown()
+        for (key, val) in self.orig_pbs_python.items():
+            setattr(pbs_python, key, val)
+        pbs_python.PbsPython.USABLE = not pbs_python.pbs_import_failed
 
     def test_build_easyconfigs_in_parallel(self):
         """Basic test for build_easyconfigs_in_parallel function."""
@@ -87,6 +115,267 @@ class ParallelBuildTest(EnhancedTestCase):
         ordered_ecs = resolve_dependencies(easyconfigs)
         build_easyconfigs_in_parallel("echo %(spec)s", ordered_ecs)
 
+    def test_build_easyconfigs_in_parallel_local(self):
+        """Test build_easyconfigs_in_parallel function using Local job backend."""
+        init_config(build_options={
+            'job_backend': 'Local',
+            'job_max_jobs': 2,
+            'robot_path': os.path.join(os.path.dirname(__file__), 'easyconfigs'),
+            'valid_module_classes': config.module_classes(),
+        })
+        easyconfig_file = os.path.join(os.path.dirname(__file__), 'easyconfigs', 'gzip-1.5-goolf-1.4.10.eb')
+        easyconfigs = process_easyconfig(easyconfig_file, validate=False)
+        ordered_ecs = resolve_dependencies(easyconfigs)
+
+        # no need to fetch sources, since jobs only print the easyconfig file they would build
+        orig_prepare_easyconfig = parallelbuild.prepare_easyconfig
+        parallelbuild.prepare_easyconfig = mock
+
+        tmpdir = tempfile.mkdtemp()
+        cwd = os.getcwd()
+        os.chdir(tmpdir)
+        try:
+            jobs = build_easyconfigs_in_parallel("echo %(spec)s; echo $EASYBUILDTESTOUTPUT", ordered_ecs,
+                                                 output_dir=tmpdir)
+        finally:
+            os.chdir(cwd)
+            parallelbuild.prepare_easyconfig = orig_prepare_easyconfig
+
+        # all jobs were run (in order, and with correct dependencies) by the time build_easyconfigs_in_parallel returns;
+        # linear chains of dependencies are merged into a single job
+        self.assertEqual(len(jobs), 6)
+        self.assertEqual(sum([job.modules for job in jobs], []), [ec['full_mod_name'] for ec in ordered_ecs])
+        specs = dict([(ec['full_mod_name'], ec['spec']) for ec in ordered_ecs])
+        job_ids = [job.jobid for job in jobs]
+        # jobs without dependencies depend on a single sentinel job, which is not included in the list of jobs
+        sentinel_ids = nub([dep for job in jobs for dep in job.deps if not dep in job_ids])
+        self.assertEqual(len(sentinel_ids), 1)
+        for job in jobs:
+            self.assertEqual(job.state(), 'finished')
+            self.assertEqual(job.exit_code, 0)
+            self.assertFalse(job.has_holds())
+            for dep in job.deps:
+                if dep in sentinel_ids:
+                    self.assertEqual(job.deps, sentinel_ids)
+                else:
+                    self.assertTrue(job_ids.index(dep) < job_ids.index(job.jobid))
+            out = read_file(os.path.join(tmpdir, '%s.o%s' % (job.name, job.jobid))).split('\n')
+            self.assertEqual(out[0:-1:2], [specs[mod] for mod in job.modules])
+            self.assertTrue(out[1].startswith(os.path.join(tmpdir, job.name.split('+')[0])))
+        self.assertTrue([job for job in jobs if job.deps])
+        self.assertEqual(jobs[0].name, 'hwloc-1.6.2-GCC-4.7.2+1')
+        shutil.rmtree(tmpdir)
+
+    def test_prepare_easyconfigs(self):
+        """Test preparing easyconfigs for building them in parallel."""
+        init_config(build_options={
+            'robot_path': os.path.join(os.path.dirname(__file__), 'easyconfigs'),
+            'valid_module_classes': config.module_classes(),
+        })
+        easyconfig_file = os.path.join(os.path.dirname(__file__), 'easyconfigs', 'gzip-1.5-goolf-1.4.10.eb')
+        ordered_ecs = resolve_dependencies(process_easyconfig(easyconfig_file, validate=False))
+
+        # easyconfigs may be prepared in separate processes, so keep track of prepared easyconfigs in a file
+        fd, fn = tempfile.mkstemp()
+        os.close(fd)
+        broken = []
+
+        def mocked_prepare_easyconfig(ec):
+            """Mocked version of prepare_easyconfig, which only records which easyconfig was prepared."""
+            if ec['ec']['name'] in broken:
+                raise EasyBuildError("oops, failed to prepare %s" % ec['spec'])
+            f = open(fn, 'a')
+            f.write('%s\n' % ec['spec'])
+            f.close()
+
+        orig_prepare_easyconfig = parallelbuild.prepare_easyconfig
+        parallelbuild.prepare_easyconfig = mocked_prepare_easyconfig
+        # make sure multiple processes are used, regardless of the number of available cores
+        orig_get_avail_core_count = parallelbuild.get_avail_core_count
+        parallelbuild.get_avail_core_count = lambda: 4
+        try:
+            prepare_easyconfigs(ordered_ecs)
+            self.assertEqual(sorted(read_file(fn).split()), sorted([ec['spec'] for ec in ordered_ecs]))
+
+            # failures are reported
+            broken.append('hwloc')
+            self.assertErrorRegex(EasyBuildError, "oops, failed to prepare .*hwloc", prepare_easyconfigs, ordered_ecs)
+        finally:
+            parallelbuild.prepare_easyconfig = orig_prepare_easyconfig
+            parallelbuild.get_avail_core_count = orig_get_avail_core_count
+            os.remove(fn)
+
+    def test_plan_jobs(self):
+        """Test planning jobs, i.e. merging linear chains of dependencies and groups of siblings."""
+        easyconfig_file = os.path.join(os.path.dirname(__file__), 'easyconfigs', 'gzip-1.5-goolf-1.4.10.eb')
+        ordered_ecs = resolve_dependencies(process_easyconfig(easyconfig_file, validate=False))
+        # hwloc, OpenMPI, gompi, OpenBLAS, FFTW, ScaLAPACK, goolf, gzip
+        self.assertEqual(len(ordered_ecs), 8)
+        unknown_times = [None] * len(ordered_ecs)
+
+        self.assertEqual(plan_jobs(ordered_ecs, unknown_times, merge_chains=False), [[x] for x in range(8)])
+        # gompi is not merged with OpenMPI, since goolf also depends on OpenMPI
+        self.assertEqual(plan_jobs(ordered_ecs, unknown_times), [[0, 1], [2], [3], [4], [5], [6, 7]])
+        # siblings (OpenBLAS and FFTW) are only merged if build times are known
+        self.assertEqual(plan_jobs(ordered_ecs, unknown_times, merge_siblings=True),
+                         [[0, 1], [2], [3], [4], [5], [6, 7]])
+
+        build_times = [5, 20, 1, 10, 15, 30, 1, 3]
+        self.assertEqual(plan_jobs(ordered_ecs, build_times, merge_siblings=True),
+                         [[0, 1], [2], [3, 4], [5], [6, 7]])
+        # merged easyconfigs are limited by maximum total build time
+        self.assertEqual(plan_jobs(ordered_ecs, build_times, merge_siblings=True, max_time=20),
+                         [[0], [1], [2], [3], [4], [5], [6, 7]])
+        self.assertEqual(plan_jobs(ordered_ecs, build_times, merge_siblings=True, max_time=25),
+                         [[0, 1], [2], [3, 4], [5], [6, 7]])
+
+        # easyconfigs without known build time count as default walltime when checking maximum total build time
+        self.assertEqual(plan_jobs(ordered_ecs, unknown_times, max_time=60), [[x] for x in range(8)])
+        # merged jobs never exceed maximum walltime (72 hours): hwloc (default: 24h) and OpenMPI (30h, x2)
+        build_times = [None, 30 * 60, 1, 10, 15, 30, 1, 3]
+        self.assertEqual(plan_jobs(ordered_ecs, build_times), [[0], [1], [2], [3], [4], [5], [6, 7]])
+
+        # a single job is created for a group of easyconfigs, which are built one after the other
+        init_config(build_options={'job_backend': 'Local'})
+        buildstats = [{'build_time': 60}, {'build_time': 180}]
+        job = create_job(job_backend(), "eb %(spec)s", ordered_ecs[6:], buildstats=buildstats)
+        self.assertEqual(job.name, 'goolf-1.4.10+1')
+        self.assertEqual(job.modules, ['goolf/1.4.10', 'gzip/1.5-goolf-1.4.10'])
+        self.assertEqual(job.resources, {'hours': 1})
+        regex = re.compile(r"^\(export EASYBUILDTESTOUTPUT=\S*/goolf-1.4.10 && eb \S*/goolf-1.4.10.eb\) && "
+                           r"\(export EASYBUILDTESTOUTPUT=\S*/gzip-1.5-goolf-1.4.10 && "
+                           r"eb \S*/gzip-1.5-goolf-1.4.10.eb\)$")
+        self.assertTrue(regex.search(job.script), "Pattern '%s' found in: %s" % (regex.pattern, job.script))
+
+        # a merged job stops at the first failed build, and reports the failure via its exit code
+        backend = job_backend()
+        tmpdir = tempfile.mkdtemp()
+        cwd = os.getcwd()
+        os.chdir(tmpdir)
+        try:
+            build_command = "echo %(spec)s | grep -v -q /goolf-1.4.10.eb && echo %(spec)s >> built.txt"
+            job = create_job(backend, build_command, ordered_ecs[6:], buildstats=buildstats)
+            job.submit()
+            backend.complete()
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(job.exit_code, 1)
+        self.assertFalse(os.path.exists(os.path.join(tmpdir, 'built.txt')))
+        shutil.rmtree(tmpdir)
+
+    def test_det_job_resources(self):
+        """Test estimating resources required for jobs, based on build stats."""
+        init_config(build_options={'job_backend': 'Local'})
+        gb = 1024 ** 3
+        buildstats = {'build_time': 1800, 'cpu_time': 5000, 'core_count': 16, 'peak_rss': 2 * gb}
+
+        # walltime/memory are padded, number of cores is derived from CPU time relative to build time
+        self.assertEqual(det_job_resources([buildstats]), {'hours': 1, 'cores': 3, 'mem': 3072})
+        # number of available cores is used if CPU time was not recorded
+        self.assertEqual(det_job_resources([{'build_time': 3 * 3600, 'core_count': 16}]), {'hours': 6, 'cores': 16})
+
+        # builds in the same job run one after the other
+        other_buildstats = {'build_time': 7200, 'cpu_time': 7200, 'peak_rss': 4 * gb}
+        self.assertEqual(det_job_resources([buildstats, other_buildstats]), {'hours': 5, 'cores': 3, 'mem': 6144})
+
+        # defaults are used for easyconfigs without build stats; full node is requested
+        self.assertEqual(det_job_resources([None]), {'hours': DEFAULT_JOB_WALLTIME})
+        self.assertEqual(det_job_resources([buildstats, None]), {'hours': DEFAULT_JOB_WALLTIME + 1})
+
+        # padding factors and defaults are configurable
+        init_config(build_options={
+            'job_default_mem': 1024,
+            'job_default_walltime': 4,
+            'job_mem_factor': 1.0,
+            'job_walltime_factor': 1.0,
+        })
+        self.assertEqual(det_job_resources([buildstats]), {'hours': 1, 'cores': 3, 'mem': 2048})
+        self.assertEqual(det_job_resources([other_buildstats, None]), {'hours': 6, 'mem': 4096})
+        self.assertEqual(det_job_resources([{'build_time': 10}]), {'hours': 1, 'mem': 1024})
+
+    def test_job_monitor(self):
+        """Test waiting for jobs to complete, resubmitting failed jobs and cancelling jobs that depend on them."""
+        init_config(build_options={
+            'job_backend': 'Local',
+            'job_max_jobs': 2,
+            'silent': True,
+            'suffix_modules_path': GENERAL_CLASS,
+        })
+        backend = job_backend()
+        backend.init()
+        tmpdir = tempfile.mkdtemp()
+        cwd = os.getcwd()
+        os.chdir(tmpdir)
+
+        def submit(script, name, deps=None, modules=None):
+            """Submit job with specified script, which depends on specified jobs."""
+            job = backend.make_job(script, name)
+            job.modules = modules or []
+            job.requested_resources = None
+            job.test_output_paths = [os.path.join(tmpdir, '%s.test' % name)]
+            job.add_dependencies([dep.jobid for dep in deps or []])
+            job.submit()
+            return job
+
+        try:
+            # job that fails the first time, and job that depends on it
+            flaky = submit("echo flaky > flaky.test; if [ -f flaky ]; then true; else touch flaky; exit 1; fi", 'flaky')
+            after_flaky = submit("echo after_flaky", 'after_flaky', deps=[flaky])
+            # job that always fails, jobs that (transitively) depend on it, and a job that doesn't depend on it
+            broken = submit("echo 'oops, something went wrong'; exit 1", 'broken')
+            after_broken = submit("sleep 60", 'after_broken', deps=[broken])
+            after_after_broken = submit("true", 'after_after_broken', deps=[after_broken, flaky])
+            independent = submit("sleep 0.2", 'independent')
+            # job that exits with zero exit code, but doesn't install the module it should install
+            no_module = submit("true", 'no_module', modules=['nosuchmodule/1.0'])
+            # job that installs a module in a location that is not in $MODULEPATH (e.g. in a module hierarchy)
+            mod_file = os.path.join(install_path('mod'), GENERAL_CLASS, 'Compiler', 'GCC', '4.7.2', 'foo', '1.0')
+            script = "mkdir -p %s && echo '#%%Module' > %s" % (os.path.dirname(mod_file), mod_file)
+            with_module = submit(script, 'with_module', modules=['Compiler/GCC/4.7.2/foo/1.0'])
+
+            jobs = [flaky, after_flaky, broken, after_broken, after_after_broken, independent, no_module, with_module]
+            monitor = JobMonitor(backend, jobs, retries=1, poll_interval=0.1)
+            self.assertEqual(monitor.dependents(0), [1, 4])
+            self.assertEqual(monitor.dependents(2), [3, 4])
+            self.assertFalse(monitor.wait())
+            backend.complete()
+        finally:
+            os.chdir(cwd)
+
+        statuses = [JOB_SUCCESS, JOB_SUCCESS, JOB_FAILED, JOB_CANCELLED, JOB_CANCELLED, JOB_SUCCESS, JOB_FAILED,
+                    JOB_SUCCESS]
+        self.assertEqual(monitor.status, statuses)
+        self.assertEqual(monitor.attempts, [1, 0, 1, 0, 0, 0, 1, 0])
+        # flaky job and jobs that depend on it were resubmitted
+        self.assertEqual([len(job_ids) for job_ids in monitor.job_ids], [2, 2, 2, 2, 3, 1, 2, 1])
+        self.assertEqual(monitor.jobs[0].exit_code, 0)
+
+        summary = monitor.summary()
+        regex = re.compile(r"^\* broken: failed \(job id\(s\): \S+, \S+\)\n  output: .*\n  \| oops", re.M)
+        self.assertTrue(regex.search(summary), "Pattern '%s' found in: %s" % (regex.pattern, summary))
+        self.assertTrue("test report: %s" % os.path.join(tmpdir, 'flaky.test') in summary)
+        self.assertTrue(re.search(r"^4/8 jobs completed successfully, 2 failed, 2 cancelled \(3 resubmissions\)$",
+                                  summary, re.M))
+
+        # failed jobs are not resubmitted with the 'none' policy, and resubmitted with --force with 'force' policy
+        os.chdir(tmpdir)
+        try:
+            jobs = [submit('test "$EASYBUILD_FORCE" = 1', 'force')]
+            monitor = JobMonitor(backend, jobs, retries=2, retry_policy='none', poll_interval=0.1)
+            self.assertFalse(monitor.wait())
+            self.assertEqual(monitor.attempts, [0])
+
+            jobs = [submit('test "$EASYBUILD_FORCE" = 1', 'force')]
+            monitor = JobMonitor(backend, jobs, retries=2, retry_policy='force', poll_interval=0.1)
+            self.assertTrue(monitor.wait())
+            self.assertEqual(monitor.attempts, [1])
+            backend.complete()
+        finally:
+            os.chdir(cwd)
+
+        shutil.rmtree(tmpdir)
+
+
 def suite():
     """ returns all the testcases in this module """
     return TestLoader().loadTestsFromTestCase(ParallelBuildTest)
@@ -0,0 +1,186 @@
+##
+# Copyright 2014 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Unit tests for process.py.
+"""
+import os
+import re
+import tempfile
+import time
+from test.framework.utilities import EnhancedTestCase
+from unittest import TestLoader, main
+
+from easybuild.tools.process import STDERR, STDOUT, Process, ProcessMultiplexer, map_in_processes, run_process
+from easybuild.tools.process import run_processes
+
+
+class ProcessTest(EnhancedTestCase):
+    """Tests for process layer."""
+
+    def test_run_process(self):
+        """Test running a single process."""
+        proc = run_process(Process("echo foo; echo bar >&2; exit 3"))
+        self.assertEqual(proc.get_output(), "foo\nbar\n")
+        self.assertEqual(proc.exit_code, 3)
+        self.assertFalse(proc.timed_out)
+
+        # separate stderr, command as list of arguments
+        proc = run_process(Process(['/bin/sh', '-c', 'echo foo; echo bar >&2'], shell=False, merge_stderr=False))
+        self.assertEqual(proc.get_output(STDOUT), "foo\n")
+        self.assertEqual(proc.get_output(STDERR), "bar\n")
+        self.assertEqual(proc.exit_code, 0)
+
+        # (lots of) input is fed to command without blocking
+        txt = "x" * 1024 * 1024
+        proc = run_process(Process("cat", inp=txt))
+        self.assertEqual(proc.get_output(), txt)
+
+        # output handler is called as soon as output is available
+        chunks = []
+        def handle_output(proc, txt, stream):
+            """Collect output, and send input."""
+            chunks.append((txt, stream))
+            if txt == 'question\n':
+                proc.send("answer\n")
+            else:
+                proc.close_stdin()
+        proc = run_process(Process("echo question; read x; echo $x", interactive=True, output_handler=handle_output))
+        self.assertEqual(chunks, [("question\n", STDOUT), ("answer\n", STDOUT)])
+        self.assertEqual(proc.get_output(), '')
+
+    def test_process_group(self):
+        """Test whether commands run in a process group of their own only when a timeout applies."""
+        cmd = "ps -o pgid=,sid= -p $$"
+        (pgid, sid) = (os.getpgid(0), os.getsid(0))
+        proc = run_process(Process(cmd))
+        self.assertEqual([int(x) for x in proc.get_output().split()], [pgid, sid])
+
+        # command stays in the same session (and thus keeps the controlling terminal, if any)
+        for kwargs in [{'timeout': 10}, {'no_output_timeout': 10}]:
+            proc = run_process(Process(cmd, **kwargs))
+            self.assertEqual([int(x) for x in proc.get_output().split()], [proc.pid, sid])
+
+    def test_concurrent_processes(self):
+        """Test running processes concurrently."""
+        start = time.time()
+        procs = run_processes([Process("sleep 1; echo %s" % i) for i in range(5)])
+        self.assertTrue(time.time() - start < 3)
+        self.assertEqual([proc.get_output() for proc in procs], ["%s\n" % i for i in range(5)])
+
+        # limit number of processes running at the same time
+        mux = ProcessMultiplexer(max_procs=2)
+        for i in range(4):
+            mux.add(Process("sleep 0.2; echo %s" % i))
+        done = mux.run()
+        self.assertEqual(sorted([proc.get_output() for proc in done]), ["%s\n" % i for i in range(4)])
+        self.assertTrue(done[3].start_time >= min(done[0].end_time, done[1].end_time))
+
+    def test_timeouts(self):
+        """Test per-command timeouts."""
+        # spawned processes are killed together with the command (cfr. process group)
+        fd, pid_file = tempfile.mkstemp()
+        os.close(fd)
+        start = time.time()
+        procs = run_processes([
+            Process("sleep 100 & echo $! > %s; wait" % pid_file, timeout=1),
+            Process("echo done"),
+        ])
+        self.assertTrue(time.time() - start < 10)
+        self.assertTrue(procs[0].timed_out)
+        self.assertFalse(procs[1].timed_out)
+        self.assertEqual(procs[1].get_output(), "done\n")
+        pid = int(open(pid_file).read())
+        time.sleep(0.1)
+        # killed process may linger as a zombie until it is reaped
+        status_file = '/proc/%s/status' % pid
+        if os.path.exists(status_file):
+            self.assertTrue(re.search(r"^State:\s+Z", open(status_file).read(), re.M))
+        os.remove(pid_file)
+
+        # no-output timeout, idle handler decides whether to keep waiting
+        proc = run_process(Process("echo 1; sleep 5; echo 2", no_output_timeout=1))
+        self.assertTrue(proc.timed_out)
+        self.assertEqual(proc.get_output(), "1\n")
+
+        idle_calls = []
+        def handle_idle(proc):
+            """Keep waiting."""
+            idle_calls.append(proc)
+            return True
+        proc = run_process(Process("echo 1; sleep 1.5; echo 2", no_output_timeout=1, idle_handler=handle_idle))
+        self.assertFalse(proc.timed_out)
+        self.assertEqual(proc.get_output(), "1\n2\n")
+        self.assertEqual(len(idle_calls), 1)
+
+    def test_cancel(self):
+        """Test cancelling processes."""
+        mux = ProcessMultiplexer()
+        procs = [Process("sleep 100"), Process("echo foo")]
+        for proc in procs:
+            mux.add(proc)
+
+        def handle_output(proc, txt, stream):
+            """Interrupt running processes."""
+            raise KeyboardInterrupt
+        mux.add(Process("echo interrupt", output_handler=handle_output))
+
+        self.assertErrorRegex(KeyboardInterrupt, '', mux.run)
+        self.assertTrue(procs[0].cancelled)
+        self.assertTrue(procs[0].exit_code is not None)
+        self.assertEqual(mux.running, [])
+
+    def test_map_in_processes(self):
+        """Test applying a function to a list of items in worker processes."""
+        class Item(object):
+            """Item that can not be pickled (cfr. local class), only the results need to be passed back."""
+            def __init__(self, value):
+                self.value = value
+
+        def square(item):
+            """Return square of value of specified item, or fail for negative values."""
+            if item.value < 0:
+                raise ValueError("negative value: %s" % item.value)
+            return (os.getpid(), item.value ** 2)
+
+        items = [Item(i) for i in [1, 2, -3, 4]]
+        for max_procs in [1, 4]:
+            res = map_in_processes(square, items, max_procs)
+            self.assertEqual([ok for (ok, _) in res], [True, True, False, True])
+            self.assertEqual([x[1] for (ok, x) in res if ok], [1, 4, 16])
+            self.assertEqual(res[2][1], "ValueError: negative value: -3")
+
+            pids = [x[0] for (ok, x) in res if ok]
+            if max_procs == 1:
+                self.assertEqual(pids, [os.getpid()] * 3)
+            else:
+                self.assertFalse(os.getpid() in pids)
+
+
+def suite():
+    """ returns all the testcases in this module """
+    return TestLoader().loadTestsFromTestCase(ProcessTest)
+
+if __name__ == '__main__':
+    main()
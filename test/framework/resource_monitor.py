@@ -0,0 +1,159 @@
+##
+# Copyright 2014 Ghent University
+#
+# This file is part of EasyBuild,
+# originally created by the HPC team of Ghent University (http://ugent.be/hpc/en),
+# with support of Ghent University (http://ugent.be/hpc),
+# the Flemish Supercomputer Centre (VSC) (https://vscentrum.be/nl/en),
+# the Hercules foundation (http://www.herculesstichting.be/in_English)
+# and the Department of Economy, Science and Innovation (EWI) (http://www.ewi-vlaanderen.be/en).
+#
+# http://github.com/hpcugent/easybuild
+#
+# EasyBuild is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation v2.
+#
+# EasyBuild is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with EasyBuild.  If not, see <http://www.gnu.org/licenses/>.
+##
+"""
+Unit tests for resource_monitor.py.
+"""
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from test.framework.utilities import EnhancedTestCase
+from unittest import TestLoader, main
+
+import easybuild.tools.resource_monitor as resource_monitor
+from easybuild.tools.filetools import read_file, write_file
+from easybuild.tools.resource_monitor import RESOURCE_USAGE_FIELDS, ResourceMonitor
+from easybuild.tools.resource_monitor import det_mem_per_job, get_process_tree, read_time_series, sample_process_tree
+from easybuild.tools.run import run_cmd
+
+
+class ResourceMonitorTest(EnhancedTestCase):
+    """Tests for monitoring resources consumed by build processes."""
+
+    def test_sample_process_tree(self):
+        """Test sampling resource usage of process tree."""
+        proc = subprocess.Popen("sleep 10 | sleep 10", shell=True, preexec_fn=os.setsid)
+        time.sleep(0.5)
+        try:
+            pids = get_process_tree(os.getpid())
+            self.assertTrue(proc.pid in pids)
+            self.assertTrue(len(pids) >= 2)
+
+            # same result when the parent of every process has to be determined instead
+            orig_get_children = resource_monitor.get_children
+            resource_monitor.get_children = lambda pid: None
+            try:
+                self.assertEqual(sorted(get_process_tree(os.getpid())), sorted(pids))
+            finally:
+                resource_monitor.get_children = orig_get_children
+
+            sample = sample_process_tree()
+            self.assertTrue(sample['nprocs'] >= 2)
+            self.assertTrue(sample['rss'] > 0)
+        finally:
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+
+    def test_resource_monitor(self):
+        """Test monitoring resources consumed per step."""
+        monitor = ResourceMonitor(interval=0.1)
+
+        monitor.start_step('build', parallel=2)
+        cmd = "import time; x = 'x' * 50 * 1024 * 1024; y = [i * i for i in range(10**6)]; time.sleep(0.5)"
+        run_cmd('%s -c "%s"' % (sys.executable, cmd))
+        build_info = monitor.stop_step()
+
+        monitor.start_step('install')
+        run_cmd("dd if=/dev/zero of=%s bs=1024 count=1024 conv=fsync" % os.path.join(tempfile.gettempdir(), 'test'))
+        install_info = monitor.stop_step()
+        monitor.stop()
+        os.remove(os.path.join(tempfile.gettempdir(), 'test'))
+
+        self.assertEqual(build_info['step'], 'build')
+        self.assertEqual(build_info['parallel'], 2)
+        self.assertTrue(build_info['peak_rss'] >= 50 * 1024 * 1024)
+        self.assertTrue(build_info['cpu_time'] > 0)
+        self.assertTrue(0 < build_info['cpu_utilisation'] <= 1)
+        self.assertTrue(install_info['write_bytes'] >= 1024 * 1024)
+
+        summary = monitor.summary()
+        self.assertEqual(summary['peak_rss'], build_info['peak_rss'])
+        self.assertEqual([step for (step, _) in summary['steps']], ['build', 'install'])
+
+        fd, fn = tempfile.mkstemp()
+        os.close(fd)
+        monitor.write_time_series(fn)
+        lines = read_file(fn).splitlines()
+        self.assertEqual(lines[0].split('\t'), RESOURCE_USAGE_FIELDS)
+        self.assertTrue(len(lines) > 4)
+
+        samples = read_time_series(fn)
+        os.remove(fn)
+        self.assertEqual(len(samples), len(lines) - 1)
+        build_samples = [x for x in samples if x['step'] == 'build']
+        self.assertTrue(build_samples)
+        self.assertEqual(max([x['rss'] for x in build_samples]), build_info['peak_rss'])
+        self.assertTrue([x for x in build_samples if x['parallel'] == 2])
+        self.assertTrue([x for x in samples if x['step'] == 'install' and x['parallel'] is None])
+
+    def test_resource_monitor_no_proc(self):
+        """Test monitoring resources when /proc is not available (e.g. on OS X)."""
+        def fail_listdir(path):
+            """Fake os.listdir which fails for /proc."""
+            if path.startswith('/proc'):
+                raise OSError(2, "No such file or directory: '/proc'")
+            return orig_listdir(path)
+
+        orig_listdir = os.listdir
+        os.listdir = fail_listdir
+        try:
+            monitor = ResourceMonitor(interval=1)
+            monitor.start_step('build', parallel=2)
+            self.assertEqual(monitor.stop_step(), None)
+            monitor.stop()
+        finally:
+            os.listdir = orig_listdir
+
+        self.assertEqual(monitor.samples, [])
+        self.assertEqual(monitor.summary()['steps'], [])
+
+    def test_det_mem_per_job(self):
+        """Test estimating memory required per job based on resource usage of previous builds."""
+        tmpdir = tempfile.mkdtemp()
+        paths = [os.path.join(tmpdir, x) for x in ['1.tsv', '2.tsv']]
+        header = '\t'.join(RESOURCE_USAGE_FIELDS)
+        write_file(paths[0], '\n'.join([
+            header,
+            '0.00\t-\t-\t0\t0\t0.00\t0\t0',
+            '1.00\tbuild\t4\t5\t4096\t3.00\t0\t0',
+            '2.00\tinstall\t4\t1\t8000\t3.50\t0\t0',
+        ]) + '\n')
+        write_file(paths[1], '\n'.join([header, '1.00\tbuild\t2\t3\t3072\t3.00\t0\t0']) + '\n')
+
+        self.assertEqual(det_mem_per_job(paths[:1]), 2000)
+        self.assertEqual(det_mem_per_job(paths), 2000)
+        self.assertEqual(det_mem_per_job([]), None)
+        shutil.rmtree(tmpdir)
+
+
+def suite():
+    """ returns all the testcases in this module """
+    return TestLoader().loadTestsFromTestCase(ResourceMonitorTest)
+
+if __name__ == '__main__':
+    main()
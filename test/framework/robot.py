@@ -29,15 +29,23 @@ Unit tests for robot (dependency resolution).
 """
 
 import os
+import re
+import shutil
+import tempfile
 from copy import deepcopy
 from test.framework.utilities import EnhancedTestCase, init_config
 from unittest import TestLoader
 from unittest import main as unittestmain
 
 import easybuild.framework.easyconfig.tools as ectools
-from easybuild.framework.easyconfig.tools import resolve_dependencies, skip_available
+from easybuild.framework.easyconfig.easyconfig import process_easyconfig
+from easybuild.framework.easyconfig.tools import FINGERPRINT_FILENAME, det_fingerprint, det_installdir
+from easybuild.framework.easyconfig.tools import find_archived_easyconfigs, group_by_dependency_level
+from easybuild.framework.easyconfig.tools import read_fingerprint, resolve_dependencies, skip_available
+from easybuild.framework.easyconfig.tools import skip_up_to_date
 from easybuild.tools import config, modules
 from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.filetools import mkdir, read_file, write_file
 from test.framework.utilities import find_full_path
 
 ORIG_MODULES_TOOL = modules.modules_tool
@@ -245,6 +253,84 @@ class RobotTest(EnhancedTestCase):
         self.assertEqual('goolf/1.4.10', res[2]['full_mod_name'])
         self.assertEqual('foo/1.2.3', res[3]['full_mod_name'])
 
+    def test_skip_up_to_date(self):
+        """Test determining stale installations based on fingerprints."""
+        init_config(build_options={
+            'valid_module_classes': config.module_classes(),
+            'validate': False,
+        })
+        gompi_ec = os.path.join(self.base_easyconfig_dir, 'gompi-1.3.12.eb')
+        toy_ec = os.path.join(self.base_easyconfig_dir, 'toy-0.0-deps.eb')
+        ecs = process_easyconfig(gompi_ec) + process_easyconfig(toy_ec)
+
+        # nothing is installed yet, so all installations are stale
+        res = skip_up_to_date(deepcopy(ecs), testing=True)
+        self.assertEqual([ec['full_mod_name'] for ec in res], ['gompi/1.3.12', 'toy/0.0-deps'])
+
+        # fingerprint is deterministic, and depends on fingerprint of dependencies
+        gompi_fp = det_fingerprint(ecs[0]['ec'], gompi_ec)
+        self.assertTrue(re.match('^[0-9a-f]{40}$', gompi_fp))
+        self.assertEqual(gompi_fp, det_fingerprint(ecs[0]['ec'], gompi_ec))
+        toy_fp = det_fingerprint(ecs[1]['ec'], toy_ec, dep_fingerprints={'gompi/1.3.12': gompi_fp})
+        self.assertNotEqual(toy_fp, det_fingerprint(ecs[1]['ec'], toy_ec))
+
+        # record fingerprints, cfr. build_and_install_one
+        for ec, fingerprint in zip(ecs, [gompi_fp, toy_fp]):
+            fp_path = os.path.join(det_installdir(ec['ec']), config.log_path(), FINGERPRINT_FILENAME)
+            mkdir(os.path.dirname(fp_path), parents=True)
+            write_file(fp_path, fingerprint)
+        self.assertEqual(read_fingerprint(det_installdir(ecs[1]['ec'])), toy_fp)
+        self.assertEqual(det_fingerprint(ecs[1]['ec'], toy_ec), toy_fp)
+
+        # all installations are up-to-date now
+        res = skip_up_to_date(deepcopy(ecs), testing=True)
+        self.assertEqual(res, [])
+
+        # changing the easyconfig for a dependency also invalidates the installations that depend on it
+        tmpdir = tempfile.mkdtemp()
+        new_gompi_ec = os.path.join(tmpdir, 'gompi-1.3.12.eb')
+        write_file(new_gompi_ec, read_file(gompi_ec) + "\n# changed\n")
+        ecs[0]['spec'] = new_gompi_ec
+        res = skip_up_to_date(deepcopy(ecs), testing=True)
+        self.assertEqual([ec['full_mod_name'] for ec in res], ['gompi/1.3.12', 'toy/0.0-deps'])
+
+        # only installations that depend on a stale installation are invalidated
+        res = skip_up_to_date(deepcopy(ecs[1:]), testing=True)
+        self.assertEqual(res, [])
+
+        shutil.rmtree(tmpdir)
+
+    def test_regenerate_modules_order(self):
+        """Test finding archived easyconfigs for existing installations, and grouping them by dependency level."""
+        init_config(build_options={
+            'valid_module_classes': config.module_classes(),
+            'validate': False,
+        })
+        gompi_ec = os.path.join(self.base_easyconfig_dir, 'gompi-1.3.12.eb')
+        toy_ec = os.path.join(self.base_easyconfig_dir, 'toy-0.0-deps.eb')
+        ecs = process_easyconfig(toy_ec) + process_easyconfig(gompi_ec)
+
+        # archive easyconfig files in installation directories, cfr. build_and_install_one
+        archived_ecs = []
+        for ec in ecs:
+            installdir = det_installdir(ec['ec'])
+            archived_ec = os.path.join(installdir, config.log_path(), os.path.basename(ec['spec']))
+            write_file(archived_ec, read_file(ec['spec']))
+            # easybuild subdirectories deeper in the installation directory are not considered
+            write_file(os.path.join(installdir, 'lib', config.log_path(), 'test.eb'), '')
+            archived_ecs.append((archived_ec, installdir))
+        # directories without archived easyconfig files are ignored
+        mkdir(os.path.join(config.install_path(), 'foo', '1.0', config.log_path()), parents=True)
+
+        self.assertEqual(find_archived_easyconfigs(), sorted(archived_ecs))
+
+        # dependencies are in an earlier level, dependencies that are not included are not taken into account
+        levels = group_by_dependency_level(ecs)
+        self.assertEqual([[ec['full_mod_name'] for ec in level] for level in levels],
+                         [['gompi/1.3.12'], ['toy/0.0-deps']])
+        levels = group_by_dependency_level(ecs[:1])
+        self.assertEqual([[ec['full_mod_name'] for ec in level] for level in levels], [['toy/0.0-deps']])
+
     def tearDown(self):
         """ reset the Modules back to its original """
         super(RobotTest, self).tearDown()
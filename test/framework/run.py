@@ -30,12 +30,15 @@ Unit tests for filetools.py
 @author: Stijn De Weirdt (Ghent University)
 """
 import os
+import time
 from test.framework.utilities import EnhancedTestCase
 from unittest import TestLoader, main
 from vsc.utils.fancylogger import setLogLevelDebug, logToScreen
 
+import easybuild.tools.run as run
 from easybuild.tools.build_log import EasyBuildError
-from easybuild.tools.run import run_cmd, run_cmd_qa, parse_log_for_error
+from easybuild.tools.filetools import read_file
+from easybuild.tools.run import run_cmd, run_cmd_qa, run_cmds, parse_log_for_error
 from easybuild.tools.run import _log as run_log
 
 
@@ -85,6 +88,53 @@ class RunTest(EnhancedTestCase):
         self.assertEqual(out, "question\nanswer1\nquestion\nanswer2\n" * 2)
         self.assertEqual(ec, 0)
 
+    def test_run_cmd_qa_no_output_timeout(self):
+        """Test no-output timeout in run_cmd_qa."""
+        # questions are answered as soon as they are asked
+        start = time.time()
+        (out, ec) = run_cmd_qa("echo question; read x; echo $x", {"question": "answer"}, no_output_timeout=5)
+        self.assertEqual(out, "question\nanswer\n")
+        self.assertTrue(time.time() - start < 5)
+
+        # command waiting on unknown question is killed after timeout
+        error_regex = "no new output for 1 seconds.*what now"
+        self.assertErrorRegex(EasyBuildError, error_regex, run_cmd_qa, "echo 'what now?'; read x",
+                              {"question": "answer"}, no_output_timeout=1)
+
+        # no timeout when output matches one of the 'no question' patterns
+        cmd = "echo 'busy...'; sleep 2; echo question; read x; echo $x"
+        (out, ec) = run_cmd_qa(cmd, {"question": "answer"}, no_qa=["busy.*"], no_output_timeout=1)
+        self.assertEqual(out, "busy...\nquestion\nanswer\n")
+        self.assertEqual(ec, 0)
+
+    def test_run_cmd_timeout(self):
+        """Test timeout for run_cmd."""
+        (out, ec) = run_cmd("echo hello", timeout=10)
+        self.assertEqual(out, "hello\n")
+        error_regex = "did not complete within 1 seconds.*hello"
+        self.assertErrorRegex(EasyBuildError, error_regex, run_cmd, "echo hello; sleep 10", timeout=1)
+
+    def test_run_cmds(self):
+        """Test running commands concurrently."""
+        start = time.time()
+        res = run_cmds(["sleep 1; echo foo", "sleep 1; echo bar >&2; exit 1", "echo baz"])
+        self.assertTrue(time.time() - start < 3)
+        self.assertEqual(res, [("foo\n", 0), ("bar\n", 1), ("baz\n", 0)])
+
+        res = run_cmds(["echo %s" % i for i in range(5)], max_procs=2)
+        self.assertEqual(res, [("%s\n" % i, 0) for i in range(5)])
+
+        # exit code and output are checked like for run_cmd
+        self.assertErrorRegex(EasyBuildError, "exited with exitcode 1", run_cmds, ["true", "exit 1"], log_ok=True)
+        self.assertEqual(run_cmds(["true", "exit 1"], simple=True), [True, False])
+        orig_strictness = run.strictness
+        run.strictness = run.ERROR
+        try:
+            self.assertErrorRegex(EasyBuildError, "Found 1 errors in command output", run_cmds, ["echo 'error: oops'"])
+            self.assertEqual(run_cmds(["echo 'error: oops'"], regexp=False), [("error: oops\n", 0)])
+        finally:
+            run.strictness = orig_strictness
+
     def test_run_cmd_simple(self):
         """Test return value for run_cmd in 'simple' mode."""
         self.assertEqual(True, run_cmd("echo hello", simple=True))
@@ -95,6 +145,43 @@ class RunTest(EnhancedTestCase):
         errors = parse_log_for_error("error failed", True)
         self.assertEqual(len(errors), 1)
 
+    def test_run_cmd_output_tail(self):
+        """Test retaining only the tail of the output of commands producing lots of output."""
+        orig_output_tail_size = run.output_tail_size
+        run.output_tail_size = 100
+        try:
+            (out, ec) = run_cmd("for i in `seq 1 1000`; do echo $i; done")
+            res = run_cmds(["for i in `seq 1 1000`; do echo $i; done", "echo foo"])
+        finally:
+            run.output_tail_size = orig_output_tail_size
+
+        self.assertEqual(ec, 0)
+        self.assertEqual(len(out), 100)
+        self.assertTrue(out.endswith("998\n999\n1000\n"))
+        self.assertEqual(res, [(out, 0), ("foo\n", 0)])
+
+        # full output is streamed to a file
+        tail = run.OutputTail('test', max_size=10)
+        for i in range(100):
+            tail.add("%s\n" % i)
+        self.assertEqual(tail.get(), "\n97\n98\n99\n")
+        self.assertTrue(tail.truncated)
+        tail.log_file.close()
+        self.assertEqual(read_file(tail.full_output_path), ''.join(["%s\n" % i for i in range(100)]))
+        os.remove(tail.full_output_path)
+
+    def test_error_scanner(self):
+        """Test scanning output for errors on the fly."""
+        scanner = run.ErrorScanner(True)
+        for chunk in ["foo\nsome er", "ror occur", "red\nthis is fine\nbuild failed"]:
+            scanner.feed(chunk)
+        errors = scanner.finish()
+        self.assertEqual([err[0] for err in errors], ["some error occurred", "build failed"])
+
+        (out, ec) = run_cmd("echo 'an error'; echo ok", regexp=True)
+        self.assertEqual(ec, 0)
+        self.assertEqual(len(parse_log_for_error(out, True)), 1)
+
     def test_run_cmd_suse(self):
         """Test run_cmd on SuSE systems, which have $PROFILEREAD set."""
         # avoid warning messages
@@ -55,13 +55,17 @@ import test.framework.easyconfigversion as ev
 import test.framework.filetools as f
 import test.framework.format_convert as f_c
 import test.framework.github as g
+import test.framework.job as j
 import test.framework.license as l
 import test.framework.module_generator as mg
+import test.framework.module_index as mi
 import test.framework.modules as m
 import test.framework.modulestool as mt
 import test.framework.options as o
 import test.framework.parallelbuild as p
+import test.framework.process as pr
 import test.framework.repository as r
+import test.framework.resource_monitor as rm
 import test.framework.robot as robot
 import test.framework.run as run
 import test.framework.scripts as sc
@@ -95,7 +99,7 @@ log = fancylogger.getLogger()
 
 # call suite() for each module and then run them all
 # note: make sure the options unit tests run first, to avoid running some of them with a readily initialized config
-tests = [o, r, ef, ev, ebco, ep, e, mg, m, mt, f, run, a, robot, b, v, g, tcv, tc, t, c, s, l, f_c, sc]
+tests = [o, r, ef, ev, ebco, ep, e, mg, mi, m, mt, f, run, pr, rm, a, robot, b, v, g, tcv, tc, t, c, s, l, f_c, sc, j]
 
 SUITE = unittest.TestSuite([x.suite() for x in tests])
 
@@ -27,11 +27,18 @@ Unit tests for systemtools.py
 
 @author: Kenneth hoste (Ghent University)
 """
+import os
+import shutil
+import tempfile
 from test.framework.utilities import EnhancedTestCase
 from unittest import TestLoader, main
 
+import easybuild.tools.systemtools as st
+from easybuild.tools.filetools import write_file
+
 from easybuild.tools.systemtools import AMD, ARM, DARWIN, INTEL, LINUX, UNKNOWN
-from easybuild.tools.systemtools import get_avail_core_count, get_core_count
+from easybuild.tools.systemtools import det_parallelism, get_avail_core_count, get_avail_memory, get_core_count
+from easybuild.tools.systemtools import get_cgroup_avail_memory, get_cgroup_cpu_quota
 from easybuild.tools.systemtools import get_cpu_model, get_cpu_speed, get_cpu_vendor, get_glibc_version
 from easybuild.tools.systemtools import get_os_type, get_os_name, get_os_version, get_platform_name, get_shared_lib_ext
 from easybuild.tools.systemtools import get_system_info
@@ -46,6 +53,60 @@ class SystemToolsTest(EnhancedTestCase):
             self.assertTrue(isinstance(core_count, int), "core_count has type int: %s, %s" % (core_count, type(core_count)))
             self.assertTrue(core_count > 0, "core_count %d > 0" % core_count)
 
+    def test_cgroup_limits(self):
+        """Test determining CPU quota and memory limits of cgroups."""
+        orig_cgroup_root, orig_proc_self_cgroup = st.CGROUP_ROOT, st.PROC_SELF_CGROUP
+        tmpdir = tempfile.mkdtemp()
+        st.CGROUP_ROOT = os.path.join(tmpdir, 'cgroup')
+        st.PROC_SELF_CGROUP = os.path.join(tmpdir, 'proc_self_cgroup')
+        try:
+            # cgroups v2, with limits at different levels in the hierarchy
+            write_file(st.PROC_SELF_CGROUP, "0::/job/step\n")
+            write_file(os.path.join(st.CGROUP_ROOT, 'cpu.max'), "max 100000\n")
+            write_file(os.path.join(st.CGROUP_ROOT, 'job', 'cpu.max'), "250000 100000\n")
+            write_file(os.path.join(st.CGROUP_ROOT, 'job', 'step', 'cpu.max'), "max 100000\n")
+            write_file(os.path.join(st.CGROUP_ROOT, 'job', 'memory.max'), "%d\n" % (4 * 1024 ** 3))
+            write_file(os.path.join(st.CGROUP_ROOT, 'job', 'memory.current'), "%d\n" % (1024 ** 3))
+            write_file(os.path.join(st.CGROUP_ROOT, 'job', 'step', 'memory.max'), "max\n")
+
+            self.assertEqual(get_cgroup_cpu_quota(), 2.5)
+            self.assertEqual(get_cgroup_avail_memory(), 3 * 1024 ** 3)
+            self.assertTrue(get_avail_memory() <= 3 * 1024 ** 3)
+            self.assertTrue(det_parallelism(None, None) <= 3)
+            self.assertEqual(det_parallelism(None, None, mem_per_job=2 * 1024 ** 3), 1)
+            # explicitly specified parallelism is retained
+            self.assertEqual(det_parallelism(8, None, mem_per_job=2 * 1024 ** 3), 8)
+
+            # cgroups v1, no limits
+            shutil.rmtree(st.CGROUP_ROOT)
+            write_file(st.PROC_SELF_CGROUP, "4:memory:/\n3:cpu,cpuacct:/\n")
+            write_file(os.path.join(st.CGROUP_ROOT, 'cpu,cpuacct', 'cpu.cfs_quota_us'), "-1\n")
+            write_file(os.path.join(st.CGROUP_ROOT, 'memory', 'memory.limit_in_bytes'), "%d\n" % (2 ** 63 - 4096))
+            self.assertEqual(get_cgroup_cpu_quota(), None)
+            self.assertEqual(get_cgroup_avail_memory(), None)
+
+            # cgroups v1 with limits
+            write_file(os.path.join(st.CGROUP_ROOT, 'cpu,cpuacct', 'cpu.cfs_quota_us'), "50000\n")
+            write_file(os.path.join(st.CGROUP_ROOT, 'cpu,cpuacct', 'cpu.cfs_period_us'), "100000\n")
+            write_file(os.path.join(st.CGROUP_ROOT, 'memory', 'memory.limit_in_bytes'), "%d\n" % 1024 ** 3)
+            self.assertEqual(get_cgroup_cpu_quota(), 0.5)
+            self.assertEqual(get_cgroup_avail_memory(), 1024 ** 3)
+            self.assertEqual(det_parallelism(None, None), 1)
+
+            # missing /proc/self/cgroup or /proc/meminfo is not a problem
+            st.PROC_SELF_CGROUP = os.path.join(tmpdir, 'nosuchfile')
+            self.assertEqual(get_cgroup_cpu_quota(), None)
+            orig_read_file = st.read_file
+            st.read_file = lambda path, log_error=True: None
+            try:
+                self.assertEqual(get_avail_memory(), None)
+                self.assertTrue(det_parallelism(None, None) >= 1)
+            finally:
+                st.read_file = orig_read_file
+        finally:
+            st.CGROUP_ROOT, st.PROC_SELF_CGROUP = orig_cgroup_root, orig_proc_self_cgroup
+            shutil.rmtree(tmpdir)
+
     def test_cpu_model(self):
         """Test getting CPU model."""
         cpu_model = get_cpu_model()
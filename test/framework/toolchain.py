@@ -28,6 +28,7 @@ Unit tests for toolchain support.
 @author: Kenneth Hoste (Ghent University)
 """
 
+import copy
 import os
 import re
 import shutil
@@ -36,7 +37,11 @@ from test.framework.utilities import EnhancedTestCase, init_config
 from unittest import TestLoader, main
 
 import easybuild.tools.modules as modules
+import easybuild.tools.toolchain.toolchain as toolchain
 from easybuild.framework.easyconfig.easyconfig import EasyConfig, ActiveMNS
+from easybuild.tools.build_log import EasyBuildError
+from easybuild.tools.environment import modify_env
+from easybuild.tools.filetools import write_file
 from easybuild.tools.toolchain.utilities import search_toolchain
 from test.framework.utilities import find_full_path
 
@@ -309,6 +314,122 @@ class ToolchainTest(EnhancedTestCase):
                     else:
                         self.assertFalse(flag in flags, "optarch: False means no %s in %s" % (flag, flags))
 
+    def test_compiler_cache(self):
+        """Test wrapping compiler commands with a compiler cache."""
+        tmpdir = tempfile.mkdtemp()
+        # fake ccache command, that reports statistics from files in cache directory
+        ccache = os.path.join(tmpdir, 'ccache')
+        write_file(ccache, '\n'.join([
+            "#!/bin/sh",
+            "if [ \"$1\" = '--print-stats' ]; then",
+            "    for counter in direct_cache_hit preprocessed_cache_hit cache_miss; do",
+            "        printf \"%s\\t%s\\n\" $counter `cat $CCACHE_DIR/$counter 2> /dev/null || echo 0`",
+            "    done",
+            "else",
+            "    exec \"$@\"",
+            "fi",
+        ]))
+        os.chmod(ccache, 0755)
+        cache_root = os.path.join(tmpdir, 'cache')
+
+        # no compiler cache by default
+        tc = self.get_toolchain("goalf", version="1.1.0-no-OFED")
+        tc.prepare()
+        self.assertEqual(tc.compiler_cache, None)
+        self.assertEqual(tc.compiler_cache_stats(), None)
+
+        cache_dirs = []
+        for optarch in ['march=lovelylovelysandybridge', None]:
+            init_config(build_options={
+                'compiler_cache': ccache,
+                'compiler_cache_dir': cache_root,
+                'compiler_cache_max_size': '1G',
+                'optarch': optarch,
+            })
+            for opts in [{}, {'usempi': True}, {'opt': True}]:
+                tc = self.get_toolchain("goalf", version="1.1.0-no-OFED")
+                tc.set_options(opts)
+                tc.prepare()
+
+                for var in ['CC', 'CXX', 'F77', 'F90', 'MPICC', 'MPICXX', 'MPIF90']:
+                    self.assertEqual(os.environ[var], '%s %s' % (ccache, tc.get_variable(var)))
+                # compilers used by MPI compiler wrappers are not wrapped (MPI compiler wrappers are)
+                self.assertEqual(os.environ['OMPI_CC'], 'gcc')
+
+                cache_dir = tc.compiler_cache['dir']
+                self.assertTrue(cache_dir.startswith(os.path.join(cache_root, 'goalf-1.1.0-no-OFED')))
+                self.assertEqual(os.environ['CCACHE_DIR'], cache_dir)
+                self.assertEqual(os.environ['CCACHE_MAXSIZE'], '1G')
+                cache_dirs.append(cache_dir)
+
+        # cache directory depends on optimisation flags (incl. optarch), not on use of MPI
+        self.assertEqual(cache_dirs[0], cache_dirs[1])
+        self.assertEqual(cache_dirs[3], cache_dirs[4])
+        self.assertEqual(len(set(cache_dirs)), 4)
+
+        # hits/misses are reported relative to when toolchain was prepared
+        write_file(os.path.join(cache_dir, 'direct_cache_hit'), '3')
+        write_file(os.path.join(cache_dir, 'preprocessed_cache_hit'), '2')
+        self.assertEqual(tc.compiler_cache_stats(), {'dir': cache_dir, 'hits': 5, 'misses': 0})
+        tc = self.get_toolchain("goalf", version="1.1.0-no-OFED")
+        tc.set_options({'opt': True})
+        tc.prepare()
+        self.assertEqual(tc.compiler_cache['dir'], cache_dir)
+        write_file(os.path.join(cache_dir, 'cache_miss'), '7')
+        self.assertEqual(tc.compiler_cache_stats(), {'dir': cache_dir, 'hits': 0, 'misses': 7})
+
+        # non-existing compiler cache command
+        init_config(build_options={'compiler_cache': os.path.join(tmpdir, 'nosuchccache')})
+        tc = self.get_toolchain("goalf", version="1.1.0-no-OFED")
+        self.assertErrorRegex(EasyBuildError, "Compiler cache command .* not found", tc.prepare)
+
+        shutil.rmtree(tmpdir)
+
+    def test_toolchain_env_cache(self):
+        """Test caching of environment defined by toolchain across toolchain instances."""
+        orig_env = copy.deepcopy(os.environ)
+
+        tc = self.get_toolchain("goalf", version="1.1.0-no-OFED")
+        tc.prepare()
+        env = copy.deepcopy(os.environ)
+        tc_deps = tc.toolchain_dependencies
+        tc_vars = tc.vars
+        self.assertEqual(len(toolchain._toolchain_env_cache), 1)
+
+        # toolchain module is not loaded again and toolchain dependencies are not determined again
+        modify_env(os.environ, orig_env)
+        tc = self.get_toolchain("goalf", version="1.1.0-no-OFED")
+        def fail(*args, **kwargs):
+            """Fail when called."""
+            raise AssertionError("should not be called")
+        tc.modules_tool.dependencies_for = fail
+        tc.modules_tool.load = lambda mods: self.assertEqual(mods, [])
+        tc.prepare()
+        del tc.modules_tool.dependencies_for
+        del tc.modules_tool.load
+
+        self.assertEqual(tc.toolchain_dependencies, tc_deps)
+        self.assertEqual(tc.vars, tc_vars)
+        self.assertEqual(os.environ, env)
+        self.assertEqual(len(toolchain._toolchain_env_cache), 1)
+
+        # toolchain variables depend on toolchain options
+        modify_env(os.environ, orig_env)
+        tc = self.get_toolchain("goalf", version="1.1.0-no-OFED")
+        tc.set_options({'opt': True})
+        tc.prepare()
+        self.assertTrue('-O3' in tc.get_variable('CFLAGS'))
+        self.assertFalse('-O3' in tc_vars['CFLAGS'])
+        self.assertEqual(len(toolchain._toolchain_env_cache.values()[0]['variables']), 2)
+
+        # environment defined by toolchain module is cached per environment in which it is loaded
+        modify_env(os.environ, orig_env)
+        os.environ['FOO'] = 'bar'
+        tc = self.get_toolchain("goalf", version="1.1.0-no-OFED")
+        tc.prepare()
+        self.assertEqual(tc.vars, tc_vars)
+        self.assertEqual(len(toolchain._toolchain_env_cache), 2)
+
     def test_misc_flags_unique_fortran(self):
         """Test whether unique Fortran compiler flags are set correctly."""
 
@@ -43,7 +43,7 @@ from vsc.utils.fancylogger import setLogLevelDebug, logToScreen
 
 import easybuild.tools.module_naming_scheme  # required to dynamically load test module naming scheme(s)
 from easybuild.tools.build_log import EasyBuildError
-from easybuild.tools.filetools import mkdir, write_file
+from easybuild.tools.filetools import mkdir, read_file, write_file
 
 
 class ToyBuildTest(EnhancedTestCase):
@@ -81,7 +81,7 @@ class ToyBuildTest(EnhancedTestCase):
         if os.path.exists(self.dummylogfn):
             os.remove(self.dummylogfn)
 
-    def check_toy(self, installpath, outtxt, version='0.0', versionprefix='', versionsuffix=''):
+    def check_toy(self, installpath, outtxt, version='0.0', versionprefix='', versionsuffix='', resource_usage=False):
         """Check whether toy build succeeded."""
 
         full_version = ''.join([versionprefix, version, versionsuffix])
@@ -115,6 +115,17 @@ class ToyBuildTest(EnhancedTestCase):
         devel_module_path = os.path.join(software_path, 'easybuild', 'toy-%s-easybuild-devel' % full_version)
         self.assertTrue(os.path.exists(devel_module_path))
 
+        # fingerprint for installation is recorded
+        fingerprint_path = os.path.join(software_path, 'easybuild', 'easybuild-fingerprint.txt')
+        self.assertTrue(re.match('^[0-9a-f]{40}$', read_file(fingerprint_path)))
+
+        # time series of resources consumed during build is only recorded when requested
+        resource_usage_path = os.path.join(software_path, 'easybuild', 'easybuild-resource-usage.tsv')
+        if resource_usage:
+            self.assertTrue(re.search(r'^[0-9.]+\tbuild\t', read_file(resource_usage_path), re.M))
+        else:
+            self.assertFalse(os.path.exists(resource_usage_path))
+
     def test_toy_build(self, extra_args=None, ec_file=None, tmpdir=None, verify=True, fails=False, verbose=True,
                        raise_error=False, test_report=None, versionsuffix=''):
         """Perform a toy build."""
@@ -258,6 +269,11 @@ class ToyBuildTest(EnhancedTestCase):
         err_regex = r"crashed with an error.*Traceback[\S\s]*toy_buggy.py.*build_step[\S\s]*global name 'run_cmd'"
         self.assertErrorRegex(EasyBuildError, err_regex, self.test_toy_build, **kwargs)
 
+    def test_toy_resource_usage(self):
+        """Test monitoring resources consumed during toy build."""
+        self.test_toy_build(extra_args=['--resource-sample-interval=0.1'], verify=False)
+        self.check_toy(self.test_installpath, read_file(self.logfile), resource_usage=True)
+
     def test_toy_build_formatv2(self):
         """Perform a toy build (format v2)."""
         # set $MODULEPATH such that modules for specified dependencies are found
@@ -644,6 +660,73 @@ class ToyBuildTest(EnhancedTestCase):
         test_ec = os.path.join(test_dir, 'easyconfigs', 'toy-0.0-gompi-1.3.12.eb')
         self.test_toy_build(ec_file=test_ec, versionsuffix='-gompi-1.3.12')
 
+    def test_toy_rebuild_stale(self):
+        """Test rebuilding stale installations only, using --rebuild-stale."""
+        self.test_toy_build()
+
+        ec_file = os.path.join(os.path.dirname(__file__), 'easyconfigs', 'toy-0.0.eb')
+        args = [
+            ec_file,
+            '--sourcepath=%s' % self.test_sourcepath,
+            '--buildpath=%s' % self.test_buildpath,
+            '--installpath=%s' % self.test_installpath,
+            '--debug',
+            '--unittest-file=%s' % self.logfile,
+            '--rebuild-stale',
+        ]
+        write_file(self.logfile, '')
+        outtxt = self.eb_main(args, logfile=self.dummylogfn, do_build=True, verbose=True)
+        self.assertTrue(re.search("toy/0.0 is already installed and up-to-date", outtxt))
+        self.assertFalse(re.search("COMPLETED: Installation ended successfully", outtxt))
+
+        # a change in the easyconfig file makes the installation stale
+        tmpdir = tempfile.mkdtemp()
+        args[0] = os.path.join(tmpdir, 'toy-0.0.eb')
+        write_file(args[0], read_file(ec_file) + "\n# changed\n")
+        write_file(self.logfile, '')
+        outtxt = self.eb_main(args, logfile=self.dummylogfn, do_build=True, verbose=True)
+        self.assertFalse(re.search("toy/0.0 is already installed and up-to-date", outtxt))
+        self.check_toy(self.test_installpath, outtxt)
+
+        shutil.rmtree(tmpdir)
+
+    def test_toy_regenerate_modules(self):
+        """Test regenerating module files for existing installations, using --regenerate-modules."""
+        self.test_toy_build()
+
+        mod_path = os.path.join(self.test_installpath, 'modules')
+        toy_module = os.path.join(mod_path, 'all', 'toy', '0.0')
+        os.remove(toy_module)
+        os.remove(os.path.join(mod_path, 'tools', 'toy', '0.0'))
+
+        # install test module naming scheme dynamically
+        mns_path = "easybuild.tools.module_naming_scheme.test_module_naming_scheme"
+        __import__(mns_path, globals(), locals(), [''])
+
+        modules_footer = os.path.join(self.test_buildpath, 'modules-footer.txt')
+        write_file(modules_footer, "setenv SITE_SPECIFIC_ENV_VAR foobar\n")
+        args = [
+            '--installpath=%s' % self.test_installpath,
+            '--debug',
+            '--unittest-file=%s' % self.logfile,
+            '--modules-footer=%s' % modules_footer,
+            '--module-naming-scheme=TestModuleNamingScheme',
+            '--regenerate-modules',
+        ]
+        write_file(self.logfile, '')
+        outtxt = self.eb_main(args, logfile=self.dummylogfn, do_build=True, verbose=True, raise_error=True)
+        self.assertTrue(re.search("Regenerated module files for 1 out of 1 installations", outtxt))
+        self.assertFalse(re.search("COMPLETED: Installation ended successfully", outtxt))
+
+        # module file is regenerated for existing installation, incl. footer and symlinks according to naming scheme
+        toy_install_path = os.path.join(self.test_installpath, 'software', 'toy', '0.0')
+        modtxt = read_file(toy_module)
+        self.assertTrue(re.search(r'^set\s*root\s*%s$' % toy_install_path, modtxt, re.M))
+        self.assertTrue(re.search(r'^setenv SITE_SPECIFIC_ENV_VAR foobar$', modtxt, re.M))
+        for subdir in ['TOOLS', 't']:
+            self.assertTrue(os.path.islink(os.path.join(mod_path, subdir, 'toy', '0.0')))
+        self.assertEqual(os.listdir(os.path.join(toy_install_path, 'bin')), ['toy'])
+
     def test_module_filepath_tweaking(self):
         """Test using --suffix-modules-path."""
         # install test module naming scheme dynamically
@@ -38,8 +38,12 @@ from vsc.utils import fancylogger
 from vsc.utils.patterns import Singleton
 
 import easybuild.tools.options as eboptions
+import easybuild.tools.toolchain.toolchain as toolchain
 import easybuild.tools.toolchain.utilities as tc_utils
+import easybuild.tools.module_index as module_index
 import easybuild.tools.module_naming_scheme.toolchain as mns_toolchain
+import easybuild.framework.easyconfig.format.one as format_one
+import easybuild.framework.easyconfig.format.two as format_two
 from easybuild.framework.easyconfig import easyconfig
 from easybuild.framework.easyblock import EasyBlock
 from easybuild.main import main
@@ -181,7 +185,11 @@ def cleanup():
     # empty caches
     tc_utils._initial_toolchain_instances.clear()
     easyconfig._easyconfigs_cache.clear()
+    format_one._block_specs.clear()
+    format_two._ebconfigobj_cache.clear()
+    module_index._module_files_cache.clear()
     mns_toolchain._toolchain_details_cache.clear()
+    toolchain._toolchain_env_cache.clear()
 
 
 def init_config(args=None, build_options=None):
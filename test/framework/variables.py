@@ -28,7 +28,7 @@ Unit tests for tools/variables.py.
 @author: Kenneth Hoste (Ghent University)
 @author: Stijn De Weirdt (Ghent University)
 """
-
+import copy
 from test.framework.utilities import EnhancedTestCase
 from unittest import TestLoader, main
 
@@ -78,6 +78,17 @@ class VariablesTest(EnhancedTestCase):
         cmd = CommandFlagList(["gcc", "bar", "baz"])
         self.assertEqual(str(cmd), "gcc -bar -baz")
 
+        # deep copy is independent of original, and yields the same values
+        v2 = copy.deepcopy(v)
+        self.assertTrue(isinstance(v2, TestVariables))
+        self.assertEqual(sorted(v2.keys()), sorted(v.keys()))
+        for key in v:
+            self.assertEqual(str(v2[key]), str(v[key]))
+        self.assertEqual(str(v2['FOO']), "0,1,2")
+        v2.nappend('FOO', 3)
+        self.assertEqual(str(v2['FOO']), "0,1,2,3")
+        self.assertEqual(str(v['FOO']), "0,1,2")
+
 def suite():
     """ return all the tests"""
     return TestLoader().loadTestsFromTestCase(VariablesTest)